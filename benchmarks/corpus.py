@@ -0,0 +1,172 @@
+"""
+Generador de manuscritos sintéticos
+Textos con aspecto de español (palabras funcionales reales, vocabulario
+de contenido con distribución de Zipf, oraciones, párrafos y capítulos)
+en texto plano, PDF y DOCX, reproducibles a partir de una semilla
+"""
+
+import random
+from io import BytesIO
+from typing import Dict, List
+
+from docx import Document
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from src.api.main import GENRE_CRITERIA
+
+GENRES = ("cuento", "ensayo", "novela")
+FORMATS = ("txt", "pdf", "docx")
+
+FUNCTION_WORDS = [
+    "de", "la", "que", "el", "en", "y", "a", "los", "se", "del", "las", "un", "por",
+    "con", "no", "una", "su", "para", "es", "al", "lo", "como", "más", "pero", "sus",
+    "le", "ya", "o", "fue", "este", "ha", "sí", "porque", "esta", "entre", "cuando",
+    "muy", "sin", "sobre", "también", "me", "hasta", "hay", "donde", "quien", "desde",
+]
+ONSETS = ["", "b", "c", "d", "f", "g", "l", "m", "n", "p", "r", "s", "t", "v", "ch",
+          "br", "cr", "pl", "tr", "gr", "ll", "ñ"]
+NUCLEI = ["a", "e", "i", "o", "u", "á", "é", "ó", "ie", "ue", "ia"]
+CODAS = ["", "", "", "n", "s", "r", "l"]
+# Proporción de palabras funcionales en el texto
+FUNCTION_RATIO = 0.45
+CONTENT_VOCABULARY = 6000
+
+PDF_LINE_CHARS = 90
+PDF_LINES_PER_PAGE = 48
+
+
+def _make_word(rng: random.Random) -> str:
+    syllables = rng.choice((1, 2, 2, 3, 3, 3, 4, 5))
+    return "".join(
+        rng.choice(ONSETS) + rng.choice(NUCLEI) + rng.choice(CODAS) for _ in range(syllables)
+    )
+
+
+def _vocabulary(rng: random.Random) -> List[str]:
+    words = set()
+    while len(words) < CONTENT_VOCABULARY:
+        words.add(_make_word(rng))
+    return sorted(words)
+
+
+def generate_text(words: int, seed: int = 0, chapters: int = 0) -> str:
+    """Texto de aproximadamente `words` palabras, dividido en párrafos y capítulos"""
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(rng)
+    # Pesos de Zipf: pocas palabras muy frecuentes y una cola larga
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    content = rng.choices(vocabulary, weights, k=words)
+    function = rng.choices(FUNCTION_WORDS, k=words)
+
+    paragraphs: List[str] = []
+    sentences: List[str] = []
+    chapter_every = words // chapters if chapters else 0
+    written = 0
+    next_chapter = 0
+    while written < words:
+        if chapter_every and written >= next_chapter:
+            if sentences:
+                paragraphs.append(" ".join(sentences))
+                sentences = []
+            paragraphs.append(f"Capítulo {next_chapter // chapter_every + 1}")
+            next_chapter += chapter_every
+        length = min(rng.randint(6, 32), words - written)
+        sentence = [
+            function[written + i] if rng.random() < FUNCTION_RATIO else content[written + i]
+            for i in range(length)
+        ]
+        if length > 10 and rng.random() < 0.5:
+            sentence[rng.randint(3, length - 3)] += ","
+        sentence[0] = sentence[0].capitalize()
+        sentences.append(" ".join(sentence) + rng.choice(".....?!"))
+        written += length
+        if len(sentences) >= rng.randint(3, 8):
+            paragraphs.append(" ".join(sentences))
+            sentences = []
+    if sentences:
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def generate_manuscript(genre: str, seed: int = 0) -> str:
+    """Manuscrito con la extensión ideal del género según quick_evaluation"""
+    words = GENRE_CRITERIA[genre]["ideal_words"]
+    chapters = words // 4000 if genre == "novela" else 0
+    return generate_text(words, seed=seed, chapters=chapters)
+
+
+def _wrap(paragraph: str, width: int) -> List[str]:
+    lines, line = [], ""
+    for word in paragraph.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def to_pdf(text: str) -> bytes:
+    """PDF con capa de texto (Helvetica, codificación WinAnsi)"""
+    lines: List[str] = []
+    for paragraph in text.split("\n\n"):
+        lines.extend(_wrap(paragraph, PDF_LINE_CHARS))
+        lines.append("")
+
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+        NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+    }))
+    for start in range(0, len(lines), PDF_LINES_PER_PAGE):
+        page = writer.add_blank_page(width=612, height=792)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})
+        })
+        operations = ["BT /F1 10 Tf 14 TL 56 740 Td"]
+        for line in lines[start:start + PDF_LINES_PER_PAGE]:
+            operations.append(f"({_pdf_escape(line)}) Tj T*")
+        operations.append("ET")
+        content = DecodedStreamObject()
+        content.set_data("\n".join(operations).encode("cp1252", "replace"))
+        page[NameObject("/Contents")] = writer._add_object(content)
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def to_docx(text: str) -> bytes:
+    document = Document()
+    for paragraph in text.split("\n\n"):
+        if paragraph.startswith("Capítulo "):
+            document.add_heading(paragraph, level=1)
+        else:
+            document.add_paragraph(paragraph)
+    output = BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+def build_corpus(genres=GENRES, formats=FORMATS, seed: int = 0) -> Dict[str, Dict[str, bytes]]:
+    """Manuscritos de cada género en cada formato"""
+    corpus: Dict[str, Dict[str, bytes]] = {}
+    for genre in genres:
+        text = generate_manuscript(genre, seed)
+        corpus[genre] = {}
+        for fmt in formats:
+            if fmt == "txt":
+                corpus[genre][fmt] = text.encode("utf-8")
+            elif fmt == "pdf":
+                corpus[genre][fmt] = to_pdf(text)
+            else:
+                corpus[genre][fmt] = to_docx(text)
+    return corpus
@@ -0,0 +1,260 @@
+"""
+Banco de pruebas de rendimiento
+Mide extracción, análisis y subida completa sobre el corpus sintético y
+compara el resultado con una línea base guardada para detectar regresiones
+
+Uso:
+    python -m benchmarks.run                         # todos los casos
+    python -m benchmarks.run --genres cuento --repeat 3
+    python -m benchmarks.run --save-baseline         # guarda baselines.json
+    python -m benchmarks.run --compare               # falla si hay regresión
+                                                     # (se confirma midiendo otra vez)
+
+Cada caso se ejecuta en un proceso nuevo, de modo que el pico de memoria
+(RSS) medido corresponde solo a ese caso.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.corpus import GENRES, generate_manuscript, to_docx, to_pdf
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_REPEAT = 10
+# Empeoramiento relativo tolerado frente a la línea base; con pocas
+# repeticiones la mediana varía de una ejecución a otra en torno a un 30 %
+DEFAULT_TOLERANCE = 0.5
+
+# `count` es la pasada de conteo, con memoria acotada por el vocabulario;
+# `analyze` añade las frases repetidas y los perfiles de estilo, que crecen con el texto
+CASES = ("extract_pdf", "extract_docx", "count", "analyze", "upload_pdf", "upload_docx")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentil por interpolación lineal (q entre 0 y 100)"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def peak_rss_mb() -> float:
+    """Pico de memoria residente del proceso y sus hijos, en MB"""
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return round(peak / scale, 1)
+
+
+def _payloads(case: str, genre: str, repeat: int) -> List[tuple]:
+    """
+    Texto y contenido de cada repetición
+
+    Cada repetición usa una semilla distinta para que la caché de análisis
+    no convierta las subidas en aciertos.
+    """
+    payloads = []
+    for seed in range(repeat):
+        text = generate_manuscript(genre, seed=seed)
+        if case.endswith("pdf"):
+            payloads.append((text, to_pdf(text)))
+        elif case.endswith("docx"):
+            payloads.append((text, to_docx(text)))
+        else:
+            payloads.append((text, text.encode("utf-8")))
+    return payloads
+
+
+def _case_function(case: str) -> Callable[[str, bytes], Any]:
+    from src.api.main import (
+        analyze_text_quality, extract_text_from_docx, extract_text_from_pdf
+    )
+
+    if case == "extract_pdf":
+        return lambda text, content: extract_text_from_pdf(content)
+    if case == "extract_docx":
+        return lambda text, content: extract_text_from_docx(content)
+    if case == "count":
+        from src.nlp.streaming import StreamingTextAnalyzer, iter_text_chunks
+        return lambda text, content: StreamingTextAnalyzer().feed_all(
+            iter_text_chunks(text)
+        ).finish()
+    if case == "analyze":
+        return lambda text, content: analyze_text_quality(text)
+
+    from fastapi.testclient import TestClient
+    from src.api.main import app
+
+    client = TestClient(app)
+    client.__enter__()
+    extension = case.split("_", 1)[1]
+
+    def upload(text: str, content: bytes) -> None:
+        response = client.post(
+            "/api/v1/manuscripts/upload",
+            files={"file": (f"manuscrito.{extension}", content)},
+        )
+        response.raise_for_status()
+
+    upload.close = lambda: client.__exit__(None, None, None)
+    return upload
+
+
+def run_case(case: str, genre: str, repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    """Ejecuta un caso en el proceso actual y devuelve sus métricas"""
+    payloads = _payloads(case, genre, repeat + 1)
+    fn = _case_function(case)
+    try:
+        # Primera ejecución de calentamiento: importaciones, pool de procesos
+        fn(*payloads[0])
+        latencies = []
+        for text, content in payloads[1:]:
+            started = time.perf_counter()
+            fn(text, content)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        if hasattr(fn, "close"):
+            fn.close()
+
+    words = sum(len(text.split()) for text, _ in payloads[1:])
+    size = sum(len(content) for _, content in payloads[1:])
+    total = sum(latencies)
+    return {
+        "case": case,
+        "genre": genre,
+        "repeat": repeat,
+        "words": words // repeat,
+        "bytes": size // repeat,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "words_per_second": round(words / total) if total else 0,
+        "mb_per_second": round(size / total / 1024 / 1024, 2) if total else 0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_isolated(case: str, genre: str, repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    """Ejecuta un caso en un proceso nuevo con un directorio de datos propio"""
+    with tempfile.TemporaryDirectory(prefix="ecdotica-bench-") as data_dir:
+        env = dict(os.environ, ECDOTICA_DATA_DIR=data_dir)
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--case", case,
+             "--genres", genre, "--repeat", str(repeat)],
+            env=env, capture_output=True, text=True, check=True,
+        )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, Dict[str, Any]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results: List[Dict[str, Any]], path: str = BASELINE_PATH) -> None:
+    baseline = load_baseline(path)
+    for result in results:
+        baseline[f"{result['case']}:{result['genre']}"] = result
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(baseline.items())), f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Regresiones de latencia p50 o de memoria respecto a la línea base
+    Una mediana que no supera el p95 de la línea base queda dentro de la
+    variación ya observada al guardarla y no cuenta como regresión
+    """
+    regressions = []
+    for result in results:
+        reference = baseline.get(f"{result['case']}:{result['genre']}")
+        if reference is None:
+            continue
+        for metric in ("p50_ms", "peak_rss_mb"):
+            limit = reference[metric] * (1 + tolerance)
+            if metric == "p50_ms":
+                limit = max(limit, reference.get("p95_ms", 0))
+            if reference[metric] and result[metric] > limit:
+                regressions.append(
+                    f"{result['case']}:{result['genre']} {metric} "
+                    f"{result[metric]} > {reference[metric]} (+{tolerance:.0%})"
+                )
+    return regressions
+
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    columns = ("case", "genre", "words", "p50_ms", "p95_ms", "p99_ms",
+               "words_per_second", "mb_per_second", "peak_rss_mb")
+    rows = [columns] + [tuple(str(result[c]) for c in columns) for result in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    return "\n".join(
+        "  ".join(value.rjust(width) for value, width in zip(row, widths)) for row in rows
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Banco de pruebas de Ecdotica")
+    parser.add_argument("--genres", default=",".join(GENRES))
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--json", action="store_true", help="Resultados en JSON")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    genres = [genre for genre in args.genres.split(",") if genre]
+    if args.case:
+        # Proceso hijo de run_isolated: una sola línea JSON por stdout
+        print(json.dumps(run_case(args.case, genres[0], args.repeat)))
+        return 0
+
+    results = [
+        run_isolated(case, genre, args.repeat)
+        for genre in genres
+        for case in args.cases.split(",") if case
+    ]
+    print(json.dumps(results, indent=2) if args.json else format_table(results))
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+    if args.compare:
+        baseline = load_baseline(args.baseline)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            # Un pico aislado de la máquina no se repite: solo cuentan las
+            # regresiones que se confirman al volver a medir el caso
+            suspects = [
+                result for result in results
+                if compare([result], baseline, args.tolerance)
+            ]
+            regressions = compare([
+                run_isolated(result["case"], result["genre"], args.repeat) for result in suspects
+            ], baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESIÓN: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,10 @@
 """Blockchain Integration API Router"""
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional
-import hashlib
+from typing import List, Optional
+import asyncio
+
+from src.blockchain.anchoring import anchor_service
 
 router = APIRouter()
 
@@ -12,35 +14,66 @@ class BlockchainRegisterRequest(BaseModel):
 
 class BlockchainRegisterResponse(BaseModel):
     status: str
-    transaction_hash: str
+    document_hash: str
+    transaction_hash: Optional[str] = None
     timestamp: str
-    blockchain: str
+    blockchain: Optional[str] = None
+    batch_id: Optional[int] = None
+    merkle_root: Optional[str] = None
+    proof: Optional[List[List[str]]] = None
 
 @router.post("/register", response_model=BlockchainRegisterResponse)
 async def register_document(request: BlockchainRegisterRequest):
     """
-    Registrar documento en blockchain (Ethereum/Polygon)
+    Registrar documento en blockchain
+
+    El documento entra en el lote en curso; la raíz de Merkle del lote se
+    ancla al llenarse o al cerrar la ventana de tiempo. Mientras tanto el
+    estado es 'pending'.
+    """
+    document = await asyncio.to_thread(
+        anchor_service.submit, request.document_hash, request.metadata
+    )
+    return BlockchainRegisterResponse(
+        status=document["status"],
+        document_hash=document["document_hash"],
+        transaction_hash=document["transaction_hash"],
+        timestamp=document["anchored_at"] or document["submitted_at"],
+        blockchain=document["blockchain"],
+        batch_id=document["batch_id"],
+        merkle_root=document["merkle_root"],
+        proof=document["proof"]
+    )
+
+@router.post("/anchor")
+async def anchor_pending_documents():
+    """
+    Sellar y anclar de inmediato el lote de documentos pendientes
     """
     try:
-        # TODO: Integrar con Web3.py para Ethereum/Polygon
-        return BlockchainRegisterResponse(
-            status="success",
-            transaction_hash="0x" + "0" * 64,
-            timestamp="2025-11-18T10:00:00Z",
-            blockchain="polygon"
-        )
+        batch = await asyncio.to_thread(anchor_service.seal)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=502, detail=f"Error al anclar el lote: {str(e)}")
+    return {
+        "status": "anchored" if batch else "empty",
+        "batch": batch,
+        "pending": await asyncio.to_thread(anchor_service.pending_count)
+    }
 
 @router.get("/verify/{document_hash}")
 async def verify_document(document_hash: str):
     """
     Verificar autenticidad del documento
+
+    Se comprueba la prueba de inclusión guardada frente a la raíz anclada,
+    sin consultar la cadena.
     """
+    document = await asyncio.to_thread(anchor_service.verify, document_hash)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Documento no registrado")
     return {
         "status": "success",
-        "document_hash": document_hash,
-        "verified": True,
-        "blockchain": "polygon",
-        "message": "Document verification endpoint"
+        **document,
+        "message": "Documento verificado" if document["verified"]
+        else "Documento pendiente de anclaje"
     }
@@ -4,24 +4,97 @@ Sistema completo para gestión, evaluación y edición de manuscritos
 Ahora con soporte para archivos PDF y Word completos
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List, Dict
+from typing import (
+    Optional, List, Dict, Iterable, Iterator, Callable, Any, AsyncIterator, Awaitable
+)
 from datetime import datetime
-import re
+from contextlib import asynccontextmanager
+from functools import partial
+import asyncio
+import json
+import os
+import time
 import uuid
-from io import BytesIO
-import pypdf
-from docx import Document
+
+from src.api import blockchain_router, review_router, text_router
+from src.blockchain.anchoring import anchor_service
+from src.review_ai.llm_review import review_service
+from src.nlp.phrases import RepeatedPhraseDetector
+from src.nlp.plagiarism import FingerprintBuilder, fingerprint_text, plagiarism_index
+from src.nlp.revisions import (
+    analyze_missing_paragraphs, analyze_paragraphs_incrementally, diff_analyses,
+    paragraph_changes, paragraph_hashes, paragraph_store
+)
+from src.nlp.sampling import CONFIDENCE_LEVEL, estimate_document, estimate_total, page_counts
+from src.nlp.streaming import (
+    WORD_PATTERN, StreamingTextAnalyzer, coalesce_chunks, full_analyzer, iter_text_chunks
+)
+from src.utils.docx_extraction import iter_docx_paragraphs
+from src.utils.pdf_extraction import PdfPageSample, iter_pdf_pages
+from src.utils.cache import AnalysisCache, sha256_text
+from src.utils.uploads import (
+    MAX_FILE_SIZE, DocumentSource, SpooledUpload, UploadLimitMiddleware, list_zip_documents,
+    spool_upload, spool_zip_member
+)
+from src.utils.jobs import JobProgress, JobRunner, JobStore
+from src.utils.lazy import preload_from_env, status as lazy_status
+from src.utils.manuscripts import DECISIONS, ManuscriptStore
+from src.utils.metrics import MetricsMiddleware, StageTimings, metrics, slow_request_profiler
+from src.utils.paths import data_path
+from src.utils.percentiles import corpus_percentiles
+from src.utils.workers import QueueProgress, drain_progress, worker_pool
+from src.wordpress.publisher import WordPressPublishError, wordpress_publisher
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranque y apagado del servicio"""
+    # Precarga opcional de dependencias y modelos (ECDOTICA_PRELOAD); los
+    # procesos trabajadores creados después las heredan ya importadas
+    await asyncio.to_thread(preload_from_env)
+    # Retomar los trabajos que quedaron pendientes antes de un reinicio
+    job_runner.start()
+    manuscript_store.start()
+    corpus_percentiles.start()
+    anchor_service.start()
+    yield
+    await job_runner.stop()
+    await manuscript_store.stop()
+    await corpus_percentiles.stop()
+    await anchor_service.stop()
+    await review_service.close()
+    await wordpress_publisher.close()
+    # Detener el pool de procesos al apagar el servidor
+    worker_pool.shutdown()
 
 # Configuración de la API
 app = FastAPI(
     title="Ecdotica API - Editorial Nuevo Milenio",
     version="3.0.0",
-    description="Sistema de gestión editorial y análisis de manuscritos con soporte para PDF/Word"
+    description="Sistema de gestión editorial y análisis de manuscritos con soporte para PDF/Word",
+    lifespan=lifespan
 )
 
+# Límites de las subidas: un lote, suelto o en ZIP, y la estimación por
+# muestreo (solo lee unas páginas) admiten archivos mayores que /upload
+MAX_BATCH_ARCHIVE_SIZE = 200 * 1024 * 1024  # 200MB
+ESTIMATE_MAX_FILE_SIZE = 200 * 1024 * 1024  # 200MB
+
+# El límite se aplica mientras se recibe el cuerpo, antes de que Starlette
+# lo guarde entero; va por dentro de CORS para que el 413 lleve sus cabeceras
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/api/v1/manuscripts/upload": MAX_FILE_SIZE,
+    "/api/v1/manuscripts/upload-stream": MAX_FILE_SIZE,
+    "/api/v1/manuscripts/upload-async": MAX_FILE_SIZE,
+    "/api/v1/manuscripts/estimate": ESTIMATE_MAX_FILE_SIZE,
+    "/api/v1/manuscripts/batch": MAX_BATCH_ARCHIVE_SIZE,
+    "/api/v1/wordpress/submit": MAX_FILE_SIZE,
+})
+
 # CORS configurado por entorno
 app.add_middleware(
     CORSMiddleware,
@@ -31,6 +104,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Duración por ruta y perfil opcional de las peticiones lentas
+app.add_middleware(MetricsMiddleware, registry=metrics, profiler=slow_request_profiler)
+
+# Longitud mínima de texto extraído para analizar un archivo
+MIN_TEXT_LENGTH = 100
+# Caracteres del manuscrito incluidos en el borrador de WordPress
+WORDPRESS_EXCERPT_LENGTH = 1000
+# Campos del formulario con las credenciales de WordPress
+WORDPRESS_CREDENTIAL_FIELDS = ("wordpress_user", "wordpress_password")
+# Cambiar al modificar el análisis invalida la caché de resultados
+ANALYSIS_VERSION = "4"
+# Límites de los envíos por lotes
+MAX_BATCH_FILES = 500
+# Frases repetidas incluidas en el análisis y umbral para señalarlas como problema
+ANALYSIS_REPEATED_PHRASES = 20
+ANALYSIS_PHRASE_OFFSETS = 10
+PHRASE_ISSUE_MIN_WORDS = 4
+PHRASE_ISSUE_MIN_REPEATS = 3
+# Archivos de un lote analizados a la vez y reintentos si el pool está lleno
+BATCH_CONCURRENCY = worker_pool.processes
+BATCH_RETRIES = 5
+# Sondeo del progreso de los análisis en streaming y latido contra los
+# cortes por inactividad de los proxies
+SSE_POLL_SECONDS = 0.25
+SSE_HEARTBEAT_SECONDS = float(os.getenv("ECDOTICA_SSE_HEARTBEAT_SECONDS", "15"))
+
+# Estimación por muestreo de PDF grandes: páginas leídas, páginas tras las que
+# se abandona si ninguna tiene texto, y fracción escaneada que marca el PDF
+ESTIMATE_SAMPLE_PAGES = int(os.getenv("ECDOTICA_ESTIMATE_SAMPLE_PAGES", "40"))
+ESTIMATE_MAX_SAMPLE_PAGES = 400
+ESTIMATE_SCAN_CHECK_PAGES = 5
+ESTIMATE_SCANNED_RATIO = 0.5
+# Métricas que se extrapolan con intervalo de confianza
+ESTIMATED_METRICS = (
+    "word_count", "sentence_count", "paragraph_count", "avg_words_per_sentence",
+    "complex_word_ratio", "estimated_reading_time_minutes"
+)
+# Métricas del análisis para las que se calcula el percentil dentro del género
+PERCENTILE_METRICS = (
+    "word_count", "sentence_count", "paragraph_count", "avg_words_per_sentence",
+    "complex_word_ratio", "quality_score", "estimated_reading_time_minutes"
+)
+
+# Criterios básicos de extensión por género
+GENRE_CRITERIA = {
+    "novela": {"min_words": 50000, "ideal_words": 80000},
+    "cuento": {"min_words": 1000, "ideal_words": 5000},
+    "ensayo": {"min_words": 5000, "ideal_words": 15000},
+    "general": {"min_words": 5000, "ideal_words": 20000}
+}
+
+analysis_cache = AnalysisCache(version=ANALYSIS_VERSION)
+job_store = JobStore()
+job_runner = JobRunner(job_store)
+manuscript_store = ManuscriptStore()
+
 # ==========================================
 # MODELOS DE DATOS
 # ==========================================
@@ -41,6 +170,8 @@ class ManuscriptSubmission(BaseModel):
     email: EmailStr
     content: str = Field(..., min_length=100)
     genre: Optional[str] = Field(None, max_length=100)
+    # Versión anterior del mismo manuscrito: solo se analizan los párrafos cambiados
+    parent_manuscript_id: Optional[str] = Field(None, max_length=100)
 
 class FileAnalysisRequest(BaseModel):
     title: str
@@ -57,7 +188,41 @@ class ManuscriptAnalysis(BaseModel):
     quality_score: int
     issues: List[str]
     repeated_words: Dict[str, int]
+    repeated_phrases: List[Dict[str, Any]] = []
     estimated_reading_time_minutes: float
+    # Perfiles estilométricos del libro, por capítulo y por ventanas, en columnas
+    style: Dict[str, Any] = {}
+
+class FileAnalysisResult(BaseModel):
+    analysis: ManuscriptAnalysis
+    text_length: int
+    text_sha256: str
+    excerpt: str
+    # Huella MinHash para el índice de plagio; no se guarda en caché
+    fingerprint: Any = None
+    # Tiempos de extracción y análisis medidos en el proceso trabajador
+    stages: Dict[str, Dict[str, float]] = {}
+    # Páginas (desde 1) que se quedaron sin extraer por agotar su tiempo
+    timed_out_pages: List[int] = []
+
+class MetricInterval(BaseModel):
+    estimate: float
+    # Límites del intervalo de confianza; None si la muestra no basta
+    low: Optional[float] = None
+    high: Optional[float] = None
+
+class ManuscriptEstimate(BaseModel):
+    # Métricas extrapoladas al documento completo
+    analysis: ManuscriptAnalysis
+    intervals: Dict[str, MetricInterval]
+    page_count: int
+    sampled_pages: List[int]
+    # Páginas de la muestra sin capa de texto y con imágenes (escaneadas)
+    scanned_pages: List[int]
+    scanned_ratio: MetricInterval
+    likely_scanned: bool
+    stopped_early: bool
+    seconds: float
 
 class EditorialDecision(BaseModel):
     manuscript_id: str
@@ -69,25 +234,38 @@ class EditorialDecision(BaseModel):
 # FUNCIONES DE EXTRACCIÓN DE TEXTO
 # ==========================================
 
-def extract_text_from_pdf(file_content: bytes) -> str:
+def extract_text_from_pdf(file_content: DocumentSource) -> str:
     """Extrae texto de un archivo PDF"""
+    return "".join(stream_text_from_pdf(file_content)).strip()
+
+def stream_text_from_pdf(file_content: DocumentSource,
+                         on_page: Optional[Callable[[int], None]] = None,
+                         on_timeout: Optional[Callable[[int], None]] = None) -> Iterator[str]:
+    """
+    Genera el texto de un archivo PDF página a página, en orden
+    Las páginas que agotan su tiempo salen vacías y se notifican a `on_timeout`
+    """
     try:
-        pdf_file = BytesIO(file_content)
-        pdf_reader = pypdf.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n\n"
-        return text.strip()
+        for index, page_text in enumerate(iter_pdf_pages(file_content, on_timeout=on_timeout)):
+            if index:
+                yield "\n\n"
+            yield page_text
+            if on_page is not None:
+                on_page(index + 1)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error al procesar PDF: {str(e)}")
 
-def extract_text_from_docx(file_content: bytes) -> str:
+def extract_text_from_docx(file_content: DocumentSource) -> str:
     """Extrae texto de un archivo Word (.docx)"""
+    return "".join(stream_text_from_docx(file_content)).strip()
+
+def stream_text_from_docx(file_content: DocumentSource) -> Iterator[str]:
+    """Genera el texto de un archivo Word párrafo a párrafo, con tablas, notas y encabezados"""
     try:
-        docx_file = BytesIO(file_content)
-        doc = Document(docx_file)
-        text = "\n\n".join([paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip()])
-        return text.strip()
+        for index, paragraph in enumerate(iter_docx_paragraphs(file_content)):
+            if index:
+                yield "\n\n"
+            yield paragraph
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error al procesar Word: {str(e)}")
 
@@ -97,43 +275,133 @@ def extract_text_from_docx(file_content: bytes) -> str:
 
 def analyze_text_quality(text: str) -> ManuscriptAnalysis:
     """Analiza la calidad y estructura del texto"""
+    return analyze_text_stream(iter_text_chunks(text))
+
+def analyze_text_stream(chunks: Iterable[str]) -> ManuscriptAnalysis:
+    """Analiza el texto en una sola pasada a partir de fragmentos sucesivos"""
+    stats = full_analyzer().feed_all(chunks).finish()
+    return build_manuscript_analysis(stats)
+
+def analyze_revision(text: str, known: Dict[str, Dict[str, Any]]) -> tuple:
+    """
+    Analiza un texto reutilizando los estados de párrafo ya conocidos
+    Devuelve el análisis, los estados de los párrafos nuevos y la huella de cada párrafo
+    """
+    stats, analyzed, hashes = analyze_paragraphs_incrementally(text, known)
+    return build_manuscript_analysis(stats), analyzed, hashes
+
+def partial_metrics(stats: StreamingTextAnalyzer) -> Dict[str, Any]:
+    """Métricas disponibles mientras el análisis aún está en curso"""
+    return {
+        "word_count": stats.word_count,
+        "sentence_count": stats.sentence_count,
+        "paragraph_count": stats.paragraph_count,
+        "avg_words_per_sentence": stats.avg_words_per_sentence,
+        "complex_word_ratio": stats.complex_word_ratio,
+        "estimated_reading_time_minutes": round(stats.word_count / 250, 1),
+    }
+
+def analyze_manuscript_file(path: str, file_type: str, job_id: Optional[str] = None,
+                            progress_channel: Any = None) -> FileAnalysisResult:
+    """
+    Extrae y analiza un archivo guardado en disco
+    Se ejecuta en el pool de procesos; con `job_id` informa del progreso en
+    la cola de trabajos, y con `progress_channel` envía además las métricas
+    parciales por esa cola compartida
+    """
+    if progress_channel is not None:
+        progress = QueueProgress(progress_channel)
+    else:
+        progress = JobProgress(job_store, job_id) if job_id else None
+    timings = StageTimings()
+    started = time.perf_counter()
+    pages_extracted = 0
+    timed_out_pages: List[int] = []
     
-    # Conteo de palabras
-    words = re.findall(r'\b\w+\b', text.lower())
-    word_count = len(words)
-    
-    # Conteo de oraciones
-    sentences = re.split(r'[.!?]+', text)
-    sentences = [s.strip() for s in sentences if s.strip()]
-    sentence_count = len(sentences)
+    def page_done(count: int):
+        nonlocal pages_extracted
+        pages_extracted = count
     
-    # Conteo de párrafos
-    paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
-    paragraph_count = len(paragraphs)
+    # Los PDF se analizan página a página y los Word párrafo a párrafo,
+    # sin construir el texto completo
+    if file_type == "pdf":
+        chunks = timings.timed_iter("extract", stream_text_from_pdf(
+            path, on_page=page_done, on_timeout=lambda index: timed_out_pages.append(index + 1)
+        ))
+    else:
+        chunks = coalesce_chunks(timings.timed_iter("extract", stream_text_from_docx(path)))
     
-    # Promedio palabras por oración
-    avg_words_per_sentence = round(word_count / sentence_count, 2) if sentence_count > 0 else 0
+    stats = full_analyzer(WORDPRESS_EXCERPT_LENGTH, fingerprint=FingerprintBuilder())
+    # Las métricas parciales solo se calculan cuando toca enviar el progreso
+    extra = {"metrics": partial(partial_metrics, stats)} if progress_channel is not None else {}
+    for chunk in chunks:
+        stats.feed(chunk)
+        if progress is not None:
+            progress.update(
+                pages_extracted=pages_extracted, words_analyzed=stats.word_count, **extra
+            )
+    stats.finish()
     
-    # Palabras complejas (más de 12 caracteres)
-    complex_words = [w for w in words if len(w) > 12]
-    complex_word_ratio = round(len(complex_words) / word_count, 3) if word_count > 0 else 0
+    if progress is not None:
+        progress.update(
+            force=True, pages_extracted=pages_extracted, words_analyzed=stats.word_count, **extra
+        )
+    analysis = build_manuscript_analysis(stats)
+    if timed_out_pages:
+        pages = ", ".join(str(page) for page in timed_out_pages[:10])
+        more = "..." if len(timed_out_pages) > 10 else ""
+        analysis.issues.append(
+            f"Páginas sin extraer por tiempo agotado ({len(timed_out_pages)}): {pages}{more}"
+        )
+    fingerprint = stats.fingerprint.build()
     
-    # Detectar problemas editoriales
-    issues = detect_editorial_issues(text, sentences, avg_words_per_sentence)
+    # El análisis es lo que resta del tiempo total una vez descontada la extracción
+    extract_seconds = timings.stages["extract"]["seconds"]
+    timings.add("extract", 0, bytes=os.path.getsize(path), words=stats.word_count)
+    timings.add(
+        "analyze", time.perf_counter() - started - extract_seconds,
+        bytes=stats.text_length, words=stats.word_count
+    )
+    return FileAnalysisResult(
+        analysis=analysis,
+        text_length=stats.text_length,
+        text_sha256=stats.text_sha256,
+        excerpt=stats.excerpt,
+        fingerprint=fingerprint,
+        stages=timings.stages,
+        timed_out_pages=timed_out_pages
+    )
+
+def fingerprint_manuscript_file(path: str, file_type: str):
+    """
+    Huella de plagio de un archivo guardado en disco, sin repetir el análisis
+    Se ejecuta en el pool de procesos. Las páginas y párrafos llegan separados
+    por saltos de línea, así que ninguna palabra queda partida entre fragmentos
+    """
+    chunks = stream_text_from_pdf(path) if file_type == "pdf" else stream_text_from_docx(path)
+    builder = FingerprintBuilder()
+    for chunk in chunks:
+        builder.update(WORD_PATTERN.findall(chunk.lower()))
+    return builder.build()
+
+def build_manuscript_analysis(stats: StreamingTextAnalyzer) -> ManuscriptAnalysis:
+    """Construye el análisis final a partir de las métricas acumuladas"""
+    word_count = stats.word_count
+    avg_words_per_sentence = stats.avg_words_per_sentence
     
-    # Palabras repetidas excesivamente
-    word_freq = {}
-    for word in words:
-        if len(word) > 4:  # Solo palabras significativas
-            word_freq[word] = word_freq.get(word, 0) + 1
+    repeated_phrases = stats.phrases.phrases(
+        limit=ANALYSIS_REPEATED_PHRASES, max_offsets=ANALYSIS_PHRASE_OFFSETS
+    ) if stats.phrases is not None else []
     
-    repeated_words = {word: count for word, count in word_freq.items() 
-                      if count > max(10, word_count // 100)}
+    # Detectar problemas editoriales
+    issues = detect_editorial_issues(
+        avg_words_per_sentence, stats.stutters(), repeated_phrases
+    )
     
     # Puntuación de calidad (0-100)
     quality_score = calculate_quality_score(
         word_count, avg_words_per_sentence, 
-        complex_word_ratio, len(issues), paragraph_count
+        stats.complex_word_ratio, len(issues), stats.paragraph_count
     )
     
     # Tiempo estimado de lectura (250 palabras por minuto)
@@ -141,17 +409,20 @@ def analyze_text_quality(text: str) -> ManuscriptAnalysis:
     
     return ManuscriptAnalysis(
         word_count=word_count,
-        sentence_count=sentence_count,
-        paragraph_count=paragraph_count,
+        sentence_count=stats.sentence_count,
+        paragraph_count=stats.paragraph_count,
         avg_words_per_sentence=avg_words_per_sentence,
-        complex_word_ratio=complex_word_ratio,
+        complex_word_ratio=stats.complex_word_ratio,
         quality_score=quality_score,
         issues=issues,
-        repeated_words=repeated_words,
-        estimated_reading_time_minutes=estimated_reading_time
+        repeated_words=stats.repeated_words(),
+        repeated_phrases=repeated_phrases,
+        estimated_reading_time_minutes=estimated_reading_time,
+        style=stats.style.profile(stats.phrases) if stats.style is not None else {}
     )
 
-def detect_editorial_issues(text: str, sentences: list, avg_words: float) -> List[str]:
+def detect_editorial_issues(avg_words: float, repeated_tokens: Optional[List[str]] = None,
+                            repeated_phrases: Optional[List[Dict[str, Any]]] = None) -> List[str]:
     """Detecta problemas editoriales comunes"""
     issues = []
     
@@ -160,13 +431,17 @@ def detect_editorial_issues(text: str, sentences: list, avg_words: float) -> Lis
     elif avg_words < 10:
         issues.append("Oraciones demasiado cortas (promedio < 10 palabras)")
     
-    # Detección de repeticiones excesivas
-    words = text.lower().split()
-    if len(words) > 0:
-        for i in range(len(words) - 2):
-            if words[i] == words[i+1] == words[i+2]:
-                issues.append(f"Repetición excesiva detectada: '{words[i]}'")
-                break
+    # Repetición de la misma palabra tres veces seguidas
+    for token in (repeated_tokens or [])[:3]:
+        issues.append(f"Repetición excesiva detectada: '{token}'")
+    
+    # Frases recicladas a lo largo del manuscrito
+    recycled = [
+        f"'{phrase['phrase']}' ({phrase['count']} veces)" for phrase in repeated_phrases or []
+        if phrase["words"] >= PHRASE_ISSUE_MIN_WORDS and phrase["count"] >= PHRASE_ISSUE_MIN_REPEATS
+    ]
+    if recycled:
+        issues.append(f"Frases repetidas: {', '.join(recycled[:3])}")
     
     return issues
 
@@ -190,6 +465,500 @@ def calculate_quality_score(word_count: int, avg_words: float,
     
     return max(0, min(100, score))
 
+# ==========================================
+# ESTIMACIÓN POR MUESTREO
+# ==========================================
+
+def metric_interval(estimate: float, low: Optional[float], high: Optional[float],
+                    digits: int = 0) -> MetricInterval:
+    def rounded(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(value, digits)
+    return MetricInterval(estimate=rounded(estimate), low=rounded(low), high=rounded(high))
+
+def estimate_manuscript_file(path: str, sample_pages: int = ESTIMATE_SAMPLE_PAGES,
+                             seed: Optional[int] = None) -> ManuscriptEstimate:
+    """
+    Estima el análisis de un PDF leyendo solo una muestra de sus páginas
+    
+    Se ejecuta en el pool de procesos. Las páginas se eligen al azar dentro
+    de tramos consecutivos del documento; si las primeras leídas no tienen
+    texto, se abandona enseguida y se marca el PDF como escaneado. Los
+    problemas y repeticiones se detectan sobre el texto de la muestra.
+    """
+    started = time.perf_counter()
+    visited = []
+    stopped_early = False
+    try:
+        with PdfPageSample(path, sample_pages, seed) as sample:
+            page_count = sample.page_count
+            for page in sample:
+                visited.append(page)
+                if (len(visited) == ESTIMATE_SCAN_CHECK_PAGES < len(sample.indices)
+                        and not any(p.has_text for p in visited)):
+                    stopped_early = True
+                    break
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error al procesar PDF: {str(e)}")
+    if not page_count:
+        raise HTTPException(status_code=400, detail="El PDF no tiene páginas")
+    
+    visited.sort(key=lambda page: page.index)
+    intervals = estimate_document(
+        [page_counts(page.text, page.index == page_count - 1) for page in visited], page_count
+    )
+    
+    def sample_chunks() -> Iterator[str]:
+        for index, page in enumerate(visited):
+            if index:
+                yield "\n\n"
+            yield page.text
+    # Los capítulos y ventanas de unas páginas sueltas no describen el libro:
+    # la muestra no lleva perfiles de estilo
+    sample_analysis = build_manuscript_analysis(StreamingTextAnalyzer(
+        phrases=RepeatedPhraseDetector()
+    ).feed_all(coalesce_chunks(sample_chunks())).finish())
+    
+    word_count, sentence_count, paragraph_count = (
+        round(intervals[name][0]) for name in ("word_count", "sentence_count", "paragraph_count")
+    )
+    avg_words = round(intervals["avg_words_per_sentence"][0], 2)
+    complex_ratio = round(intervals["complex_word_ratio"][0], 3)
+    analysis = sample_analysis.copy(update={
+        "word_count": word_count,
+        "sentence_count": sentence_count,
+        "paragraph_count": paragraph_count,
+        "avg_words_per_sentence": avg_words,
+        "complex_word_ratio": complex_ratio,
+        "quality_score": calculate_quality_score(
+            word_count, avg_words, complex_ratio, len(sample_analysis.issues), paragraph_count
+        ),
+        "estimated_reading_time_minutes": round(word_count / 250, 1),
+    })
+    
+    words = intervals["word_count"]
+    scanned = [page for page in visited if page.scanned]
+    scanned_ratio = [
+        value / page_count if value is not None else None
+        for value in estimate_total([page.scanned for page in visited], page_count)
+    ]
+    return ManuscriptEstimate(
+        analysis=analysis,
+        intervals={
+            "word_count": metric_interval(*words),
+            "sentence_count": metric_interval(*intervals["sentence_count"]),
+            "paragraph_count": metric_interval(*intervals["paragraph_count"]),
+            "avg_words_per_sentence": metric_interval(*intervals["avg_words_per_sentence"], 2),
+            "complex_word_ratio": metric_interval(*intervals["complex_word_ratio"], 3),
+            "estimated_reading_time_minutes": metric_interval(*(
+                value / 250 if value is not None else None for value in words
+            ), 1),
+        },
+        page_count=page_count,
+        sampled_pages=[page.index + 1 for page in visited],
+        scanned_pages=[page.index + 1 for page in scanned],
+        scanned_ratio=metric_interval(*scanned_ratio, 3),
+        likely_scanned=stopped_early or scanned_ratio[0] >= ESTIMATE_SCANNED_RATIO,
+        stopped_early=stopped_early,
+        seconds=round(time.perf_counter() - started, 4)
+    )
+
+# ==========================================
+# CACHÉ DE ANÁLISIS
+# ==========================================
+
+async def analyze_content_cached(text: str) -> ManuscriptAnalysis:
+    """Analiza un texto reutilizando el resultado si ya se analizó antes"""
+    key = f"text:{sha256_text(text)}"
+    cached = analysis_cache.get(key)
+    if cached is not None:
+        return ManuscriptAnalysis(**cached)
+    
+    with metrics.stage("analyze", bytes=len(text)) as stage:
+        analysis = await worker_pool.run(analyze_text_quality, text)
+        stage.words = analysis.word_count
+    analysis_cache.put(key, analysis.dict())
+    return analysis
+
+async def analyze_submission(manuscript_id: str, text: str,
+                             parent: Optional[Dict[str, Any]] = None) -> tuple:
+    """
+    Analiza un texto enviado guardando el estado de cada párrafo
+    
+    Con `parent` (la versión anterior) solo se analizan los párrafos que
+    cambiaron; devuelve también el resumen de cambios frente a ella.
+    """
+    parent_id = parent["manuscript_id"] if parent else None
+    previous, known = await asyncio.to_thread(paragraph_store.load, parent_id) \
+        if parent_id else ([], {})
+    
+    key = f"text:{sha256_text(text)}"
+    cached = analysis_cache.get(key)
+    if cached is not None:
+        # Texto ya analizado; si llegó por /analyze o en un archivo, sus
+        # párrafos aún no tienen estado y se analizan solo esos
+        analysis = ManuscriptAnalysis(**cached)
+        hashes = await asyncio.to_thread(paragraph_hashes, text)
+        missing = await asyncio.to_thread(paragraph_store.missing, hashes)
+        analyzed = await worker_pool.run(analyze_missing_paragraphs, text, missing) \
+            if missing else {}
+    else:
+        with metrics.stage("analyze", bytes=len(text)) as stage:
+            analysis, analyzed, hashes = await worker_pool.run(analyze_revision, text, known)
+            stage.words = analysis.word_count
+        analysis_cache.put(key, analysis.dict())
+    await asyncio.to_thread(paragraph_store.save, manuscript_id, parent_id, hashes, analyzed)
+    
+    if parent is None:
+        return analysis, None
+    return analysis, {
+        "parent_manuscript_id": parent_id,
+        "paragraphs": paragraph_changes(previous, hashes, len(analyzed)),
+        "changes": diff_analyses(parent["analysis"] or {}, analysis.dict())
+    }
+
+def cached_upload(file_sha256: str) -> Optional[FileAnalysisResult]:
+    """Análisis ya guardado de un archivo recibido antes"""
+    cached = analysis_cache.get(f"file:{file_sha256}")
+    return FileAnalysisResult(**cached) if cached is not None else None
+
+async def with_fingerprint(result: FileAnalysisResult, path: str,
+                           file_type: str) -> FileAnalysisResult:
+    """
+    Completa la huella de un análisis sacado de caché si su texto aún no está
+    en el índice de plagio (p. ej. un envío anterior que falló antes de indexarse)
+    """
+    if result.fingerprint is not None or result.text_length < MIN_TEXT_LENGTH:
+        return result
+    if not await asyncio.to_thread(plagiarism_index.contains_text, result.text_sha256):
+        result.fingerprint = await worker_pool.run(fingerprint_manuscript_file, path, file_type)
+    return result
+
+async def analyze_upload_cached(file_sha256: str, path: str, file_type: str,
+                                job_id: Optional[str] = None,
+                                progress_channel: Any = None) -> FileAnalysisResult:
+    """Extrae y analiza un archivo salvo que ya se haya recibido antes"""
+    key = f"file:{file_sha256}"
+    cached = cached_upload(file_sha256)
+    if cached is not None:
+        return await with_fingerprint(cached, path, file_type)
+    
+    result = await worker_pool.run(
+        analyze_manuscript_file, path, file_type, job_id, progress_channel
+    )
+    metrics.observe_stages(result.stages)
+    if result.timed_out_pages:
+        # Otro intento puede extraer esas páginas: el resultado incompleto no se guarda
+        return result
+    analysis_cache.put(key, result.dict(exclude={"fingerprint", "stages"}))
+    # El mismo texto enviado después como contenido también se reutiliza
+    analysis_cache.put(f"text:{result.text_sha256}", result.analysis.dict())
+    return result
+
+# ==========================================
+# FUNCIONES AUXILIARES DE ENVÍO
+# ==========================================
+
+def serialize_response(content: Any) -> JSONResponse:
+    """Serializa la respuesta JSON midiendo la etapa de serialización"""
+    with metrics.stage("serialize") as stage:
+        response = JSONResponse(jsonable_encoder(content))
+        stage.bytes = len(response.body)
+    return response
+
+def detect_file_type(filename: str) -> Optional[str]:
+    """Tipo de documento según la extensión: 'pdf', 'docx' o None"""
+    filename_lower = (filename or "").lower()
+    if filename_lower.endswith('.pdf'):
+        return "pdf"
+    if filename_lower.endswith('.docx'):
+        return "docx"
+    return None
+
+def auto_decide(quality_score: int) -> str:
+    """Decisión automática según la puntuación de calidad"""
+    auto_decision = "accepted" if quality_score >= 80 else "review_needed"
+    if quality_score < 50:
+        auto_decision = "rejected"
+    return auto_decision
+
+def ensure_extracted_text(result: FileAnalysisResult) -> None:
+    """Valida que se extrajo texto suficiente del archivo"""
+    if result.text_length < MIN_TEXT_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail="No se pudo extraer texto suficiente del archivo."
+                   " Verifica que el archivo contenga texto."
+        )
+
+def build_upload_response(manuscript_id: str, filename: str, size: int,
+                          result: FileAnalysisResult, title: str = "", author: str = "",
+                          email: str = "", genre: str = "",
+                          percentiles: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Respuesta común para los archivos analizados"""
+    analysis = result.analysis
+    return {
+        "manuscript_id": manuscript_id,
+        "status": "received",
+        "submission_date": datetime.now().isoformat(),
+        "file_info": {
+            "filename": filename,
+            "size_kb": round(size / 1024, 2),
+            "type": "PDF" if detect_file_type(filename) == "pdf" else "Word"
+        },
+        "author": author,
+        "title": title or filename,
+        "email": email,
+        "genre": genre,
+        "full_analysis": analysis.dict(),
+        "percentiles": percentiles,
+        "auto_decision": auto_decide(analysis.quality_score),
+        "message": f"Archivo '{filename}' procesado exitosamente. ID: {manuscript_id}"
+    }
+
+async def index_manuscript(manuscript_id: str, title: str, result: FileAnalysisResult) -> None:
+    """Añade el manuscrito al índice de plagio (sin huella, su texto ya estaba indexado)"""
+    if result.fingerprint is not None:
+        await asyncio.to_thread(
+            plagiarism_index.add, manuscript_id, result.fingerprint, title, result.text_sha256
+        )
+
+def store_manuscript(manuscript_id: str, source: str, title: str, analysis: ManuscriptAnalysis,
+                     text_sha256: str, author: str = "", email: str = "", genre: str = "",
+                     filename: Optional[str] = None, size: Optional[int] = None,
+                     submitted_at: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Registra el manuscrito y su análisis en el almacén persistente
+    
+    Devuelve el percentil de cada métrica entre los manuscritos del mismo
+    género recibidos antes, y añade este al corpus.
+    """
+    manuscript_store.add(
+        manuscript_id, title, source, analysis=analysis.dict(), author=author, email=email,
+        genre=genre, filename=filename, size=size, text_sha256=text_sha256,
+        auto_decision=auto_decide(analysis.quality_score), submitted_at=submitted_at
+    )
+    return corpus_percentiles.rank_and_observe(
+        genre, {metric: getattr(analysis, metric) for metric in PERCENTILE_METRICS}
+    )
+
+async def index_submitted_text(manuscript_id: str, title: str, text: str) -> None:
+    """Añade un texto enviado al índice de plagio si aún no estaba"""
+    text_sha256 = sha256_text(text)
+    if not await asyncio.to_thread(plagiarism_index.contains_text, text_sha256):
+        fingerprint = await worker_pool.run(fingerprint_text, text)
+        await asyncio.to_thread(
+            plagiarism_index.add, manuscript_id, fingerprint, title, text_sha256
+        )
+
+# ==========================================
+# ANÁLISIS POR LOTES
+# ==========================================
+
+async def _ready_upload(upload: SpooledUpload) -> SpooledUpload:
+    return upload
+
+async def _failed_upload(error: HTTPException) -> SpooledUpload:
+    raise error
+
+async def analyze_with_retry(file_sha256: str, path: str, file_type: str) -> FileAnalysisResult:
+    """Como analyze_upload_cached, pero espera y reintenta si el pool está lleno"""
+    delay = 0.5
+    for attempt in range(BATCH_RETRIES):
+        try:
+            return await analyze_upload_cached(file_sha256, path, file_type)
+        except HTTPException as e:
+            if e.status_code != 503 or attempt == BATCH_RETRIES - 1:
+                raise
+            await asyncio.sleep(delay)
+            delay *= 2
+
+def batch_error(filename: str, status_code: int, detail: Any) -> Dict[str, Any]:
+    return {
+        "status": "error",
+        "file_info": {"filename": filename},
+        "status_code": status_code,
+        "detail": detail
+    }
+
+async def analyze_batch_entry(filename: str, load: Callable[[], Awaitable[SpooledUpload]],
+                              slots: asyncio.Semaphore, genre: str = "") -> Dict[str, Any]:
+    """Analiza un archivo del lote; los errores se devuelven como una línea más"""
+    async with slots:
+        try:
+            file_type = detect_file_type(filename)
+            if file_type is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Formato no soportado. Solo se aceptan archivos .pdf o .docx"
+                )
+            with await load() as upload:
+                result = await analyze_with_retry(upload.sha256, upload.path, file_type)
+            ensure_extracted_text(result)
+        except HTTPException as e:
+            return batch_error(filename, e.status_code, e.detail)
+        except Exception as e:
+            # Un archivo dañado dentro del ZIP no interrumpe el resto del lote
+            return batch_error(filename, 400, f"Error al leer el archivo: {str(e)}")
+    
+    manuscript_id = str(uuid.uuid4())[:12]
+    await index_manuscript(manuscript_id, filename, result)
+    percentiles = store_manuscript(
+        manuscript_id, "batch", filename, result.analysis, result.text_sha256,
+        genre=genre, filename=filename, size=upload.size
+    )
+    return build_upload_response(
+        manuscript_id, filename, upload.size, result, genre=genre, percentiles=percentiles
+    )
+
+async def stream_batch_results(entries: List[tuple], uploads: List[SpooledUpload],
+                               genre: str = "") -> AsyncIterator[str]:
+    """Emite una línea NDJSON por manuscrito en cuanto termina su análisis"""
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(analyze_batch_entry(filename, load, slots, genre))
+        for filename, load in entries
+    ]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            result = await finished
+            with metrics.stage("serialize") as stage:
+                line = json.dumps(result, ensure_ascii=False) + "\n"
+                stage.bytes = len(line)
+            yield line
+    finally:
+        for task in tasks:
+            task.cancel()
+        for upload in uploads:
+            upload.close()
+
+# ==========================================
+# PROGRESO EN STREAMING (SERVER-SENT EVENTS)
+# ==========================================
+
+def sse_event(event: str, data: Any) -> str:
+    """Serializa un evento server-sent con los datos en una sola línea JSON"""
+    payload = json.dumps(jsonable_encoder(data), ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+async def analyze_upload_with_progress(upload: SpooledUpload,
+                                       file_type: str) -> AsyncIterator[Any]:
+    """
+    Analiza el archivo y genera, en cada sondeo, el progreso más reciente
+    (None si no llegó ninguno); el último elemento es el FileAnalysisResult
+    """
+    cached = cached_upload(upload.sha256)
+    if cached is not None:
+        yield await with_fingerprint(cached, upload.path, file_type)
+        return
+    
+    # La cola vive en el proceso del Manager: cada acceso es una llamada
+    # bloqueante, así que se hace en un hilo y no en el bucle de eventos
+    channel = await asyncio.to_thread(worker_pool.progress_channel)
+    task = asyncio.ensure_future(analyze_upload_cached(
+        upload.sha256, upload.path, file_type, progress_channel=channel
+    ))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=SSE_POLL_SECONDS)
+            # Si se acumularon varios mensajes, solo interesa el más reciente
+            messages = await asyncio.to_thread(drain_progress, channel)
+            yield messages[-1] if messages else None
+            if done:
+                break
+    finally:
+        task.cancel()
+    yield task.result()
+
+async def stream_upload_events(upload: SpooledUpload, file_type: str, filename: str,
+                               title: str = "", author: str = "", email: str = "",
+                               genre: str = "") -> AsyncIterator[str]:
+    """
+    Eventos de un análisis en curso: start, progress, y result o error
+    Entre eventos se envía un comentario periódico para que los proxies no
+    cierren la conexión por inactividad
+    """
+    manuscript_id = str(uuid.uuid4())[:12]
+    yield sse_event("start", {
+        "manuscript_id": manuscript_id,
+        "file_info": {"filename": filename, "size_kb": round(upload.size / 1024, 2)}
+    })
+    
+    result = None
+    last_sent = time.monotonic()
+    try:
+        with upload:
+            async for item in analyze_upload_with_progress(upload, file_type):
+                if isinstance(item, FileAnalysisResult):
+                    result = item
+                elif item is not None:
+                    yield sse_event("progress", item)
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= SSE_HEARTBEAT_SECONDS:
+                    yield ": keep-alive\n\n"
+                    last_sent = time.monotonic()
+        ensure_extracted_text(result)
+    except HTTPException as e:
+        yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+        return
+    except Exception as e:
+        # La respuesta ya empezó con 200: el fallo solo puede llegar como evento
+        yield sse_event("error", {"status_code": 500, "detail": f"Error al analizar: {str(e)}"})
+        return
+    
+    await index_manuscript(manuscript_id, title or filename, result)
+    percentiles = store_manuscript(
+        manuscript_id, "upload", title or filename, result.analysis, result.text_sha256,
+        author=author, email=email, genre=genre, filename=filename, size=upload.size
+    )
+    with metrics.stage("serialize") as stage:
+        event = sse_event("result", build_upload_response(
+            manuscript_id, filename, upload.size, result,
+            title=title, author=author, email=email, genre=genre, percentiles=percentiles
+        ))
+        stage.bytes = len(event)
+    yield event
+
+# ==========================================
+# TRABAJOS EN SEGUNDO PLANO
+# ==========================================
+
+def discard_file(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+async def run_upload_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Extrae y analiza en segundo plano un archivo encolado"""
+    payload = job["payload"]
+    if not os.path.exists(payload["path"]):
+        raise HTTPException(status_code=410, detail="El archivo del trabajo ya no existe")
+    
+    try:
+        result = await analyze_upload_cached(
+            payload["sha256"], payload["path"], payload["file_type"], job["id"]
+        )
+        ensure_extracted_text(result)
+    except HTTPException as e:
+        # Con el pool lleno el trabajo se reintenta y necesita el archivo
+        if e.status_code != 503:
+            discard_file(payload["path"])
+        raise
+    discard_file(payload["path"])
+    await index_manuscript(job["id"], payload["title"] or payload["filename"], result)
+    percentiles = store_manuscript(
+        job["id"], "upload", payload["title"] or payload["filename"], result.analysis,
+        result.text_sha256, author=payload["author"], email=payload["email"],
+        genre=payload["genre"], filename=payload["filename"], size=payload["size"],
+        submitted_at=job["created_at"]
+    )
+    
+    return build_upload_response(
+        job["id"], payload["filename"], payload["size"], result,
+        title=payload["title"], author=payload["author"],
+        email=payload["email"], genre=payload["genre"], percentiles=percentiles
+    )
+
+job_runner.register("upload", run_upload_job)
+
 # ==========================================
 # ENDPOINTS DE LA API
 # ==========================================
@@ -201,33 +970,79 @@ async def health_check():
         "status": "healthy",
         "service": "Ecdotica Editorial API",
         "version": "3.0.0",
-        "features": ["text_analysis", "pdf_processing", "docx_processing", "wordpress_integration"]
+        "features": ["text_analysis", "pdf_processing", "docx_processing", "wordpress_integration"],
+        "workers": worker_pool.stats(),
+        "cache": analysis_cache.stats(),
+        "wordpress": wordpress_publisher.stats(),
+        "modules": lazy_status()
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Métricas en formato de exposición de Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/profiles")
+async def list_profiles():
+    """
+    Perfiles guardados de las peticiones lentas
+    
+    Se activan con ECDOTICA_PROFILE_SLOW_SECONDS (umbral en segundos).
+    """
+    return {
+        "enabled": slow_request_profiler.enabled,
+        "threshold_seconds": slow_request_profiler.threshold,
+        "profiles": await asyncio.to_thread(slow_request_profiler.list)
+    }
+
+@app.get("/metrics/profiles/{name}", response_class=PlainTextResponse)
+async def get_profile(name: str):
+    """Funciones con más tiempo acumulado en un perfil guardado"""
+    report = await asyncio.to_thread(slow_request_profiler.report, name)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"Perfil {name} no encontrado")
+    return report
+
 @app.post("/api/v1/manuscripts/submit")
 async def submit_manuscript(submission: ManuscriptSubmission):
     """Recibe y analiza un manuscrito enviado como texto"""
     
     manuscript_id = str(uuid.uuid4())[:12]
     
-    # Analizar el contenido
-    analysis = analyze_text_quality(submission.content)
+    parent = None
+    if submission.parent_manuscript_id:
+        parent = await asyncio.to_thread(manuscript_store.get, submission.parent_manuscript_id)
+        if parent is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Manuscrito {submission.parent_manuscript_id} no encontrado"
+            )
+    
+    # Analizar el contenido fuera del bucle de eventos
+    analysis, revision = await analyze_submission(manuscript_id, submission.content, parent)
+    await index_submitted_text(manuscript_id, submission.title, submission.content)
+    percentiles = store_manuscript(
+        manuscript_id, "text", submission.title, analysis, sha256_text(submission.content),
+        author=submission.author, email=submission.email, genre=submission.genre or ""
+    )
     
     # Decidir automáticamente
-    auto_decision = "accepted" if analysis.quality_score >= 80 else "review_needed"
-    if analysis.quality_score < 50:
-        auto_decision = "rejected"
+    auto_decision = auto_decide(analysis.quality_score)
     
-    return {
+    response = {
         "manuscript_id": manuscript_id,
         "status": "received",
         "submission_date": datetime.now().isoformat(),
         "author": submission.author,
         "title": submission.title,
         "preliminary_analysis": analysis.dict(),
+        "percentiles": percentiles,
         "auto_decision": auto_decision,
         "message": f"Manuscrito '{submission.title}' recibido. ID: {manuscript_id}"
     }
+    if revision is not None:
+        response["revision"] = revision
+    return serialize_response(response)
 
 @app.post("/api/v1/manuscripts/upload")
 async def upload_manuscript_file(
@@ -246,156 +1061,428 @@ async def upload_manuscript_file(
     - Tamaño máximo: 10MB
     """
     
-    # Validar tamaño del archivo (10MB max)
-    MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+    # Leer el archivo por fragmentos, rechazando en cuanto supere 10MB
+    upload = await spool_upload(file, MAX_FILE_SIZE)
     
-    # Leer contenido del archivo
-    file_content = await file.read()
+    with upload:
+        # Extraer texto según el tipo de archivo
+        file_type = detect_file_type(file.filename)
+        if file_type is None:
+            raise HTTPException(
+                status_code=400,
+                detail="Formato no soportado. Solo se aceptan archivos .pdf o .docx"
+            )
+        
+        # Extracción y análisis en el pool de procesos
+        result = await analyze_upload_cached(upload.sha256, upload.path, file_type)
     
-    if len(file_content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=413,
-            detail="Archivo demasiado grande. Máximo 10MB permitido."
-        )
+    ensure_extracted_text(result)
     
-    # Extraer texto según el tipo de archivo
-    filename_lower = file.filename.lower()
+    # Generar ID del manuscrito
+    manuscript_id = str(uuid.uuid4())[:12]
+    await index_manuscript(manuscript_id, title or file.filename, result)
+    percentiles = store_manuscript(
+        manuscript_id, "upload", title or file.filename, result.analysis, result.text_sha256,
+        author=author, email=email, genre=genre, filename=file.filename, size=upload.size
+    )
     
-    if filename_lower.endswith('.pdf'):
-        text = extract_text_from_pdf(file_content)
-    elif filename_lower.endswith('.docx'):
-        text = extract_text_from_docx(file_content)
-    else:
+    return serialize_response(build_upload_response(
+        manuscript_id, file.filename, upload.size, result,
+        title=title, author=author, email=email, genre=genre, percentiles=percentiles
+    ))
+
+@app.post("/api/v1/manuscripts/upload-stream")
+async def upload_manuscript_file_stream(
+    file: UploadFile = File(...),
+    title: str = "",
+    author: str = "",
+    email: str = "",
+    genre: str = ""
+):
+    """
+    Recibe y analiza un archivo PDF o Word informando del progreso
+    
+    Responde con server-sent events (text/event-stream):
+    - start: ID asignado al manuscrito
+    - progress: páginas extraídas, palabras analizadas y métricas parciales
+    - result: la misma respuesta que /api/v1/manuscripts/upload
+    - error: código y detalle si el análisis falla
+    """
+    upload = await spool_upload(file, MAX_FILE_SIZE)
+    
+    file_type = detect_file_type(file.filename)
+    if file_type is None:
+        upload.close()
         raise HTTPException(
             status_code=400,
             detail="Formato no soportado. Solo se aceptan archivos .pdf o .docx"
         )
     
-    # Validar que se extrajo texto
-    if not text or len(text) < 100:
+    return StreamingResponse(
+        stream_upload_events(upload, file_type, file.filename, title, author, email, genre),
+        media_type="text/event-stream",
+        # Sin caché ni búfer intermedio (nginx) para que cada evento llegue al momento
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/v1/manuscripts/estimate")
+async def estimate_manuscript(
+    file: UploadFile = File(...),
+    genre: str = "general",
+    sample_pages: int = ESTIMATE_SAMPLE_PAGES,
+    seed: Optional[int] = None
+):
+    """
+    Estimación rápida de un PDF grande a partir de una muestra de páginas
+    
+    Para el triaje: extrae `sample_pages` páginas repartidas por todo el
+    documento y devuelve las métricas extrapoladas con su intervalo de
+    confianza del 95 %, y las páginas muestreadas sin capa de texto. El
+    manuscrito no se registra. Si el archivo ya se analizó completo se
+    devuelve ese análisis exacto.
+    """
+    if not 2 <= sample_pages <= ESTIMATE_MAX_SAMPLE_PAGES:
         raise HTTPException(
             status_code=400,
-            detail="No se pudo extraer texto suficiente del archivo. Verifica que el archivo contenga texto."
+            detail=f"sample_pages debe estar entre 2 y {ESTIMATE_MAX_SAMPLE_PAGES}"
         )
+    upload = await spool_upload(file, ESTIMATE_MAX_FILE_SIZE)
     
-    # Generar ID del manuscrito
-    manuscript_id = str(uuid.uuid4())[:12]
-    
-    # Analizar el contenido extraido
-    analysis = analyze_text_quality(text)
+    with upload:
+        if detect_file_type(file.filename) != "pdf":
+            raise HTTPException(
+                status_code=400, detail="La estimación por muestreo solo admite archivos .pdf"
+            )
+        full = cached_upload(upload.sha256)
+        if full is None:
+            with metrics.stage("estimate", bytes=upload.size):
+                estimate = await worker_pool.run(
+                    estimate_manuscript_file, upload.path, sample_pages, seed
+                )
     
-    # Decisión automática
-    auto_decision = "accepted" if analysis.quality_score >= 80 else "review_needed"
-    if analysis.quality_score < 50:
-        auto_decision = "rejected"
+    if full is not None:
+        analysis = full.analysis
+        intervals = {
+            metric: MetricInterval(
+                estimate=getattr(analysis, metric), low=getattr(analysis, metric),
+                high=getattr(analysis, metric)
+            )
+            for metric in ESTIMATED_METRICS
+        }
+        sampling = None
+    else:
+        analysis, intervals = estimate.analysis, estimate.intervals
+        sampling = estimate.dict(exclude={"analysis", "intervals"})
     
-    return {
-        "manuscript_id": manuscript_id,
-        "status": "received",
-        "submission_date": datetime.now().isoformat(),
+    genre_criteria, evaluation = evaluate_length(analysis.word_count, genre)
+    return serialize_response({
+        "status": "estimated",
+        "exact": full is not None,
         "file_info": {
             "filename": file.filename,
-            "size_kb": round(len(file_content) / 1024, 2),
-            "type": "PDF" if filename_lower.endswith('.pdf') else "Word"
+            "size_kb": round(upload.size / 1024, 2),
+            "type": "PDF"
         },
+        "estimate": analysis.dict(),
+        "confidence_level": CONFIDENCE_LEVEL,
+        "confidence_intervals": {metric: value.dict() for metric, value in intervals.items()},
+        "sampling": sampling,
+        "evaluation": evaluation,
+        "percentiles": corpus_percentiles.rank(
+            genre, {metric: getattr(analysis, metric) for metric in PERCENTILE_METRICS}
+        ),
+        "message": (
+            "El PDF parece escaneado: no tiene capa de texto en las páginas muestreadas"
+            if sampling is not None and sampling["likely_scanned"]
+            else f"Estimación de '{file.filename}' lista"
+        )
+    })
+
+@app.post("/api/v1/manuscripts/upload-async", status_code=202)
+async def upload_manuscript_file_async(
+    file: UploadFile = File(...),
+    title: str = "",
+    author: str = "",
+    email: str = "",
+    genre: str = ""
+):
+    """
+    Encola el análisis de un archivo PDF o Word y responde de inmediato
+    
+    El progreso y el resultado se consultan en /api/v1/manuscripts/{id}/status
+    """
+    upload = await spool_upload(file, MAX_FILE_SIZE)
+    
+    with upload:
+        file_type = detect_file_type(file.filename)
+        if file_type is None:
+            raise HTTPException(
+                status_code=400,
+                detail="Formato no soportado. Solo se aceptan archivos .pdf o .docx"
+            )
+        
+        # El archivo se conserva junto a la cola para sobrevivir a reinicios
+        manuscript_id = str(uuid.uuid4())[:12]
+        path = upload.keep(data_path("jobs", "files", manuscript_id + "." + file_type))
+    
+    await job_runner.submit(manuscript_id, "upload", {
+        "path": path,
+        "file_type": file_type,
+        "sha256": upload.sha256,
+        "filename": file.filename,
+        "size": upload.size,
+        "title": title,
         "author": author,
-        "title": title or file.filename,
         "email": email,
-        "genre": genre,
-        "full_analysis": analysis.dict(),
-        "auto_decision": auto_decision,
-        "message": f"Archivo '{file.filename}' procesado exitosamente. ID: {manuscript_id}"
+        "genre": genre
+    })
+    
+    return {
+        "manuscript_id": manuscript_id,
+        "status": "queued",
+        "submission_date": datetime.now().isoformat(),
+        "status_url": f"/api/v1/manuscripts/{manuscript_id}/status",
+        "message": f"Archivo '{file.filename}' en cola de análisis. ID: {manuscript_id}"
+    }
+
+@app.post("/api/v1/manuscripts/batch")
+async def upload_manuscript_batch(
+    files: List[UploadFile] = File(...),
+    genre: str = ""
+):
+    """
+    Analiza muchos archivos PDF o Word a la vez, sueltos o dentro de un ZIP
+    
+    Responde en NDJSON: una línea por manuscrito, en el orden en que
+    terminan, con los mismos campos que /api/v1/manuscripts/upload
+    """
+    uploads: List[SpooledUpload] = []
+    entries: List[tuple] = []
+    try:
+        for file in files:
+            if (file.filename or "").lower().endswith(".zip"):
+                archive = await spool_upload(file, MAX_BATCH_ARCHIVE_SIZE)
+                uploads.append(archive)
+                for member in list_zip_documents(archive.path, MAX_BATCH_FILES):
+                    entries.append((member, partial(
+                        asyncio.to_thread, spool_zip_member, archive.path, member, MAX_FILE_SIZE
+                    )))
+                continue
+            
+            try:
+                upload = await spool_upload(file, MAX_FILE_SIZE)
+            except HTTPException as e:
+                entries.append((file.filename, partial(_failed_upload, e)))
+                continue
+            uploads.append(upload)
+            entries.append((file.filename, partial(_ready_upload, upload)))
+        
+        if len(entries) > MAX_BATCH_FILES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Demasiados archivos en el lote. Máximo {MAX_BATCH_FILES} permitidos."
+            )
+    except BaseException:
+        for upload in uploads:
+            upload.close()
+        raise
+    
+    return StreamingResponse(
+        stream_batch_results(entries, uploads, genre),
+        media_type="application/x-ndjson"
+    )
+
+@app.get("/api/v1/manuscripts")
+async def list_manuscripts(
+    status: Optional[str] = None,
+    genre: Optional[str] = None,
+    min_score: Optional[int] = None,
+    max_score: Optional[int] = None,
+    sort: str = "submitted_at",
+    order: str = "desc",
+    limit: int = 50,
+    cursor: Optional[str] = None
+):
+    """
+    Lista los manuscritos registrados, filtrados y paginados
+    
+    Para pedir la página siguiente se pasa como `cursor` el `next_cursor`
+    de la respuesta anterior.
+    """
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Orden no válido. Opciones: asc, desc")
+    return await asyncio.to_thread(
+        manuscript_store.list, status=status, genre=genre, min_score=min_score,
+        max_score=max_score, sort=sort, descending=order == "desc", limit=limit, cursor=cursor
+    )
+
+@app.get("/api/v1/manuscripts/{manuscript_id}/status")
+async def get_manuscript_status(manuscript_id: str):
+    """Estado, progreso y resultado de un análisis encolado"""
+    job = await asyncio.to_thread(job_store.get, manuscript_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Manuscrito {manuscript_id} no encontrado")
+    
+    return {
+        "manuscript_id": manuscript_id,
+        "status": job["status"],
+        "progress": job["progress"],
+        "submitted_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "result": job["result"],
+        "error": job["error"]
     }
 
 @app.post("/api/v1/manuscripts/analyze")
 async def analyze_manuscript(submission: ManuscriptSubmission):
     """Análisis detallado sin enviar"""
-    analysis = analyze_text_quality(submission.content)
-    return {
+    analysis = await analyze_content_cached(submission.content)
+    return serialize_response({
         "title": submission.title,
         "author": submission.author,
         "detailed_analysis": analysis.dict()
-    }
+    })
 
 @app.post("/api/v1/manuscripts/decision")
 async def register_decision(decision: EditorialDecision):
     """Registra una decisión editorial sobre un manuscrito"""
+    if decision.decision not in DECISIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Decisión no válida. Opciones: {', '.join(DECISIONS)}"
+        )
+    
+    registered_at = await asyncio.to_thread(
+        manuscript_store.record_decision, decision.manuscript_id, decision.decision,
+        decision.reviewer_notes, decision.editorial_suggestions
+    )
+    if registered_at is None:
+        raise HTTPException(
+            status_code=404, detail=f"Manuscrito {decision.manuscript_id} no encontrado"
+        )
+    
     return {
         "manuscript_id": decision.manuscript_id,
         "decision": decision.decision,
-        "registered_at": datetime.now().isoformat(),
+        "registered_at": registered_at,
         "status": "decision_recorded",
         "message": f"Decisión '{decision.decision}' registrada para manuscrito {decision.manuscript_id}"
     }
 
-@app.get("/api/v1/manuscripts/quick-eval")
-async def quick_evaluation(word_count: int, genre: str = "general"):
-    """Evaluación rápida basada en parámetros"""
-    
-    # Criterios básicos por género
-    criteria = {
-        "novela": {"min_words": 50000, "ideal_words": 80000},
-        "cuento": {"min_words": 1000, "ideal_words": 5000},
-        "ensayo": {"min_words": 5000, "ideal_words": 15000},
-        "general": {"min_words": 5000, "ideal_words": 20000}
-    }
-    
-    genre_criteria = criteria.get(genre.lower(), criteria["general"])
+def evaluate_length(word_count: int, genre: str) -> tuple:
+    """Criterios de extensión del género y evaluación de `word_count` frente a ellos"""
+    genre_criteria = GENRE_CRITERIA.get(genre.lower(), GENRE_CRITERIA["general"])
     
     evaluation = "adecuado"
     if word_count < genre_criteria["min_words"]:
         evaluation = "demasiado_corto"
     elif word_count > genre_criteria["ideal_words"] * 2:
         evaluation = "demasiado_largo"
+    return genre_criteria, evaluation
+
+@app.get("/api/v1/manuscripts/quick-eval")
+async def quick_evaluation(word_count: int, genre: str = "general"):
+    """Evaluación rápida basada en parámetros"""
+    
+    genre_criteria, evaluation = evaluate_length(word_count, genre)
+    
+    # Posición frente a los manuscritos del género ya recibidos
+    corpus = corpus_percentiles.rank(genre, {"word_count": word_count})
     
     return {
         "genre": genre,
         "word_count": word_count,
         "evaluation": evaluation,
+        "percentile": corpus["metrics"]["word_count"],
+        "corpus_size": corpus["sample_size"],
         "recommendations": {
             "min_recommended": genre_criteria["min_words"],
             "ideal_range": f"{genre_criteria['min_words']}-{genre_criteria['ideal_words']} palabras"
         }
     }
 
+@app.get("/api/v1/corpus/percentiles")
+async def corpus_summary(genre: str = "general"):
+    """
+    Distribución de las métricas de los manuscritos recibidos de un género
+    
+    Cuantiles aproximados (p10 a p90) calculados sobre los bocetos del
+    corpus, sin recorrer los envíos.
+    """
+    return await asyncio.to_thread(corpus_percentiles.summary, genre)
+
+@app.get("/api/v1/manuscripts/{manuscript_id}")
+async def get_manuscript(manuscript_id: str):
+    """Datos, análisis e historial de decisiones de un manuscrito"""
+    manuscript = await asyncio.to_thread(manuscript_store.get, manuscript_id)
+    if manuscript is None:
+        raise HTTPException(status_code=404, detail=f"Manuscrito {manuscript_id} no encontrado")
+    return manuscript
+
 # ==========================================
 # INTEGRACIÓN CON WORDPRESS
 # ==========================================
 
 @app.post("/api/v1/wordpress/submit")
 async def submit_to_wordpress(
+    request: Request,
     file: UploadFile = File(...),
     title: str = "",
     author: str = "",
     email: str = "",
     genre: str = "",
     wordpress_url: str = "https://ecdotica.com",
-    wordpress_user: str = "",
-    wordpress_password: str = ""
+    wordpress_user: str = Form(""),
+    wordpress_password: str = Form("")
 ):
     """
     Procesa el manuscrito y lo envía directamente a WordPress
     Crea un Custom Post Type 'manuscrito' en WordPress
     
+    Solo se admiten los sitios de ECDOTICA_WORDPRESS_SITES. Con usuario y
+    contraseña de aplicación (en el formulario, nunca en la URL, o
+    configurados para el sitio) la entrada se publica desde la API, en
+    lotes compartidos con otros envíos al mismo sitio; sin ellos se
+    devuelven los datos de la entrada para crearla desde el plugin.
+    
     Requiere:
     - Plugin Application Passwords en WordPress
     - Permisos de escritura para el usuario
     """
+    # Antes se aceptaban en la URL: ignorarlos sin avisar dejaría la entrada
+    # sin publicar, y la contraseña ya ha quedado en los registros
+    in_query = [name for name in WORDPRESS_CREDENTIAL_FIELDS if name in request.query_params]
+    if in_query:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Las credenciales de WordPress ({', '.join(in_query)}) no se admiten en la URL:"
+                   " envíalas en el formulario y cambia la contraseña de aplicación"
+        )
+    try:
+        credentials = wordpress_publisher.credentials(
+            wordpress_url, wordpress_user, wordpress_password
+        )
+    except WordPressPublishError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     
-    # Primero procesamos el archivo
-    file_content = await file.read()
-    filename_lower = file.filename.lower()
+    # Primero procesamos el archivo, con el mismo límite de tamaño
+    upload = await spool_upload(file, MAX_FILE_SIZE)
     
-    if filename_lower.endswith('.pdf'):
-        text = extract_text_from_pdf(file_content)
-    elif filename_lower.endswith('.docx'):
-        text = extract_text_from_docx(file_content)
-    else:
-        raise HTTPException(status_code=400, detail="Formato no soportado")
+    with upload:
+        file_type = detect_file_type(file.filename)
+        if file_type is None:
+            raise HTTPException(status_code=400, detail="Formato no soportado")
+        
+        # Extraemos y analizamos en el pool de procesos
+        result = await analyze_upload_cached(upload.sha256, upload.path, file_type)
     
-    # Analizamos
-    analysis = analyze_text_quality(text)
+    analysis = result.analysis
     manuscript_id = str(uuid.uuid4())[:12]
+    await index_manuscript(manuscript_id, title or file.filename, result)
+    percentiles = store_manuscript(
+        manuscript_id, "wordpress", title or file.filename, analysis, result.text_sha256,
+        author=author, email=email, genre=genre, filename=file.filename, size=upload.size
+    )
     
     # Preparar datos para WordPress
     wp_post_data = {
@@ -408,7 +1495,7 @@ async def submit_to_wordpress(
             <li><strong>Tiempo de lectura estimado:</strong> {analysis.estimated_reading_time_minutes} minutos</li>
         </ul>
         <h3>Texto del Manuscrito</h3>
-        <p>{text[:1000]}...</p>
+        <p>{result.excerpt}...</p>
         """,
         "status": "draft",
         "meta": {
@@ -422,18 +1509,43 @@ async def submit_to_wordpress(
         }
     }
     
-    return {
+    if credentials is not None:
+        try:
+            published = await wordpress_publisher.publish(
+                wordpress_url, *credentials, wp_post_data
+            )
+        except WordPressPublishError as e:
+            raise HTTPException(status_code=502, detail=e.detail)
+        return serialize_response({
+            "manuscript_id": manuscript_id,
+            "status": "published_to_wordpress",
+            "wordpress_post": published,
+            "analysis": analysis.dict(),
+            "percentiles": percentiles,
+            "message": f"Manuscrito procesado y creado en WordPress como borrador {published['id']}"
+        })
+    
+    return serialize_response({
         "manuscript_id": manuscript_id,
         "status": "ready_for_wordpress",
         "wordpress_data": wp_post_data,
         "analysis": analysis.dict(),
+        "percentiles": percentiles,
         "message": "Manuscrito procesado y listo para enviar a WordPress",
         "next_steps": [
             "Instalar plugin para Custom Post Type 'manuscrito'",
             "Configurar Application Passwords en WordPress",
             "Usar endpoint de WordPress REST API para crear post"
         ]
-    }
+    })
+
+# ==========================================
+# MÓDULOS DE ANÁLISIS, REVISIÓN Y BLOCKCHAIN
+# ==========================================
+
+app.include_router(text_router.router, prefix="/api/v1/text", tags=["Text Analysis"])
+app.include_router(review_router.router, prefix="/api/v1/review", tags=["Editorial Review"])
+app.include_router(blockchain_router.router, prefix="/api/v1/blockchain", tags=["Blockchain"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,7 +1,15 @@
 """Editorial Review AI API Router"""
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Tuple
+import asyncio
+
+from src.nlp.entities import (
+    content_hash, entity_index, extract_chapters, find_inconsistencies, split_chapters
+)
+from src.review_ai.llm_review import ReviewProviderError, review_service
+from src.utils.metrics import metrics
+from src.utils.workers import worker_pool
 
 router = APIRouter()
 
@@ -14,32 +22,137 @@ class ReviewSuggestion(BaseModel):
     position: int
     message: str
     suggestion: str
+    original: Optional[str] = None
+
+class ChapterText(BaseModel):
+    chapter: str
+    text: str
+    title: Optional[str] = None
+
+class ConsistencyRequest(BaseModel):
+    # Manuscrito completo (se divide por sus encabezados de capítulo)...
+    text: Optional[str] = None
+    context: Optional[str] = None
+    # ...o, para un manuscrito ya indexado, solo los capítulos que cambiaron
+    manuscript_id: Optional[str] = None
+    chapters: Optional[List[ChapterText]] = None
+    removed_chapters: List[str] = []
 
 class ReviewResponse(BaseModel):
     status: str
     suggestions: List[ReviewSuggestion]
+    chunks: int = 0
+    cached_chunks: int = 0
+    failed_chunks: int = 0
 
 @router.post("/suggest", response_model=ReviewResponse)
 async def get_review_suggestions(request: ReviewRequest):
     """
     Obtener sugerencias editoriales contextuales
+
+    El texto se revisa por fragmentos; `position` es siempre la posición
+    en el texto enviado.
     """
     try:
-        # TODO: Integrar con OpenAI GPT-4 API
-        return ReviewResponse(
-            status="success",
-            suggestions=[]
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        with metrics.stage("review", bytes=len(request.text)):
+            result = await review_service.review(request.text, request.context)
+    except ReviewProviderError as e:
+        raise HTTPException(status_code=502, detail=f"Error del servicio de revisión: {str(e)}")
+    return ReviewResponse(
+        status="partial" if result["failed_chunks"] else "success",
+        suggestions=result["suggestions"],
+        chunks=result["chunks"],
+        cached_chunks=result["cached_chunks"],
+        failed_chunks=result["failed_chunks"]
+    )
+
+async def index_chapters(
+    request: ConsistencyRequest
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Actualiza el índice de entidades con los capítulos recibidos
+
+    Solo se extraen los capítulos cuyo texto no estaba ya indexado, así que
+    el coste depende de lo editado y no de la extensión del libro. Devuelve
+    los datos de todos los capítulos del manuscrito y el recuento de cambios.
+    """
+    if request.text is not None:
+        incoming = split_chapters(request.text)
+    else:
+        incoming = [(c.chapter, c.title or "", c.text) for c in request.chapters or []]
+    texts = {content_hash(text): text for _, _, text in incoming}
+    received = [(chapter, title, content_hash(text)) for chapter, title, text in incoming]
+
+    if request.manuscript_id is None:
+        # Comprobación puntual, sin guardar nada en el índice
+        facts = await worker_pool.run(extract_chapters, list(texts.values()))
+        extracted = dict(zip(texts, facts))
+        chapters = [
+            {"chapter": chapter, "title": title, **extracted[key]}
+            for chapter, title, key in received
+        ]
+        return chapters, {"total": len(chapters), "reindexed": len(extracted), "reused": 0,
+                          "removed": 0}
+
+    current = await asyncio.to_thread(entity_index.chapters, request.manuscript_id)
+    if request.text is not None:
+        updated = received
+    else:
+        # Se sustituyen los capítulos recibidos y los nuevos van al final
+        replacements = {chapter: (chapter, title, key) for chapter, title, key in received}
+        removed = set(request.removed_chapters)
+        known = {chapter for chapter, _, _ in current}
+        updated = [
+            replacements.get(chapter, (chapter, title, key))
+            for chapter, title, key in current if chapter not in removed
+        ]
+        updated += [row for row in received if row[0] not in known]
+    missing = await asyncio.to_thread(entity_index.missing, [key for _, _, key in updated])
+    extracted: Dict[str, Dict[str, Any]] = {}
+    if missing:
+        keys = sorted(missing)
+        facts = await worker_pool.run(extract_chapters, [texts[key] for key in keys])
+        extracted = dict(zip(keys, facts))
+    await asyncio.to_thread(entity_index.save, request.manuscript_id, updated, extracted)
+    chapters = await asyncio.to_thread(entity_index.load, request.manuscript_id)
+    previous = {chapter for chapter, _, _ in current}
+    return chapters, {
+        "total": len(updated),
+        "reindexed": len(missing),
+        "reused": len(updated) - sum(1 for _, _, key in updated if key in missing),
+        "removed": len(previous - {chapter for chapter, _, _ in updated}),
+    }
 
 @router.post("/consistency-check")
-async def check_consistency(request: ReviewRequest):
+async def check_consistency(request: ConsistencyRequest):
     """
     Detectar inconsistencias narrativas
+
+    Compara entre capítulos los atributos de cada personaje (color de ojos
+    y de pelo, lugar de nacimiento) y sus edades frente a los años citados
+    en cada capítulo. Con `manuscript_id` el índice se conserva y en las
+    siguientes comprobaciones basta con enviar los capítulos modificados.
     """
+    if request.text is None and not request.chapters and not request.removed_chapters:
+        raise HTTPException(
+            status_code=400, detail="Envía el texto del manuscrito o los capítulos modificados"
+        )
+    if request.text is None and request.manuscript_id is None:
+        raise HTTPException(
+            status_code=400, detail="Los capítulos sueltos requieren un manuscript_id"
+        )
+
+    size = len(request.text or "") + sum(len(c.text) for c in request.chapters or [])
+    with metrics.stage("consistency", bytes=size):
+        chapters, changes = await index_chapters(request)
+        result = find_inconsistencies(chapters)
     return {
         "status": "success",
-        "inconsistencies": [],
-        "message": "Consistency check endpoint"
+        "manuscript_id": request.manuscript_id,
+        "chapters": changes,
+        "inconsistencies": result["inconsistencies"],
+        "entities": result["entities"],
+        "timeline": result["timeline"],
+        "message": f"{len(result['inconsistencies'])} posibles inconsistencias en "
+                   f"{changes['total']} capítulos"
     }
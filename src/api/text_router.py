@@ -1,42 +1,170 @@
 """Text Analysis API Router"""
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+import asyncio
+
+from src.nlp.collation import collate
+from src.nlp.pipeline import analyze_paragraphs, iter_paragraph_batches, merge_analyses
+from src.nlp.phrases import MAX_PHRASE_WORDS, MIN_PHRASE_WORDS, find_repeated_phrases
+from src.nlp.plagiarism import fingerprint_text, plagiarism_index
+from src.utils.metrics import metrics
+from src.utils.workers import worker_pool
 
 router = APIRouter()
 
+# Longitud máxima de cada pasaje devuelto en la respuesta
+PASSAGE_PREVIEW_LENGTH = 300
+MAX_WITNESSES = 20
+# Coincidencias devueltas como máximo por /plagiarism-check
+MAX_PLAGIARISM_MATCHES = 100
+# Frases devueltas como máximo por /repeated-phrases
+MAX_REPEATED_PHRASES = 500
+
+def numeric_option(options: dict, name: str, default, kind=int,
+                   minimum=None, maximum=None):
+    """Opción numérica de la petición; un valor no numérico o fuera de rango es un error 400"""
+    value = options.get(name, default)
+    try:
+        if isinstance(value, bool):
+            raise TypeError(name)
+        value = kind(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"La opción '{name}' debe ser numérica")
+    if minimum is not None and value < minimum or maximum is not None and value > maximum:
+        raise HTTPException(
+            status_code=400,
+            detail=f"La opción '{name}' debe estar entre {minimum} y {maximum}"
+        )
+    return value
+
 class TextAnalysisRequest(BaseModel):
     text: str
     options: Optional[dict] = {}
 
 class TextAnalysisResponse(BaseModel):
     status: str
+    word_count: int
     analysis: dict
 
+class WitnessText(BaseModel):
+    siglum: str
+    text: str
+
+class CollationRequest(BaseModel):
+    witnesses: List[WitnessText]
+    base: Optional[str] = None
+    options: Optional[dict] = {}
+
 @router.post("/analyze", response_model=TextAnalysisResponse)
 async def analyze_text(request: TextAnalysisRequest):
     """
     Analizar texto: tokenización, POS tagging, NER
+
+    El texto se reparte por lotes de párrafos entre los procesos
+    trabajadores. Opciones (todas activadas por defecto): pos, lemmas,
+    ner, sentences; desactivarlas omite los componentes de spaCy que no
+    hacen falta.
     """
-    try:
-        # TODO: Integrar con módulo NLP
-        return TextAnalysisResponse(
-            status="success",
-            analysis={
-                "tokens": len(request.text.split()),
-                "message": "Text analysis endpoint"
-            }
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    options = request.options or {}
+    slots = asyncio.Semaphore(worker_pool.processes)
+
+    async def analyze_batch(paragraphs: List[str]) -> dict:
+        async with slots:
+            return await worker_pool.run(analyze_paragraphs, paragraphs, options)
+
+    with metrics.stage("nlp", bytes=len(request.text)) as stage:
+        partials = await asyncio.gather(*(
+            analyze_batch(batch) for batch in iter_paragraph_batches(request.text)
+        ))
+        analysis = merge_analyses(partials)
+        stage.words = analysis["word_count"]
+    return TextAnalysisResponse(
+        status="success",
+        word_count=analysis["word_count"],
+        analysis=analysis
+    )
 
 @router.post("/plagiarism-check")
 async def check_plagiarism(request: TextAnalysisRequest):
     """
-    Detectar similitud y plagiarismo
+    Detectar similitud y plagiarismo frente a todos los manuscritos recibidos
+
+    Opciones: top_k (5, entre 1 y MAX_PLAGIARISM_MATCHES), min_similarity
+    (0.0, entre 0 y 1)
     """
+    options = request.options or {}
+    top_k = numeric_option(options, "top_k", 5, minimum=1, maximum=MAX_PLAGIARISM_MATCHES)
+    min_similarity = numeric_option(
+        options, "min_similarity", 0.0, float, minimum=0.0, maximum=1.0
+    )
+    fingerprint = await worker_pool.run(fingerprint_text, request.text)
+    # La consulta lee SQLite: fuera del bucle de eventos
+    matches = await asyncio.to_thread(
+        plagiarism_index.query, fingerprint, top_k=top_k, min_similarity=min_similarity
+    )
+    for match in matches:
+        for passage in match["passages"]:
+            passage["text"] = request.text[passage["start"]:passage["end"]][:PASSAGE_PREVIEW_LENGTH]
+
     return {
         "status": "success",
-        "similarity_score": 0.0,
-        "message": "Plagiarism check endpoint"
+        "similarity_score": matches[0]["similarity"] if matches else 0.0,
+        "matches": matches,
+        "message": f"{len(matches)} manuscritos similares encontrados"
     }
+
+@router.post("/repeated-phrases")
+async def repeated_phrases(request: TextAnalysisRequest):
+    """
+    Localizar las frases que se repiten a lo largo del texto
+
+    Opciones: min_words (3), max_words (12), min_count (2), limit (50, como
+    máximo MAX_REPEATED_PHRASES)
+    """
+    options = request.options or {}
+    min_words = numeric_option(options, "min_words", MIN_PHRASE_WORDS)
+    max_words = numeric_option(options, "max_words", MAX_PHRASE_WORDS)
+    if not MIN_PHRASE_WORDS <= min_words <= max_words <= MAX_PHRASE_WORDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"La longitud de las frases debe estar entre {MIN_PHRASE_WORDS}"
+                   f" y {MAX_PHRASE_WORDS} palabras"
+        )
+    result = await worker_pool.run(
+        find_repeated_phrases, request.text, min_words, max_words,
+        max(2, numeric_option(options, "min_count", 2)),
+        numeric_option(options, "limit", 50, minimum=1, maximum=MAX_REPEATED_PHRASES)
+    )
+    return {"status": "success", **result}
+
+@router.post("/collate")
+async def collate_witnesses(request: CollationRequest):
+    """
+    Colacionar varios testimonios de un texto y generar el aparato de variantes
+
+    Opciones: ignore_case (True), ignore_punctuation (False)
+    """
+    sigla = [witness.siglum for witness in request.witnesses]
+    if len(sigla) < 2:
+        raise HTTPException(status_code=400, detail="Se necesitan al menos dos testimonios")
+    if len(sigla) > MAX_WITNESSES:
+        raise HTTPException(
+            status_code=400, detail=f"Demasiados testimonios. Máximo {MAX_WITNESSES} permitidos."
+        )
+    if len(set(sigla)) != len(sigla):
+        raise HTTPException(
+            status_code=400, detail="Las siglas de los testimonios deben ser únicas"
+        )
+    if request.base is not None and request.base not in sigla:
+        raise HTTPException(status_code=400, detail=f"Testimonio base desconocido: {request.base}")
+
+    options = request.options or {}
+    result = await worker_pool.run(
+        collate,
+        [(witness.siglum, witness.text) for witness in request.witnesses],
+        request.base,
+        bool(options.get("ignore_case", True)),
+        bool(options.get("ignore_punctuation", False)),
+    )
+    return {"status": "success", **result}
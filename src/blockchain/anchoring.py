@@ -0,0 +1,429 @@
+"""
+Anclaje de documentos por lotes
+Las huellas de los documentos se agrupan en un árbol de Merkle y solo la
+raíz se registra en la cadena; cada documento guarda su prueba de inclusión
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from src.utils.paths import data_path
+
+# Un lote se sella al reunir este número de documentos...
+ANCHOR_BATCH_SIZE = int(os.getenv("ECDOTICA_ANCHOR_BATCH_SIZE", "1024"))
+# ...o, como mucho, tras esta ventana de tiempo
+ANCHOR_WINDOW_SECONDS = float(os.getenv("ECDOTICA_ANCHOR_WINDOW_SECONDS", "60"))
+ANCHOR_BACKEND = os.getenv("ECDOTICA_ANCHOR_BACKEND", "local")
+
+PENDING = "pending"
+ANCHORED = "anchored"
+
+# Prefijos distintos para hojas y nodos internos (evita confundir unas con otros)
+_LEAF = b"\x00"
+_NODE = b"\x01"
+
+# Paso de una prueba: ("L" o "R" según el lado del hermano, hash en hex)
+ProofStep = Tuple[str, str]
+
+
+def normalize_document_hash(document_hash: str) -> str:
+    """Huella SHA-256 en hexadecimal, en minúsculas y sin prefijo 0x"""
+    value = document_hash.strip().lower()
+    if value.startswith("0x"):
+        value = value[2:]
+    if len(value) != 64 or any(c not in "0123456789abcdef" for c in value):
+        raise HTTPException(
+            status_code=400, detail="document_hash debe ser un SHA-256 en hexadecimal"
+        )
+    return value
+
+
+def leaf_hash(document_hash: str) -> bytes:
+    return hashlib.sha256(_LEAF + bytes.fromhex(document_hash)).digest()
+
+
+def _node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(_NODE + left + right).digest()
+
+
+def build_merkle_tree(document_hashes: List[str]) -> Tuple[str, List[List[ProofStep]]]:
+    """
+    Raíz del árbol y prueba de inclusión de cada documento, en O(n)
+
+    Un nodo sin pareja sube al nivel siguiente sin duplicarse.
+    """
+    if not document_hashes:
+        raise ValueError("No hay documentos que anclar")
+    level = [leaf_hash(h) for h in document_hashes]
+    proofs: List[List[ProofStep]] = [[] for _ in level]
+    # Documentos que cuelgan de cada nodo del nivel actual
+    members: List[List[int]] = [[i] for i in range(len(level))]
+    while len(level) > 1:
+        next_level, next_members = [], []
+        for i in range(0, len(level) - 1, 2):
+            left, right = level[i], level[i + 1]
+            for doc in members[i]:
+                proofs[doc].append(("R", right.hex()))
+            for doc in members[i + 1]:
+                proofs[doc].append(("L", left.hex()))
+            next_level.append(_node_hash(left, right))
+            next_members.append(members[i] + members[i + 1])
+        if len(level) % 2:
+            next_level.append(level[-1])
+            next_members.append(members[-1])
+        level, members = next_level, next_members
+    return level[0].hex(), proofs
+
+
+def verify_proof(document_hash: str, proof: List[ProofStep], root: str) -> bool:
+    """Comprueba la inclusión de un documento en O(log n) sin consultar la cadena"""
+    current = leaf_hash(document_hash)
+    for side, sibling in proof:
+        sibling_bytes = bytes.fromhex(sibling)
+        if side == "L":
+            current = _node_hash(sibling_bytes, current)
+        else:
+            current = _node_hash(current, sibling_bytes)
+    return current.hex() == root
+
+
+class AnchorReceipt:
+    """Datos de la transacción que registró una raíz"""
+
+    def __init__(self, transaction_hash: str, blockchain: str, block_number: int, timestamp: str):
+        self.transaction_hash = transaction_hash
+        self.blockchain = blockchain
+        self.block_number = block_number
+        self.timestamp = timestamp
+
+
+class AnchorBackend:
+    """Interfaz de los servicios donde se registran las raíces de Merkle"""
+
+    name = "abstract"
+
+    def anchor(self, root: str, metadata: Dict[str, Any]) -> AnchorReceipt:
+        raise NotImplementedError
+
+
+class LocalChain(AnchorBackend):
+    """
+    Cadena local de bloques en SQLite
+
+    Sustituye a una red real en desarrollo y pruebas: cada raíz anclada se
+    encadena con el hash del bloque anterior.
+    """
+
+    name = "local"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path = self.path or data_path("blockchain", "local_chain.sqlite3")
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS blocks ("
+                " number INTEGER PRIMARY KEY, hash TEXT UNIQUE NOT NULL,"
+                " previous_hash TEXT NOT NULL, root TEXT NOT NULL,"
+                " metadata TEXT NOT NULL, timestamp TEXT NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def anchor(self, root: str, metadata: Dict[str, Any]) -> AnchorReceipt:
+        timestamp = datetime.now(timezone.utc).isoformat()
+        with self._lock, self.db:
+            last = self.db.execute(
+                "SELECT number, hash FROM blocks ORDER BY number DESC LIMIT 1"
+            ).fetchone()
+            number, previous_hash = (last[0] + 1, last[1]) if last else (0, "0" * 64)
+            block_hash = hashlib.sha256(
+                f"{number}:{previous_hash}:{root}:{timestamp}".encode("ascii")
+            ).hexdigest()
+            self.db.execute(
+                "INSERT INTO blocks (number, hash, previous_hash, root, metadata, timestamp)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (number, block_hash, previous_hash, root, json.dumps(metadata), timestamp)
+            )
+        return AnchorReceipt("0x" + block_hash, self.name, number, timestamp)
+
+    def lookup(self, transaction_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.db.execute(
+                "SELECT number, root, timestamp FROM blocks WHERE hash = ?",
+                (transaction_hash[2:] if transaction_hash.startswith("0x") else transaction_hash,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"block_number": row[0], "root": row[1], "timestamp": row[2]}
+
+
+# Servicios de anclaje disponibles, seleccionables con ECDOTICA_ANCHOR_BACKEND
+ANCHOR_BACKENDS: Dict[str, Callable[[], AnchorBackend]] = {
+    "local": LocalChain,
+}
+
+
+def create_backend(name: str = ANCHOR_BACKEND) -> AnchorBackend:
+    try:
+        return ANCHOR_BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Servicio de anclaje desconocido: {name}")
+
+
+class AnchorService:
+    """
+    Agrupa documentos en lotes y ancla la raíz de Merkle de cada lote
+
+    Los documentos y sus pruebas se guardan en SQLite, de modo que verificar
+    un documento no requiere consultar la cadena.
+    """
+
+    def __init__(self, backend: Optional[AnchorBackend] = None, path: Optional[str] = None,
+                 batch_size: int = ANCHOR_BATCH_SIZE,
+                 window_seconds: float = ANCHOR_WINDOW_SECONDS):
+        self._backend = backend
+        self.path = path
+        self.batch_size = batch_size
+        self.window_seconds = window_seconds
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def backend(self) -> AnchorBackend:
+        if self._backend is None:
+            self._backend = create_backend()
+        return self._backend
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Cada proceso abre su propia conexión
+        if self._db is None or self._db_pid != os.getpid():
+            self.path = self.path or data_path("blockchain", "anchors.sqlite3")
+            self._db = sqlite3.connect(
+                self.path, check_same_thread=False, timeout=30, isolation_level=None
+            )
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS batches ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, root TEXT NOT NULL,"
+                " size INTEGER NOT NULL, status TEXT NOT NULL, transaction_hash TEXT,"
+                " blockchain TEXT, block_number INTEGER, created_at TEXT NOT NULL,"
+                " anchored_at TEXT)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " document_hash TEXT PRIMARY KEY, metadata TEXT NOT NULL,"
+                " batch_id INTEGER, leaf_index INTEGER, proof TEXT,"
+                " submitted_at TEXT NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_documents_batch"
+                " ON documents (batch_id, submitted_at)"
+            )
+            self._db_pid = os.getpid()
+        return self._db
+
+    def submit(self, document_hash: str,
+               metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Añade un documento al lote en curso; sella el lote si está lleno
+
+        El documento ya queda guardado aunque falle el anclaje: sigue
+        pendiente y el sellado periódico lo reintenta.
+        """
+        document_hash = normalize_document_hash(document_hash)
+        with self._lock:
+            self.db.execute(
+                "INSERT OR IGNORE INTO documents (document_hash, metadata, submitted_at)"
+                " VALUES (?, ?, ?)",
+                (document_hash, json.dumps(metadata or {}, ensure_ascii=False),
+                 datetime.now(timezone.utc).isoformat())
+            )
+            pending = self.db.execute(
+                "SELECT COUNT(*) FROM documents WHERE batch_id IS NULL"
+            ).fetchone()[0]
+        if pending >= self.batch_size:
+            try:
+                self.seal()
+            except Exception:
+                pass
+        return self.status(document_hash)
+
+    def seal(self) -> Optional[Dict[str, Any]]:
+        """
+        Construye el árbol con los documentos pendientes y ancla su raíz
+
+        Si el servicio de anclaje falla, los documentos vuelven a quedar
+        pendientes para el siguiente lote.
+        """
+        with self._lock:
+            db = self.db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                hashes = [row[0] for row in db.execute(
+                    "SELECT document_hash FROM documents WHERE batch_id IS NULL"
+                    " ORDER BY submitted_at, document_hash LIMIT ?", (self.batch_size,)
+                )]
+                if not hashes:
+                    db.execute("COMMIT")
+                    return None
+                root, proofs = build_merkle_tree(hashes)
+                batch_id = db.execute(
+                    "INSERT INTO batches (root, size, status, created_at) VALUES (?, ?, ?, ?)",
+                    (root, len(hashes), PENDING, datetime.now(timezone.utc).isoformat())
+                ).lastrowid
+                db.executemany(
+                    "UPDATE documents SET batch_id = ?, leaf_index = ?, proof = ?"
+                    " WHERE document_hash = ?",
+                    [(batch_id, i, json.dumps(proof), h)
+                     for i, (h, proof) in enumerate(zip(hashes, proofs))]
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+        try:
+            receipt = self._anchor(batch_id, root, len(hashes))
+        except Exception:
+            with self._lock:
+                db.execute("BEGIN IMMEDIATE")
+                db.execute(
+                    "UPDATE documents SET batch_id = NULL, leaf_index = NULL, proof = NULL"
+                    " WHERE batch_id = ?", (batch_id,)
+                )
+                db.execute("DELETE FROM batches WHERE id = ?", (batch_id,))
+                db.execute("COMMIT")
+            raise
+        return {"batch_id": batch_id, "root": root, "size": len(hashes),
+                "transaction_hash": receipt.transaction_hash}
+
+    def _anchor(self, batch_id: int, root: str, size: int) -> AnchorReceipt:
+        """Ancla la raíz de un lote ya guardado y anota el recibo"""
+        receipt = self.backend.anchor(root, {"batch_id": batch_id, "size": size})
+        with self._lock:
+            self.db.execute(
+                "UPDATE batches SET status = ?, transaction_hash = ?, blockchain = ?,"
+                " block_number = ?, anchored_at = ? WHERE id = ?",
+                (ANCHORED, receipt.transaction_hash, receipt.blockchain,
+                 receipt.block_number, receipt.timestamp, batch_id)
+            )
+        return receipt
+
+    def resume_pending(self, older_than: float = 0) -> int:
+        """
+        Ancla los lotes que quedaron sellados pero sin anclar
+
+        Ocurre si el proceso murió entre guardar el lote y recibir el
+        recibo. Sus documentos ya tienen prueba, así que se ancla la misma
+        raíz; si el anclaje llegó a hacerse, la raíz queda registrada dos
+        veces y las pruebas siguen siendo válidas. `older_than` deja fuera
+        los lotes recientes, que otro proceso puede estar anclando aún.
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=older_than)).isoformat()
+        with self._lock:
+            batches = self.db.execute(
+                "SELECT id, root, size FROM batches WHERE status = ? AND created_at <= ?"
+                " ORDER BY id", (PENDING, cutoff)
+            ).fetchall()
+        for batch in batches:
+            self._anchor(batch["id"], batch["root"], batch["size"])
+        return len(batches)
+
+    def status(self, document_hash: str) -> Optional[Dict[str, Any]]:
+        """Estado de anclaje de un documento, con su prueba si ya está anclado"""
+        document_hash = normalize_document_hash(document_hash)
+        with self._lock:
+            row = self.db.execute(
+                "SELECT d.document_hash, d.metadata, d.leaf_index, d.proof, d.submitted_at,"
+                " b.id AS batch_id, b.root, b.size, b.status, b.transaction_hash,"
+                " b.blockchain, b.block_number, b.anchored_at"
+                " FROM documents d LEFT JOIN batches b ON b.id = d.batch_id"
+                " WHERE d.document_hash = ?", (document_hash,)
+            ).fetchone()
+        if row is None:
+            return None
+        anchored = row["status"] == ANCHORED
+        return {
+            "document_hash": document_hash,
+            "status": ANCHORED if anchored else PENDING,
+            "metadata": json.loads(row["metadata"]),
+            "submitted_at": row["submitted_at"],
+            "batch_id": row["batch_id"] if anchored else None,
+            "merkle_root": row["root"] if anchored else None,
+            "leaf_index": row["leaf_index"] if anchored else None,
+            "batch_size": row["size"] if anchored else None,
+            "proof": json.loads(row["proof"]) if anchored else None,
+            "transaction_hash": row["transaction_hash"],
+            "blockchain": row["blockchain"],
+            "block_number": row["block_number"],
+            "anchored_at": row["anchored_at"],
+        }
+
+    def verify(self, document_hash: str) -> Optional[Dict[str, Any]]:
+        """Comprueba la prueba guardada frente a la raíz anclada del lote"""
+        status = self.status(document_hash)
+        if status is None:
+            return None
+        status["verified"] = status["status"] == ANCHORED and verify_proof(
+            status["document_hash"], [tuple(step) for step in status["proof"]],
+            status["merkle_root"]
+        )
+        return status
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self.db.execute(
+                "SELECT COUNT(*) FROM documents WHERE batch_id IS NULL"
+            ).fetchone()[0]
+
+    def start(self) -> None:
+        """Arranca el sellado periódico de lotes en el event loop actual"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        # Al arrancar se retoman los lotes que un proceso anterior dejó sin anclar
+        try:
+            await asyncio.to_thread(self.resume_pending, self.window_seconds)
+        except Exception:
+            pass
+        while True:
+            await asyncio.sleep(self.window_seconds)
+            try:
+                await asyncio.to_thread(self.resume_pending, self.window_seconds)
+                while await asyncio.to_thread(self.seal):
+                    pass
+            except Exception:
+                # El lote sigue pendiente y se reintenta en la siguiente ventana
+                pass
+
+
+anchor_service = AnchorService()
@@ -0,0 +1,312 @@
+"""
+Colación de testimonios
+Alinea N testimonios de un texto palabra a palabra frente a un texto
+base y construye el aparato de variantes
+"""
+
+from __future__ import annotations
+
+import difflib
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+# Por encima de este producto de longitudes, un hueco sin anclas se
+# registra como una sustitución completa en lugar de compararlo en detalle
+SMALL_GAP = 40_000
+# Longitud máxima (en tokens) de las anclas de varias palabras
+MAX_ANCHOR_SIZE = 16
+
+Opcode = Tuple[str, int, int, int, int]
+
+
+class Witness:
+    """Testimonio tokenizado: formas normalizadas y posición de cada token"""
+
+    def __init__(self, siglum: str, text: str, ignore_case: bool = True,
+                 ignore_punctuation: bool = False):
+        self.siglum = siglum
+        self.text = text
+        tokens = [
+            m for m in TOKEN_PATTERN.finditer(text)
+            if not ignore_punctuation or m.group()[0].isalnum() or m.group()[0] == "_"
+        ]
+        self.starts = [m.start() for m in tokens]
+        self.ends = [m.end() for m in tokens]
+        self.forms = [m.group().lower() if ignore_case else m.group() for m in tokens]
+
+    def __len__(self) -> int:
+        return len(self.forms)
+
+    def reading(self, start: int, end: int) -> str:
+        """Texto original comprendido entre dos posiciones de token"""
+        if start >= end:
+            return ""
+        return self.text[self.starts[start]:self.ends[end - 1]]
+
+    def offsets(self, start: int, end: int) -> Optional[List[int]]:
+        if start >= end:
+            return None
+        return [self.starts[start], self.ends[end - 1]]
+
+
+def _encode(witnesses: Sequence[Witness]) -> List[List[int]]:
+    """Sustituye cada forma por un entero para comparar más deprisa"""
+    vocabulary: Dict[str, int] = {}
+    return [[vocabulary.setdefault(form, len(vocabulary)) for form in w.forms] for w in witnesses]
+
+
+def _unique_anchors(a: List[int], b: List[int], a_lo: int, a_hi: int,
+                    b_lo: int, b_hi: int, size: int = 1) -> List[Tuple[int, int]]:
+    """
+    Secuencias de `size` tokens que aparecen una sola vez en ambos tramos
+
+    Devuelve las posiciones de inicio en a y b de la cadena más larga de
+    anclas en orden compatible y sin solaparse (patience sort).
+    """
+    if size == 1:
+        keys_a = a[a_lo:a_hi]
+        keys_b = b[b_lo:b_hi]
+    else:
+        keys_a = [tuple(a[i:i + size]) for i in range(a_lo, a_hi - size + 1)]
+        keys_b = [tuple(b[j:j + size]) for j in range(b_lo, b_hi - size + 1)]
+    count_a = Counter(keys_a)
+    count_b = Counter(keys_b)
+    position_b = {key: b_lo + j for j, key in enumerate(keys_b) if count_b[key] == 1}
+    pairs = [
+        (a_lo + i, position_b[key]) for i, key in enumerate(keys_a)
+        if count_a[key] == 1 and key in position_b
+    ]
+    if not pairs:
+        return []
+
+    # Subsecuencia creciente más larga según la posición en b
+    tails: List[int] = []
+    tail_index: List[int] = []
+    previous = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        slot = bisect_left(tails, j)
+        if slot == len(tails):
+            tails.append(j)
+            tail_index.append(k)
+        else:
+            tails[slot] = j
+            tail_index[slot] = k
+        previous[k] = tail_index[slot - 1] if slot else -1
+    chain = []
+    k = tail_index[-1]
+    while k != -1:
+        chain.append(pairs[k])
+        k = previous[k]
+    chain.reverse()
+
+    anchors = []
+    next_i = next_j = -1
+    for i, j in chain:
+        if i >= next_i and j >= next_j:
+            anchors.append((i, j))
+            next_i, next_j = i + size, j + size
+    return anchors
+
+
+def align(a: List[int], b: List[int], small_gap: int = SMALL_GAP) -> List[Opcode]:
+    """
+    Alinea dos secuencias de tokens con memoria lineal
+
+    Se anclan los tokens únicos en ambos lados (patience diff) y solo se
+    comparan en detalle los huecos pequeños que quedan entre anclas, lo que
+    evita el coste cuadrático en textos largos. Devuelve códigos de
+    operación con el formato de difflib.
+    """
+    opcodes: List[Opcode] = []
+    # Pila de tramos pendientes y de operaciones ya resueltas, en orden inverso
+    stack: List[Tuple[Any, ...]] = [("range", 0, len(a), 0, len(b))]
+    while stack:
+        item = stack.pop()
+        if item[0] != "range":
+            opcodes.append(item)
+            continue
+        _, a_lo, a_hi, b_lo, b_hi = item
+
+        start_a, start_b = a_lo, b_lo
+        while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+            a_lo += 1
+            b_lo += 1
+        if a_lo > start_a:
+            opcodes.append(("equal", start_a, a_lo, start_b, b_lo))
+
+        end_a, end_b = a_hi, b_hi
+        while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+            a_hi -= 1
+            b_hi -= 1
+        if a_hi < end_a:
+            stack.append(("equal", a_hi, end_a, b_hi, end_b))
+
+        if a_lo == a_hi or b_lo == b_hi:
+            if a_lo < a_hi:
+                opcodes.append(("delete", a_lo, a_hi, b_lo, b_lo))
+            elif b_lo < b_hi:
+                opcodes.append(("insert", a_lo, a_lo, b_lo, b_hi))
+            continue
+
+        small = (a_hi - a_lo) * (b_hi - b_lo) <= small_gap
+        size = 1
+        anchors = _unique_anchors(a, b, a_lo, a_hi, b_lo, b_hi)
+        # En textos con vocabulario pobre se buscan anclas de varias palabras
+        while not anchors and not small and \
+                size * 2 <= min(a_hi - a_lo, b_hi - b_lo, MAX_ANCHOR_SIZE):
+            size *= 2
+            anchors = _unique_anchors(a, b, a_lo, a_hi, b_lo, b_hi, size)
+        if anchors:
+            pending: List[Tuple[Any, ...]] = []
+            prev_i, prev_j = a_lo, b_lo
+            for i, j in anchors:
+                pending.append(("range", prev_i, i, prev_j, j))
+                pending.append(("equal", i, i + size, j, j + size))
+                prev_i, prev_j = i + size, j + size
+            pending.append(("range", prev_i, a_hi, prev_j, b_hi))
+            stack.extend(reversed(pending))
+        elif small:
+            matcher = difflib.SequenceMatcher(None, a[a_lo:a_hi], b[b_lo:b_hi], autojunk=False)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                opcodes.append((tag, a_lo + i1, a_lo + i2, b_lo + j1, b_lo + j2))
+        else:
+            opcodes.append(("replace", a_lo, a_hi, b_lo, b_hi))
+    return _merge_equal(opcodes)
+
+
+def _merge_equal(opcodes: List[Opcode]) -> List[Opcode]:
+    merged: List[Opcode] = []
+    for op in opcodes:
+        if op[1] == op[2] and op[3] == op[4]:
+            continue
+        if merged and merged[-1][0] == op[0] == "equal":
+            _, i1, _, j1, _ = merged[-1]
+            merged[-1] = ("equal", i1, op[2], j1, op[4])
+        else:
+            merged.append(op)
+    return merged
+
+
+def _boundary_map(opcodes: List[Opcode], base_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Posición en el testimonio de cada frontera entre tokens de la base
+
+    `low` incluye lo añadido por el testimonio justo antes de la frontera y
+    `high` lo añadido justo después, de modo que una unidad [s, e) de la
+    base corresponde a los tokens low[s]:high[e] del testimonio.
+    """
+    low = np.full(base_length + 1, np.iinfo(np.int64).max, dtype=np.int64)
+    high = np.full(base_length + 1, -1, dtype=np.int64)
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            positions = np.arange(j1, j2 + 1, dtype=np.int64)
+            np.minimum(low[i1:i2 + 1], positions, out=low[i1:i2 + 1])
+            np.maximum(high[i1:i2 + 1], positions, out=high[i1:i2 + 1])
+        else:
+            low[i1] = min(low[i1], j1)
+            high[i1] = max(high[i1], j1)
+            low[i2] = min(low[i2], j2)
+            high[i2] = max(high[i2], j2)
+    return low, high
+
+
+def _variation_units(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Une los tramos de la base en los que algún testimonio discrepa"""
+    units: List[Tuple[int, int]] = []
+    for start, end in sorted(spans):
+        if units:
+            last_start, last_end = units[-1]
+            touches = start == last_end and (start == end or last_start == last_end)
+            if start < last_end or touches:
+                units[-1] = (last_start, max(last_end, end))
+                continue
+        units.append((start, end))
+    return units
+
+
+def _variant_type(lemma: str, reading: str) -> str:
+    if not reading:
+        return "omission"
+    if not lemma:
+        return "addition"
+    return "substitution"
+
+
+def collate(witnesses: Sequence[Tuple[str, str]], base: Optional[str] = None,
+            ignore_case: bool = True, ignore_punctuation: bool = False) -> Dict[str, Any]:
+    """
+    Colaciona varios testimonios y devuelve el aparato de variantes
+
+    Cada testimonio se alinea con el texto base (el primero, salvo que se
+    indique otra sigla). Las discrepancias que se solapan en la base se
+    agrupan en una misma unidad de variación, con las lecturas de todos los
+    testimonios y las posiciones de carácter en cada uno.
+    """
+    tokenized = [
+        Witness(siglum, text, ignore_case, ignore_punctuation) for siglum, text in witnesses
+    ]
+    sigla = [w.siglum for w in tokenized]
+    base_index = sigla.index(base) if base is not None else 0
+    base_witness = tokenized[base_index]
+    encoded = _encode(tokenized)
+    base_tokens = encoded[base_index]
+
+    maps: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+    spans: List[Tuple[int, int]] = []
+    agreement: Dict[str, float] = {}
+    for index, tokens in enumerate(encoded):
+        if index == base_index:
+            continue
+        opcodes = align(base_tokens, tokens)
+        maps[index] = _boundary_map(opcodes, len(base_tokens))
+        matched = sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == "equal")
+        total = max(len(base_tokens), len(tokens))
+        agreement[sigla[index]] = round(matched / total, 4) if total else 1.0
+        spans.extend((i1, i2) for tag, i1, i2, _, _ in opcodes if tag != "equal")
+
+    apparatus = []
+    for start, end in _variation_units(spans):
+        lemma = base_witness.reading(start, end)
+        readings: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        for index, witness in enumerate(tokenized):
+            if index == base_index:
+                w_start, w_end = start, end
+            else:
+                low, high = maps[index]
+                w_start, w_end = int(low[start]), int(high[end])
+            key = tuple(witness.forms[w_start:w_end])
+            reading = readings.get(key)
+            if reading is None:
+                text = witness.reading(w_start, w_end)
+                reading = readings[key] = {
+                    "text": text,
+                    "type": None if index == base_index else _variant_type(lemma, text),
+                    "witnesses": [],
+                    "offsets": {},
+                }
+            reading["witnesses"].append(witness.siglum)
+            reading["offsets"][witness.siglum] = witness.offsets(w_start, w_end)
+
+        lemma_key = tuple(base_witness.forms[start:end])
+        apparatus.append({
+            "base_start": start,
+            "base_end": end,
+            "lemma": lemma,
+            "lemma_witnesses": readings[lemma_key]["witnesses"],
+            "variants": [r for key, r in readings.items() if key != lemma_key],
+        })
+
+    return {
+        "base": base_witness.siglum,
+        "witnesses": [{"siglum": w.siglum, "tokens": len(w)} for w in tokenized],
+        "agreement": agreement,
+        "variant_count": len(apparatus),
+        "apparatus": apparatus,
+    }
@@ -0,0 +1,623 @@
+"""
+Índice de entidades y cronología por capítulo
+Personajes, lugares, atributos (color de ojos y de pelo, edad, lugar de
+nacimiento) y fechas se extraen capítulo a capítulo y se guardan por
+huella de contenido: al editar un capítulo solo se vuelve a indexar ese
+capítulo, y las consultas de coherencia se resuelven sobre el índice
+"""
+
+import bisect
+import hashlib
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.nlp.streaming import PARAGRAPH_BREAK
+from src.utils.paths import data_path
+
+# Longitud del fragmento de texto que acompaña a cada atributo como prueba
+EVIDENCE_CHARS = 80
+# Entidades devueltas en el resumen del índice
+ENTITY_SUMMARY_LIMIT = 50
+# Diferencia de edad tolerada frente a los años transcurridos entre capítulos
+AGE_TOLERANCE_YEARS = 1
+
+_UPPER = "A-ZÁÉÍÓÚÜÑ"
+_LOWER = "a-záéíóúüñ"
+_NAME_WORD = f"[{_UPPER}][{_LOWER}]+"
+# Nombres propios de una o varias palabras, con partículas (Juan de la Cruz)
+NAME_PATTERN = re.compile(
+    rf"\b{_NAME_WORD}(?:\s+(?:(?:de|del)\s+(?:(?:la|las|los)\s+)?)?{_NAME_WORD})*"
+)
+CHAPTER_HEADING = re.compile(
+    r"^[ \t]*(?:cap[ií]tulo|chapter)\s+([0-9]+|[IVXLCDM]+|[a-záéíóúñ]+)\b[^\n]*$"
+    r"|^[ \t]*(pr[oó]logo|ep[ií]logo)\b[^\n]*$",
+    re.IGNORECASE | re.MULTILINE
+)
+SENTENCE_END = re.compile(r"[.!?…]+[\"»”)]*\s+|\n")
+
+# Palabras que aparecen con mayúscula al empezar una oración y no son nombres
+STOPWORDS = frozenset("""
+a al algo alguien allí ante antes aquel aquella aquello aquí así aun aún bajo bien
+cada casi cierto como cómo con contra cuando cuándo cuanto de del desde donde dónde
+durante e el él ella ellas ellos en entonces entre era eran es esa ese eso esta está
+este esto estos estas fue fueron ha había hace hacia hasta hay he la las le les lo los
+luego mas más me mi mientras mis mucho muy nada ni ninguno no nos nosotros nunca o
+otra otro para pero poco por porque pues que qué quien quién se según ser si sí siempre
+sin sino sobre solo sólo su sus tal también tampoco tan tanto te tenía tiene todo todos
+tras tu tú un una uno unos unas usted y ya yo señor señora don doña
+""".split())
+# Preposiciones que suelen preceder a un lugar, y verbos de movimiento que
+# lo introducen con "a" ("llegó a Sevilla"; "a María" no es un lugar)
+PLACE_CUES = frozenset(["en", "hacia", "desde", "hasta"])
+MOTION_VERBS = frozenset("""
+llegó llegaron llegaba llegamos volvió volvieron volvía regresó regresaron regresaba
+viajó viajaron viajaba fue fueron iba iban partió partieron mudó mudaron trasladó
+marchó huyó huyeron emigró emigraron
+""".split())
+# Terminaciones verbales frecuentes al principio de una oración ("Pasaron los años")
+VERB_ENDING = re.compile(r"(?:aron|ieron|aban|ían|ía|ó)$")
+# Lo que sigue a un nombre que hace de sujeto: una coma o un verbo ("Lucía miraba")
+SUBJECT_FOLLOWER = re.compile(rf"\s*(?:,|[{_LOWER}]*(?:aba|aban|ía|ían|ó|aron|ieron)\b)")
+
+_COLOR_FORMS: Dict[str, str] = {}
+for _base, _forms in {
+    "azul": "azul azules",
+    "verde": "verde verdes",
+    "negro": "negro negra negros negras",
+    "castaño": "castaño castaña castaños castañas",
+    "marrón": "marrón marron marrones",
+    "gris": "gris grises",
+    "miel": "miel",
+    "ámbar": "ámbar ambar",
+    "rubio": "rubio rubia rubios rubias",
+    "pelirrojo": "pelirrojo pelirroja pelirrojos pelirrojas rojo roja rojos rojas",
+    "canoso": "canoso canosa canosos canosas cano cana canos canas blanco blanca blancos blancas",
+}.items():
+    for _form in _forms.split():
+        _COLOR_FORMS[_form] = _base
+_COLORS = "|".join(sorted(_COLOR_FORMS, key=len, reverse=True))
+# Hasta dos palabras intermedias ("ojos grandes y verdes" no, "ojos muy verdes" sí)
+_SKIP = r"(?:(?!y\b|e\b|pero\b|pelo\b|cabello\b|ojos\b)[a-záéíóúüñ]+\s+){0,2}?"
+_OF_COLOR = r"(?:de\s+)?(?:un\s+)?(?:color\s+)?"
+
+ATTRIBUTE_PATTERNS = [
+    ("ojos", re.compile(rf"\bojos\s+{_SKIP}{_OF_COLOR}({_COLORS})\b", re.IGNORECASE)),
+    ("cabello", re.compile(
+        rf"\b(?:pelo|cabello|cabellera|melena)\s+{_SKIP}{_OF_COLOR}({_COLORS})\b", re.IGNORECASE
+    )),
+]
+_NUMBER_WORDS = {
+    "uno": 1, "un": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5, "seis": 6, "siete": 7,
+    "ocho": 8, "nueve": 9, "diez": 10, "once": 11, "doce": 12, "trece": 13, "catorce": 14,
+    "quince": 15, "dieciséis": 16, "diecisiete": 17, "dieciocho": 18, "diecinueve": 19,
+    "veinte": 20, "veintiuno": 21, "veintidós": 22, "veintitrés": 23, "veinticuatro": 24,
+    "veinticinco": 25, "veintiséis": 26, "veintisiete": 27, "veintiocho": 28,
+    "veintinueve": 29, "treinta": 30, "cuarenta": 40, "cincuenta": 50, "sesenta": 60,
+    "setenta": 70, "ochenta": 80, "noventa": 90, "cien": 100,
+}
+_NUMBER = r"\d{1,3}|[a-záéíóúñ]+(?:\s+y\s+[a-záéíóúñ]+)?"
+AGE_PATTERN = re.compile(
+    r"\b(?:tenía|tiene|tendría|tuviera|cumplió|cumple|cumplía|cumpliría)\s+"
+    rf"({_NUMBER})\s+años\b"
+    rf"|\b(?:un|una)\s+(?:[a-záéíóúñ]+\s+)?de\s+({_NUMBER})\s+años\b",
+    re.IGNORECASE
+)
+BIRTHPLACE_PATTERN = re.compile(
+    rf"\b(?:nacid[oa]s?|nació|naciera)\s+en\s+({NAME_PATTERN.pattern})"
+    rf"|\bnatural\s+de\s+({NAME_PATTERN.pattern})"
+)
+MONTHS = (
+    "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto",
+    "septiembre", "setiembre", "octubre", "noviembre", "diciembre",
+)
+DATE_PATTERN = re.compile(
+    rf"\b(\d{{1,2}})\s+de\s+({'|'.join(MONTHS)})(?:\s+(?:de|del)\s+(\d{{4}}))?\b"
+    r"|\b(?:en|de|del|año|hacia)\s+(1\d{3}|20\d{2})\b",
+    re.IGNORECASE
+)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def _roman_to_int(value: str) -> Optional[int]:
+    numerals = {"I": 1, "V": 5, "X": 10, "L": 50, "C": 100, "D": 500, "M": 1000}
+    if not value or any(c not in numerals for c in value.upper()):
+        return None
+    total = 0
+    for current, following in zip(value.upper(), value.upper()[1:] + " "):
+        worth = numerals[current]
+        total += -worth if following != " " and numerals[following] > worth else worth
+    return total
+
+
+def _parse_number(value: str) -> Optional[int]:
+    value = value.lower()
+    if value.isdigit():
+        return int(value)
+    tens, _, units = value.partition(" y ")
+    if units:
+        if tens in _NUMBER_WORDS and units in _NUMBER_WORDS:
+            return _NUMBER_WORDS[tens] + _NUMBER_WORDS[units]
+        return None
+    return _NUMBER_WORDS.get(value)
+
+
+def chapter_key(heading: "re.Match") -> str:
+    """Número de un encabezado de CHAPTER_HEADING (los romanos se convierten) o su rótulo"""
+    label = heading.group(1) or heading.group(2)
+    number = _roman_to_int(label) if not label.isdigit() else int(label)
+    return str(number) if number is not None else label.lower()
+
+
+def split_chapters(text: str) -> List[Tuple[str, str, str]]:
+    """
+    Divide un manuscrito en capítulos según sus encabezados
+
+    Devuelve (clave, título, texto) por capítulo. La clave es el número del
+    encabezado (los romanos se convierten) o, si no lo tiene, su posición.
+    El texto anterior al primer encabezado forma un capítulo "0"; un texto
+    sin encabezados es un único capítulo "1".
+    """
+    headings = list(CHAPTER_HEADING.finditer(text))
+    if not headings:
+        return [("1", "", text)]
+    chapters = []
+    preface = text[:headings[0].start()]
+    if preface.strip():
+        chapters.append(("0", "", preface))
+    used: Set[str] = set()
+    for index, heading in enumerate(headings):
+        end = headings[index + 1].start() if index + 1 < len(headings) else len(text)
+        key = chapter_key(heading)
+        if key in used:
+            key = str(len(chapters) + 1)
+        used.add(key)
+        chapters.append((key, heading.group().strip(), text[heading.end():end]))
+    return chapters
+
+
+def _sentence_starts(text: str) -> Set[int]:
+    """Posiciones en las que empieza una oración o un párrafo"""
+    starts = {0}
+    for match in SENTENCE_END.finditer(text):
+        starts.add(match.end())
+    return starts
+
+
+def _first_non_space(text: str, position: int) -> int:
+    while position < len(text) and text[position] in " \t\"'«“—-¿¡(":
+        position += 1
+    return position
+
+
+def _iter_names(text: str) -> Iterable[Tuple[str, int, bool]]:
+    """
+    Nombres propios del texto: (nombre, posición, si está en posición de lugar)
+
+    Una palabra con mayúscula al principio de una oración solo cuenta como
+    nombre si aparece también en mitad de una oración o si no es una
+    palabra vacía, no aparece en minúsculas y no tiene terminación verbal.
+    La terminación verbal no descarta los nombres que alguna vez van
+    seguidos de una coma o de un verbo, como sujeto ("Lucía miraba el mar").
+    """
+    starts = {_first_non_space(text, start) for start in _sentence_starts(text)}
+    lowercase = set(re.findall(rf"\b[{_LOWER}]+\b", text))
+    places = {
+        match.start(group) for match in BIRTHPLACE_PATTERN.finditer(text)
+        for group in (1, 2) if match.group(group)
+    }
+    candidates = []
+    for match in NAME_PATTERN.finditer(text):
+        words = match.group().split()
+        offset = match.start()
+        # Se descartan las palabras iniciales que no forman parte del nombre
+        while words and words[0].lower() in STOPWORDS:
+            offset = text.index(words[1], offset + len(words[0])) if len(words) > 1 else offset
+            words = words[1:]
+        while words and words[-1].lower() in ("de", "del", "la", "las", "los"):
+            words = words[:-1]
+        if words:
+            candidates.append((" ".join(words), offset))
+    inside = {name for name, offset in candidates if offset not in starts}
+    subjects = {
+        name for name, offset in candidates
+        if SUBJECT_FOLLOWER.match(text, offset + len(name))
+    }
+
+    for name, offset in candidates:
+        if offset in starts and name not in inside and " " not in name:
+            word = name.lower()
+            if word in lowercase or VERB_ENDING.search(word) and name not in subjects:
+                continue
+        previous = text[max(0, offset - 24):offset].lower().split()
+        place = offset in places or bool(previous) and (
+            previous[-1] in PLACE_CUES
+            or previous[-1] == "a" and len(previous) > 1 and previous[-2] in MOTION_VERBS
+        )
+        yield name, offset, place
+
+
+def _evidence(text: str, start: int, end: int) -> str:
+    margin = max(0, (EVIDENCE_CHARS - (end - start)) // 2)
+    snippet = text[max(0, start - margin):end + margin]
+    return " ".join(snippet.split())
+
+
+def extract_chapter(text: str) -> Dict[str, Any]:
+    """
+    Entidades, atributos y fechas de un capítulo
+
+    Un atributo se asigna al personaje nombrado más cerca antes de él en la
+    misma oración; si no hay, al siguiente de la oración, y si tampoco, al
+    último nombrado en el párrafo ("sus ojos verdes").
+    """
+    mentions: Dict[str, Dict[str, int]] = {}
+    people: List[Tuple[int, str]] = []
+    for name, offset, place_cue in _iter_names(text):
+        entry = mentions.setdefault(name, {"count": 0, "places": 0, "first": offset})
+        entry["count"] += 1
+        entry["places"] += place_cue
+        if not place_cue:
+            people.append((offset, name))
+
+    sentence_bounds = sorted(_sentence_starts(text))
+    paragraph_bounds = [0] + [m.end() for m in re.finditer(re.escape(PARAGRAPH_BREAK), text)]
+    people_offsets = [offset for offset, _ in people]
+
+    def enclosing(bounds: List[int], position: int) -> Tuple[int, int]:
+        index = bisect.bisect_right(bounds, position) - 1
+        end = bounds[index + 1] if index + 1 < len(bounds) else len(text)
+        return bounds[max(index, 0)], end
+
+    def owner(start: int, end: int) -> Optional[str]:
+        s_start, s_end = enclosing(sentence_bounds, start)
+        p_start, _ = enclosing(paragraph_bounds, start)
+        before = bisect.bisect_left(people_offsets, start) - 1
+        if before >= 0 and people_offsets[before] >= s_start:
+            return people[before][1]
+        after = bisect.bisect_left(people_offsets, end)
+        if after < len(people) and people_offsets[after] < s_end:
+            return people[after][1]
+        if before >= 0 and people_offsets[before] >= p_start:
+            return people[before][1]
+        return None
+
+    attributes = []
+
+    def add(entity: Optional[str], attribute: str, value: str, match) -> None:
+        if entity is not None:
+            attributes.append({
+                "entity": entity, "attribute": attribute, "value": value,
+                "offset": match.start(), "evidence": _evidence(text, match.start(), match.end()),
+            })
+
+    for attribute, pattern in ATTRIBUTE_PATTERNS:
+        for match in pattern.finditer(text):
+            value = _COLOR_FORMS[match.group(1).lower()]
+            add(owner(match.start(), match.end()), attribute, value, match)
+    for match in AGE_PATTERN.finditer(text):
+        age = _parse_number(match.group(1) or match.group(2))
+        if age is not None and 0 < age < 130:
+            add(owner(match.start(), match.end()), "edad", str(age), match)
+    for match in BIRTHPLACE_PATTERN.finditer(text):
+        place = match.group(1) or match.group(2)
+        add(owner(match.start(), match.end()), "lugar de nacimiento", place, match)
+
+    dates = []
+    for match in DATE_PATTERN.finditer(text):
+        year = match.group(3) or match.group(4)
+        dates.append({
+            "value": match.group().strip() if match.group(1) else year,
+            "year": int(year) if year else None,
+            "offset": match.start(),
+        })
+    return {"mentions": mentions, "attributes": attributes, "dates": dates}
+
+
+def extract_chapters(texts: List[str]) -> List[Dict[str, Any]]:
+    """extract_chapter para varios capítulos (pensada para el pool de procesos)"""
+    return [extract_chapter(text) for text in texts]
+
+
+def _resolve_aliases(mentions: Dict[str, Dict[str, int]]) -> Dict[str, str]:
+    """
+    Nombre completo de cada nombre parcial
+
+    "María" se une a "María Salgado" si es el único nombre completo que
+    empieza o termina por esa palabra.
+    """
+    owners: Dict[str, Set[str]] = defaultdict(set)
+    for name in mentions:
+        if " " in name:
+            words = name.split()
+            owners[words[0]].add(name)
+            owners[words[-1]].add(name)
+    aliases = {}
+    for name in mentions:
+        if " " not in name and len(owners.get(name, ())) == 1:
+            aliases[name] = next(iter(owners[name]))
+    return aliases
+
+
+def _chapter_year(dates: List[Dict[str, Any]]) -> Optional[int]:
+    """Año más citado en el capítulo (el primero en caso de empate)"""
+    years = [date["year"] for date in dates if date["year"]]
+    if not years:
+        return None
+    counts = Counter(years)
+    best = max(counts.values())
+    return next(year for year in years if counts[year] == best)
+
+
+def _label(chapter: Dict[str, Any]) -> str:
+    return f"cap. {chapter['chapter']}"
+
+
+def find_inconsistencies(chapters: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Contradicciones entre capítulos a partir de sus datos indexados
+
+    `chapters` va en orden de lectura, cada uno con su clave ("chapter") y
+    las listas "attributes", "dates" y el diccionario "mentions" de
+    extract_chapter. Devuelve las inconsistencias, las entidades más
+    citadas y la cronología (año de referencia de cada capítulo).
+    """
+    mentions: Dict[str, Dict[str, Any]] = {}
+    for chapter in chapters:
+        for name, entry in chapter["mentions"].items():
+            total = mentions.setdefault(name, {"count": 0, "places": 0, "chapters": []})
+            total["count"] += entry["count"]
+            total["places"] += entry["places"]
+            total["chapters"].append(chapter["chapter"])
+    aliases = _resolve_aliases(mentions)
+
+    # Valores de cada atributo por entidad, con el capítulo donde aparecen
+    values: Dict[Tuple[str, str], Dict[str, List[Dict[str, Any]]]] = defaultdict(dict)
+    ages: Dict[str, List[Tuple[int, Dict[str, Any], int]]] = defaultdict(list)
+    years = [_chapter_year(chapter["dates"]) for chapter in chapters]
+    for position, chapter in enumerate(chapters):
+        seen_ages: Set[str] = set()
+        for item in chapter["attributes"]:
+            entity = aliases.get(item["entity"], item["entity"])
+            if item["attribute"] == "edad":
+                # Solo la primera edad citada de cada personaje por capítulo
+                if entity not in seen_ages:
+                    seen_ages.add(entity)
+                    ages[entity].append((position, item, int(item["value"])))
+                continue
+            occurrences = values[(entity, item["attribute"])].setdefault(item["value"], [])
+            occurrences.append({
+                "chapter": chapter["chapter"], "offset": item["offset"],
+                "evidence": item["evidence"],
+            })
+
+    inconsistencies = []
+    for (entity, attribute), by_value in sorted(values.items()):
+        if len(by_value) < 2:
+            continue
+        described = "; ".join(
+            f"{value} en {', '.join('cap. ' + o['chapter'] for o in occurrences)}"
+            for value, occurrences in by_value.items()
+        )
+        inconsistencies.append({
+            "type": "attribute",
+            "entity": entity,
+            "attribute": attribute,
+            "values": [
+                {"value": value, "occurrences": occurrences}
+                for value, occurrences in by_value.items()
+            ],
+            "message": f"{entity}, {attribute}: {described}",
+        })
+
+    for entity, stated in sorted(ages.items()):
+        for (pos_a, first, age_a), (pos_b, second, age_b) in zip(stated, stated[1:]):
+            year_a, year_b = years[pos_a], years[pos_b]
+            chapter_a, chapter_b = chapters[pos_a], chapters[pos_b]
+            if year_a is not None and year_b is not None:
+                expected = year_b - year_a
+                if abs((age_b - age_a) - expected) <= AGE_TOLERANCE_YEARS:
+                    continue
+                message = (
+                    f"{entity} tiene {age_a} años en {_label(chapter_a)} ({year_a}) y "
+                    f"{age_b} en {_label(chapter_b)} ({year_b}); cabría esperar {age_a + expected}"
+                )
+            elif age_b < age_a:
+                message = (
+                    f"{entity} tiene {age_a} años en {_label(chapter_a)} y {age_b} en "
+                    f"{_label(chapter_b)}, posterior (¿analepsis?)"
+                )
+            else:
+                continue
+            inconsistencies.append({
+                "type": "timeline",
+                "entity": entity,
+                "attribute": "edad",
+                "values": [
+                    {"value": str(age), "year": years[pos], "occurrences": [{
+                        "chapter": chapters[pos]["chapter"], "offset": item["offset"],
+                        "evidence": item["evidence"],
+                    }]}
+                    for pos, item, age in ((pos_a, first, age_a), (pos_b, second, age_b))
+                ],
+                "message": message,
+            })
+
+    entities = []
+    for name, total in sorted(mentions.items(), key=lambda item: -item[1]["count"]):
+        if name in aliases:
+            continue
+        entities.append({
+            "name": name,
+            "label": "LOC" if total["places"] * 2 > total["count"] else "PER",
+            "mentions": total["count"],
+            "aliases": sorted(alias for alias, full in aliases.items() if full == name),
+            "chapters": total["chapters"],
+        })
+    timeline = [
+        {"chapter": chapter["chapter"], "year": year,
+         "dates": [date["value"] for date in chapter["dates"]]}
+        for chapter, year in zip(chapters, years) if chapter["dates"]
+    ]
+    return {
+        "inconsistencies": inconsistencies,
+        "entities": entities[:ENTITY_SUMMARY_LIMIT],
+        "timeline": timeline,
+    }
+
+
+class EntityIndex:
+    """
+    Índice persistente de entidades por manuscrito y capítulo
+
+    Los datos extraídos se guardan por huella del texto del capítulo: un
+    capítulo sin cambios (aunque cambie de posición o de manuscrito) no se
+    vuelve a indexar, y las consultas solo leen las tablas del índice.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path = self.path or data_path("manuscripts", "entities.sqlite3")
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS chapters ("
+                " manuscript_id TEXT NOT NULL, position INTEGER NOT NULL, chapter TEXT NOT NULL,"
+                " title TEXT NOT NULL, hash TEXT NOT NULL, PRIMARY KEY (manuscript_id, position));"
+                "CREATE INDEX IF NOT EXISTS idx_chapters_hash ON chapters (hash);"
+                "CREATE TABLE IF NOT EXISTS indexed (hash TEXT PRIMARY KEY) WITHOUT ROWID;"
+                "CREATE TABLE IF NOT EXISTS mentions ("
+                " hash TEXT NOT NULL, entity TEXT NOT NULL, count INTEGER NOT NULL,"
+                " places INTEGER NOT NULL, first_offset INTEGER NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS idx_mentions_hash ON mentions (hash);"
+                "CREATE TABLE IF NOT EXISTS attributes ("
+                " hash TEXT NOT NULL, entity TEXT NOT NULL, attribute TEXT NOT NULL,"
+                " value TEXT NOT NULL, offset INTEGER NOT NULL, evidence TEXT NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS idx_attributes_hash ON attributes (hash);"
+                "CREATE TABLE IF NOT EXISTS dates ("
+                " hash TEXT NOT NULL, value TEXT NOT NULL, year INTEGER, offset INTEGER NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS idx_dates_hash ON dates (hash);"
+            )
+            self._db.commit()
+        return self._db
+
+    def chapters(self, manuscript_id: str) -> List[Tuple[str, str, str]]:
+        """(clave, título, huella) de los capítulos indexados, en orden"""
+        with self._lock:
+            return [tuple(row) for row in self.db.execute(
+                "SELECT chapter, title, hash FROM chapters WHERE manuscript_id = ?"
+                " ORDER BY position", (manuscript_id,)
+            )]
+
+    def missing(self, hashes: Iterable[str]) -> Set[str]:
+        """Huellas que aún no están indexadas"""
+        wanted = list(set(hashes))
+        found: Set[str] = set()
+        with self._lock:
+            for start in range(0, len(wanted), 500):
+                batch = wanted[start:start + 500]
+                placeholders = ", ".join("?" * len(batch))
+                found.update(row[0] for row in self.db.execute(
+                    f"SELECT hash FROM indexed WHERE hash IN ({placeholders})", batch
+                ))
+        return set(wanted) - found
+
+    def save(self, manuscript_id: str, chapters: List[Tuple[str, str, str]],
+             extracted: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Sustituye la lista de capítulos del manuscrito y añade los datos nuevos
+
+        Los datos de los capítulos que ya no usa ningún manuscrito se borran.
+        """
+        with self._lock, self.db:
+            db = self.db
+            previous = {row[0] for row in db.execute(
+                "SELECT hash FROM chapters WHERE manuscript_id = ?", (manuscript_id,)
+            )}
+            for key, facts in extracted.items():
+                if db.execute("INSERT OR IGNORE INTO indexed (hash) VALUES (?)", (key,)).rowcount:
+                    _insert_facts(db, key, facts)
+            db.execute("DELETE FROM chapters WHERE manuscript_id = ?", (manuscript_id,))
+            db.executemany(
+                "INSERT INTO chapters (manuscript_id, position, chapter, title, hash)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(manuscript_id, position, chapter, title, key)
+                 for position, (chapter, title, key) in enumerate(chapters)]
+            )
+            for key in previous - {key for _, _, key in chapters}:
+                if db.execute("SELECT 1 FROM chapters WHERE hash = ? LIMIT 1", (key,)).fetchone():
+                    continue
+                for table in ("indexed", "mentions", "attributes", "dates"):
+                    db.execute(f"DELETE FROM {table} WHERE hash = ?", (key,))
+
+    def load(self, manuscript_id: str) -> List[Dict[str, Any]]:
+        """Datos indexados de cada capítulo, en orden, con el formato de extract_chapter"""
+        with self._lock:
+            db = self.db
+            rows = db.execute(
+                "SELECT chapter, title, hash FROM chapters WHERE manuscript_id = ?"
+                " ORDER BY position", (manuscript_id,)
+            ).fetchall()
+            by_hash: Dict[str, Dict[str, Any]] = {
+                key: {"mentions": {}, "attributes": [], "dates": []} for _, _, key in rows
+            }
+            join = (
+                "JOIN (SELECT DISTINCT hash FROM chapters WHERE manuscript_id = ?) c"
+                " USING (hash)"
+            )
+            for key, entity, count, places, first in db.execute(
+                f"SELECT hash, entity, count, places, first_offset FROM mentions {join}",
+                (manuscript_id,)
+            ):
+                by_hash[key]["mentions"][entity] = {
+                    "count": count, "places": places, "first": first
+                }
+            for key, entity, attribute, value, offset, evidence in db.execute(
+                f"SELECT hash, entity, attribute, value, offset, evidence FROM attributes {join}"
+                " ORDER BY hash, offset", (manuscript_id,)
+            ):
+                by_hash[key]["attributes"].append({
+                    "entity": entity, "attribute": attribute, "value": value,
+                    "offset": offset, "evidence": evidence,
+                })
+            for key, value, year, offset in db.execute(
+                f"SELECT hash, value, year, offset FROM dates {join} ORDER BY hash, offset",
+                (manuscript_id,)
+            ):
+                by_hash[key]["dates"].append({"value": value, "year": year, "offset": offset})
+        return [
+            {"chapter": chapter, "title": title, **by_hash[key]} for chapter, title, key in rows
+        ]
+
+
+def _insert_facts(db: sqlite3.Connection, key: str, facts: Dict[str, Any]) -> None:
+    db.executemany(
+        "INSERT INTO mentions (hash, entity, count, places, first_offset) VALUES (?, ?, ?, ?, ?)",
+        [(key, name, entry["count"], entry["places"], entry["first"])
+         for name, entry in facts["mentions"].items()]
+    )
+    db.executemany(
+        "INSERT INTO attributes (hash, entity, attribute, value, offset, evidence)"
+        " VALUES (?, ?, ?, ?, ?, ?)",
+        [(key, item["entity"], item["attribute"], item["value"], item["offset"],
+          item["evidence"]) for item in facts["attributes"]]
+    )
+    db.executemany(
+        "INSERT INTO dates (hash, value, year, offset) VALUES (?, ?, ?, ?)",
+        [(key, date["value"], date["year"], date["offset"]) for date in facts["dates"]]
+    )
+
+
+entity_index = EntityIndex()
@@ -0,0 +1,213 @@
+"""
+Detección de frases repetidas
+Huellas polinómicas encadenadas sobre la secuencia de palabras para
+encontrar todas las frases de 3 a 12 palabras que se repiten en el texto
+"""
+
+from __future__ import annotations
+
+import os
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.nlp.streaming import SIGNIFICANT_WORD_LENGTH, WORD_PATTERN
+from src.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+MIN_PHRASE_WORDS = 3
+MAX_PHRASE_WORDS = 12
+MIN_PHRASE_REPEATS = 2
+# Palabras como máximo que se conservan por manuscrito (acota la memoria)
+MAX_PHRASE_TOKENS = int(os.getenv("ECDOTICA_PHRASE_MAX_WORDS", str(2_000_000)))
+# Posiciones devueltas como máximo por cada frase
+MAX_PHRASE_OFFSETS = 20
+
+_KEY_MULTIPLIER = 0x9E3779B97F4A7C15
+_BASE = 0xC2B2AE3D27D4EB4F
+
+
+class RepeatedPhraseDetector:
+    """
+    Acumula las palabras de un texto y localiza sus frases repetidas
+
+    Cada palabra se guarda como un entero y su posición, sin copiar el
+    texto. Al terminar, la huella de las frases de n palabras se obtiene
+    de la de n-1 en tiempo lineal y solo se informa de las frases
+    maximales (las que no forman siempre parte de otra más larga). Una
+    frase que aparece a lo sumo una vez más que otra más larga que la
+    contiene tampoco se informa: suele ser la misma frase, cuya última
+    aparición no puede extenderse (p. ej. al final del texto).
+    """
+
+    def __init__(self, max_tokens: int = MAX_PHRASE_TOKENS):
+        self.max_tokens = max_tokens
+        self.truncated = False
+        self._vocabulary: Dict[str, int] = {}
+        self._words: List[str] = []
+        self._ids = array("i")
+        self._starts = array("q")
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def update(self, words: List[str], starts: List[int], offset: int = 0) -> None:
+        """Añade palabras con su posición de inicio, relativa a `offset`"""
+        room = self.max_tokens - len(self._ids)
+        if room <= 0:
+            self.truncated = self.truncated or bool(words)
+            return
+        if len(words) > room:
+            words, starts = words[:room], starts[:room]
+            self.truncated = True
+        vocabulary = self._vocabulary
+        for word in words:
+            if word not in vocabulary:
+                vocabulary[word] = len(self._words)
+                self._words.append(word)
+        self._ids.extend([vocabulary[word] for word in words])
+        self._starts.extend([offset + start for start in starts] if offset else starts)
+
+    def tokens(self) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """Identificador y posición de cada palabra, y el vocabulario, sin copiarlos"""
+        return (np.frombuffer(self._ids, dtype=np.int32),
+                np.frombuffer(self._starts, dtype=np.int64), self._words)
+
+    def stutters(self) -> List[str]:
+        """Palabras escritas tres o más veces seguidas, en orden de aparición"""
+        ids = np.frombuffer(self._ids, dtype=np.int32)
+        if len(ids) < 3:
+            return []
+        hits = np.flatnonzero((ids[:-2] == ids[1:-1]) & (ids[1:-1] == ids[2:]))
+        seen: Dict[str, None] = {}
+        for i in hits:
+            seen.setdefault(self._words[ids[i]], None)
+        return list(seen)
+
+    def phrases(self, min_words: int = MIN_PHRASE_WORDS, max_words: int = MAX_PHRASE_WORDS,
+                min_count: int = MIN_PHRASE_REPEATS, limit: int = 20,
+                max_offsets: int = MAX_PHRASE_OFFSETS) -> List[Dict[str, Any]]:
+        """
+        Frases repetidas, de mayor a menor peso (repeticiones × palabras)
+
+        Se descartan las formadas solo por palabras cortas (artículos,
+        preposiciones...), que se repiten en cualquier texto.
+        """
+        ids = np.frombuffer(self._ids, dtype=np.int32).astype(np.int64)
+        if len(ids) < min_words or limit <= 0:
+            return []
+        lengths = np.fromiter((len(w) for w in self._words), dtype=np.int64, count=len(self._words))
+        significant = np.concatenate([[0], np.cumsum(lengths[ids] > SIGNIFICANT_WORD_LENGTH)])
+        with np.errstate(over="ignore"):
+            keys = (ids.astype(np.uint64) + np.uint64(1)) * np.uint64(_KEY_MULTIPLIER)
+
+        found: List[tuple] = []
+        base = np.uint64(_BASE)
+        hashes = keys
+        previous = None
+        for n in range(2, max_words + 2):
+            if n <= max_words:
+                if len(ids) < n:
+                    break
+                with np.errstate(over="ignore"):
+                    hashes = hashes[:-1] * base + keys[n - 1:]
+                level = _group(hashes) if n >= min_words else None
+            else:
+                level = None
+            if previous is not None:
+                found.extend(_maximal_candidates(
+                    previous, level, n - 1, significant, min_count, limit
+                ))
+            previous = level
+
+        found = _drop_near_subphrases(found, ids)
+        found.sort(key=lambda item: (-item[0], item[1], item[3][0]))
+        starts = np.frombuffer(self._starts, dtype=np.int64)
+        results = []
+        for _, n, count, positions in found[:limit]:
+            first = positions[0]
+            results.append({
+                "phrase": " ".join(self._words[w] for w in ids[first:first + n]),
+                "words": n,
+                "count": count,
+                "offsets": [
+                    [int(starts[p]), int(starts[p + n - 1] + lengths[ids[p + n - 1]])]
+                    for p in positions[:max_offsets]
+                ],
+            })
+        return results
+
+
+def _group(hashes: np.ndarray) -> Dict[str, np.ndarray]:
+    """Agrupa las posiciones con la misma huella (ordenación estable)"""
+    order = np.argsort(hashes, kind="stable")
+    ordered = hashes[order]
+    starts = np.concatenate([[0], np.flatnonzero(ordered[1:] != ordered[:-1]) + 1])
+    counts = np.diff(np.concatenate([starts, [len(order)]]))
+    per_position = np.empty(len(order), dtype=np.int64)
+    per_position[order] = np.repeat(counts, counts)
+    return {"order": order, "starts": starts, "counts": counts, "per_position": per_position}
+
+
+def _maximal_candidates(level: Dict[str, np.ndarray], longer: Optional[Dict[str, np.ndarray]],
+                        n: int, significant: np.ndarray, min_count: int, limit: int) -> List[tuple]:
+    """Frases de n palabras repetidas que no se extienden siempre a n+1"""
+    order, starts, counts = level["order"], level["starts"], level["counts"]
+    groups = np.flatnonzero(counts >= min_count)
+    if not len(groups):
+        return []
+    first = order[starts[groups]]
+    keep = significant[first + n] - significant[first] > 0
+    if longer is not None:
+        extended = longer["per_position"]
+        right = first < len(extended)
+        keep &= ~(right & (extended[np.minimum(first, len(extended) - 1)] == counts[groups]))
+        left = first > 0
+        keep &= ~(left & (extended[np.maximum(first - 1, 0)] == counts[groups]))
+    groups = groups[keep]
+    if len(groups) > limit:
+        groups = groups[np.argsort(-counts[groups], kind="stable")[:limit]]
+    return [
+        (int(counts[g]) * n, n, int(counts[g]),
+         order[starts[g]:starts[g] + counts[g]].tolist())
+        for g in groups
+    ]
+
+
+def _drop_near_subphrases(found: List[tuple], ids: np.ndarray) -> List[tuple]:
+    """
+    Descarta las frases contenidas en otra informada que se repite casi las mismas veces
+
+    Las frases se recorren de la más larga a la más corta; cada una que se
+    conserva registra sus tramos de palabras con su número de repeticiones,
+    así que comprobar una frase es una sola consulta y no una comparación
+    con todas las anteriores.
+    """
+    covered: Dict[tuple, int] = {}
+    kept: List[tuple] = []
+    for item in sorted(found, key=lambda item: -item[1]):
+        _, n, count, positions = item
+        words = tuple(ids[positions[0]:positions[0] + n].tolist())
+        if covered.get(words, 0) >= max(count - 1, 1):
+            continue
+        kept.append(item)
+        for length in range(1, n):
+            for shift in range(n - length + 1):
+                part = words[shift:shift + length]
+                if covered.get(part, 0) < count:
+                    covered[part] = count
+    return kept
+
+
+def find_repeated_phrases(text: str, min_words: int = MIN_PHRASE_WORDS,
+                          max_words: int = MAX_PHRASE_WORDS, min_count: int = MIN_PHRASE_REPEATS,
+                          limit: int = 50) -> Dict[str, Any]:
+    """Frases repetidas de un texto completo (pensada para el pool de procesos)"""
+    detector = RepeatedPhraseDetector()
+    matches = list(WORD_PATTERN.finditer(text.lower()))
+    detector.update([m.group() for m in matches], [m.start() for m in matches])
+    return {
+        "word_count": len(detector),
+        "phrases": detector.phrases(min_words, max_words, min_count, limit),
+        "truncated": detector.truncated,
+    }
@@ -0,0 +1,214 @@
+"""
+Análisis lingüístico con spaCy
+El modelo se carga una sola vez por proceso trabajador, en el primer uso,
+y los manuscritos se procesan por lotes de párrafos con nlp.pipe
+"""
+
+import os
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from src.nlp.streaming import PARAGRAPH_BREAK, SENTENCE_BREAK, WORD_PATTERN
+from src.utils.lazy import lazy_import, register_warmup
+
+spacy = lazy_import("spacy")
+
+NLP_MODEL = os.getenv("ECDOTICA_NLP_MODEL", "es_core_news_sm")
+# Caracteres de texto enviados a cada proceso trabajador
+NLP_CHUNK_CHARS = int(os.getenv("ECDOTICA_NLP_CHUNK_CHARS", str(100_000)))
+# Párrafos por lote dentro de nlp.pipe
+NLP_PIPE_BATCH_SIZE = int(os.getenv("ECDOTICA_NLP_PIPE_BATCH_SIZE", "64"))
+# Entidades distintas devueltas como máximo
+NLP_ENTITY_LIMIT = 50
+
+# Categorías gramaticales con contenido léxico
+CONTENT_POS = ("NOUN", "PROPN", "VERB", "ADJ", "ADV")
+
+# Componentes que cada opción de la petición necesita
+_OPTION_COMPONENTS = {
+    "pos": ("morphologizer", "tagger", "attribute_ruler"),
+    "lemmas": ("lemmatizer",),
+    "ner": ("ner",),
+    "sentences": ("parser", "senter"),
+}
+
+_nlp = None
+_load_error: Optional[str] = None
+
+
+def load_pipeline():
+    """Modelo de spaCy del proceso actual, o None si no está disponible"""
+    global _nlp, _load_error
+    if _nlp is None and _load_error is None:
+        try:
+            _nlp = spacy.load(NLP_MODEL)
+        except (ImportError, OSError) as e:
+            _load_error = str(e)
+    return _nlp
+
+
+def _warm_up() -> None:
+    if load_pipeline() is None:
+        raise ImportError(_load_error)
+
+
+register_warmup("spacy_model", _warm_up)
+
+
+def disabled_components(options: Dict[str, Any], pipe_names: List[str]) -> List[str]:
+    """
+    Componentes que se pueden omitir según las opciones de la petición
+
+    Por defecto se calcula todo. El lematizador necesita las etiquetas
+    gramaticales y tok2vec solo se omite si ningún componente lo usa.
+    """
+    wanted = {option: bool(options.get(option, True)) for option in _OPTION_COMPONENTS}
+    if wanted["lemmas"]:
+        wanted["pos"] = True
+    disabled = {
+        component
+        for option, components in _OPTION_COMPONENTS.items() if not wanted[option]
+        for component in components
+    }
+    if not (wanted["pos"] or wanted["ner"] or wanted["sentences"]):
+        disabled.add("tok2vec")
+    return [name for name in pipe_names if name in disabled]
+
+
+def iter_paragraph_batches(text: str, max_chars: int = NLP_CHUNK_CHARS) -> Iterator[List[str]]:
+    """Agrupa los párrafos del texto en lotes de hasta `max_chars` caracteres"""
+    batch: List[str] = []
+    size = 0
+    for paragraph in text.split(PARAGRAPH_BREAK):
+        paragraph = paragraph.strip()
+        # Un párrafo desmesurado se corta por espacios
+        if len(paragraph) > max_chars and batch:
+            yield batch
+            batch, size = [], 0
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            yield [paragraph[:cut]]
+            paragraph = paragraph[cut:].strip()
+        if not paragraph:
+            continue
+        if batch and size + len(paragraph) > max_chars:
+            yield batch
+            batch, size = [], 0
+        batch.append(paragraph)
+        size += len(paragraph)
+    if batch:
+        yield batch
+
+
+def analyze_paragraphs(paragraphs: List[str],
+                       options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Métricas de un lote de párrafos (pensada para el pool de procesos)
+
+    Devuelve solo conteos, que se combinan con merge_analyses; los Doc de
+    spaCy no salen del proceso trabajador.
+    """
+    options = options or {}
+    nlp = load_pipeline()
+    if nlp is None:
+        return _basic_analysis(paragraphs)
+
+    disable = disabled_components(options, nlp.pipe_names)
+    word_count = token_count = sentence_count = 0
+    pos_counts: Counter = Counter()
+    lemma_counts: Counter = Counter()
+    entity_counts: Counter = Counter()
+    entity_labels: Counter = Counter()
+    for doc in nlp.pipe(paragraphs, batch_size=NLP_PIPE_BATCH_SIZE, disable=disable):
+        token_count += len(doc)
+        words = [token for token in doc if not (token.is_punct or token.is_space)]
+        word_count += len(words)
+        if doc.has_annotation("SENT_START"):
+            sentence_count += sum(1 for _ in doc.sents)
+        else:
+            sentence_count += _count_sentences(doc.text)
+        if doc.has_annotation("POS"):
+            pos_counts.update(token.pos_ for token in words)
+        if doc.has_annotation("LEMMA"):
+            lemma_counts.update(token.lemma_.lower() for token in words if token.is_alpha)
+        for entity in doc.ents:
+            entity_counts[(entity.text, entity.label_)] += 1
+            entity_labels[entity.label_] += 1
+
+    return {
+        "model": nlp.meta.get("lang", "") + "_" + nlp.meta.get("name", ""),
+        "components": [name for name in nlp.pipe_names if name not in disable],
+        "paragraph_count": len(paragraphs),
+        "token_count": token_count,
+        "word_count": word_count,
+        "sentence_count": sentence_count,
+        "pos_counts": dict(pos_counts),
+        "lemma_counts": dict(lemma_counts.most_common(NLP_ENTITY_LIMIT * 4)),
+        "entity_counts": [[text, label, count] for (text, label), count in entity_counts.items()],
+        "entity_labels": dict(entity_labels),
+    }
+
+
+def _count_sentences(text: str) -> int:
+    return sum(1 for part in SENTENCE_BREAK.split(text) if part.strip())
+
+
+def _basic_analysis(paragraphs: List[str]) -> Dict[str, Any]:
+    """Tokenización por expresiones regulares cuando no hay modelo de spaCy"""
+    word_count = sum(len(WORD_PATTERN.findall(paragraph)) for paragraph in paragraphs)
+    return {
+        "model": None,
+        "components": [],
+        "paragraph_count": len(paragraphs),
+        "token_count": word_count,
+        "word_count": word_count,
+        "sentence_count": sum(_count_sentences(paragraph) for paragraph in paragraphs),
+        "pos_counts": {},
+        "lemma_counts": {},
+        "entity_counts": [],
+        "entity_labels": {},
+        "warning": f"Modelo de spaCy '{NLP_MODEL}' no disponible: {_load_error}",
+    }
+
+
+def merge_analyses(partials: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combina las métricas de todos los lotes de un texto"""
+    merged: Dict[str, Any] = {
+        "model": None, "components": [], "paragraph_count": 0, "token_count": 0,
+        "word_count": 0, "sentence_count": 0,
+    }
+    pos_counts: Counter = Counter()
+    lemma_counts: Counter = Counter()
+    entity_counts: Counter = Counter()
+    entity_labels: Counter = Counter()
+    warnings = set()
+    for partial in partials:
+        merged["model"] = merged["model"] or partial["model"]
+        merged["components"] = merged["components"] or partial["components"]
+        for key in ("paragraph_count", "token_count", "word_count", "sentence_count"):
+            merged[key] += partial[key]
+        pos_counts.update(partial["pos_counts"])
+        lemma_counts.update(partial["lemma_counts"])
+        entity_labels.update(partial["entity_labels"])
+        for text, label, count in partial["entity_counts"]:
+            entity_counts[(text, label)] += count
+        if partial.get("warning"):
+            warnings.add(partial["warning"])
+
+    words = merged["word_count"]
+    content_words = sum(pos_counts[pos] for pos in CONTENT_POS)
+    merged.update({
+        "avg_words_per_sentence": round(words / merged["sentence_count"], 2)
+        if merged["sentence_count"] else 0,
+        "lexical_density": round(content_words / words, 3) if words and pos_counts else None,
+        "pos_counts": dict(pos_counts.most_common()),
+        "top_lemmas": dict(lemma_counts.most_common(NLP_ENTITY_LIMIT)),
+        "entities": [
+            {"text": text, "label": label, "count": count}
+            for (text, label), count in entity_counts.most_common(NLP_ENTITY_LIMIT)
+        ],
+        "entity_labels": dict(entity_labels.most_common()),
+        "warnings": sorted(warnings),
+    })
+    return merged
@@ -0,0 +1,294 @@
+"""
+Detección de plagio y casi-duplicados
+Firmas MinHash sobre shingles de palabras, índice LSH por bandas
+persistido en SQLite y actualizado con cada manuscrito recibido
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from src.nlp.streaming import WORD_PATTERN
+from src.utils.lazy import lazy_import
+from src.utils.paths import data_path
+
+np = lazy_import("numpy")
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+# Se conserva 1 de cada FINGERPRINT_SAMPLE shingles para localizar pasajes
+FINGERPRINT_SAMPLE = 16
+# Bloque de shingles procesado a la vez al calcular la firma
+_BLOCK = 4096
+_MAX_HASH = 0xFFFFFFFF
+
+
+@lru_cache(maxsize=None)
+def _seeds() -> np.ndarray:
+    """Semillas de las permutaciones MinHash (fijas: las firmas se persisten)"""
+    return np.random.RandomState(20240101).randint(
+        0, 2 ** 32, size=NUM_PERMUTATIONS, dtype=np.uint64
+    ).astype(np.uint32)
+
+
+@lru_cache(maxsize=None)
+def _powers() -> np.ndarray:
+    return np.array(
+        [pow(16777619, SHINGLE_SIZE - 1 - i, 2 ** 32) for i in range(SHINGLE_SIZE)],
+        dtype=np.uint32
+    )
+
+
+def _mix32(values: np.ndarray) -> np.ndarray:
+    """Finalizador de MurmurHash3 aplicado a un array uint32"""
+    values = values ^ (values >> np.uint32(16))
+    values = values * np.uint32(0x85EBCA6B)
+    values = values ^ (values >> np.uint32(13))
+    values = values * np.uint32(0xC2B2AE35)
+    return values ^ (values >> np.uint32(16))
+
+
+def hash_tokens(tokens: List[str]) -> np.ndarray:
+    return np.fromiter(
+        (zlib.crc32(token.encode("utf-8", "surrogatepass")) for token in tokens),
+        dtype=np.uint32, count=len(tokens)
+    )
+
+
+def shingle_hashes(token_hashes: np.ndarray) -> np.ndarray:
+    """Huella de cada ventana de SHINGLE_SIZE palabras consecutivas"""
+    count = len(token_hashes) - SHINGLE_SIZE + 1
+    if count <= 0:
+        return np.empty(0, dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        combined = np.zeros(count, dtype=np.uint32)
+        powers = _powers()
+        for i in range(SHINGLE_SIZE):
+            combined += token_hashes[i:i + count] * powers[i]
+        return _mix32(combined)
+
+
+class Fingerprint:
+    """Firma MinHash y muestra de shingles de un texto"""
+
+    def __init__(self, signature: np.ndarray, samples: np.ndarray, shingle_count: int):
+        self.signature = signature
+        self.samples = samples
+        self.shingle_count = shingle_count
+
+    @property
+    def empty(self) -> bool:
+        return self.shingle_count == 0
+
+
+class FingerprintBuilder:
+    """
+    Calcula la huella de un texto a partir de sus palabras, por fragmentos
+
+    La memoria depende de la muestra de shingles, no del texto completo.
+    """
+
+    def __init__(self):
+        self.signature = np.full(NUM_PERMUTATIONS, _MAX_HASH, dtype=np.uint32)
+        self.shingle_count = 0
+        self._samples: List[np.ndarray] = []
+        self._carry = np.empty(0, dtype=np.uint32)
+
+    def update(self, tokens: List[str]) -> None:
+        if not tokens:
+            return
+        token_hashes = np.concatenate([self._carry, hash_tokens(tokens)])
+        self._carry = token_hashes[-(SHINGLE_SIZE - 1):]
+        self.add_shingles(shingle_hashes(token_hashes))
+
+    def add_shingles(self, shingles: np.ndarray) -> None:
+        if not len(shingles):
+            return
+        self.shingle_count += len(shingles)
+        self._samples.append(shingles[shingles % FINGERPRINT_SAMPLE == 0])
+        seeds = _seeds()
+        with np.errstate(over="ignore"):
+            for start in range(0, len(shingles), _BLOCK):
+                block = shingles[start:start + _BLOCK]
+                permuted = _mix32(block[None, :] ^ seeds[:, None])
+                np.minimum(self.signature, permuted.min(axis=1), out=self.signature)
+
+    def build(self) -> Fingerprint:
+        samples = np.unique(np.concatenate(self._samples)) if self._samples else \
+            np.empty(0, dtype=np.uint32)
+        return Fingerprint(self.signature.copy(), samples.astype(np.uint32), self.shingle_count)
+
+
+class TextFingerprint(Fingerprint):
+    """Huella de un texto consultado, con la posición de cada palabra"""
+
+    def __init__(self, text: str):
+        matches = list(WORD_PATTERN.finditer(text.lower()))
+        shingles = shingle_hashes(hash_tokens([m.group() for m in matches]))
+        builder = FingerprintBuilder()
+        builder.add_shingles(shingles)
+        built = builder.build()
+        super().__init__(built.signature, built.samples, built.shingle_count)
+        self.shingles = shingles
+        self.starts = np.array([m.start() for m in matches], dtype=np.int64)
+        self.ends = np.array([m.end() for m in matches], dtype=np.int64)
+
+
+def fingerprint_text(text: str) -> TextFingerprint:
+    """Huella completa de un texto (pensada para ejecutarse en el pool de procesos)"""
+    return TextFingerprint(text)
+
+
+def _band_keys(signature: np.ndarray) -> List[int]:
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()
+        digest = hashlib.blake2b(bytes([band]) + rows, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+class PlagiarismIndex:
+    """Índice LSH persistente de todos los manuscritos recibidos"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path = self.path or data_path("plagiarism", "index.sqlite3")
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " doc_id INTEGER PRIMARY KEY AUTOINCREMENT, manuscript_id TEXT UNIQUE NOT NULL,"
+                " title TEXT, text_sha256 TEXT UNIQUE, shingle_count INTEGER NOT NULL,"
+                " signature BLOB NOT NULL, samples BLOB NOT NULL, created_at TEXT NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS lsh_buckets ("
+                " bucket INTEGER NOT NULL, doc_id INTEGER NOT NULL,"
+                " PRIMARY KEY (bucket, doc_id)) WITHOUT ROWID"
+            )
+            self._db.commit()
+        return self._db
+
+    def contains_text(self, text_sha256: str) -> bool:
+        with self._lock:
+            row = self.db.execute(
+                "SELECT 1 FROM documents WHERE text_sha256 = ?", (text_sha256,)
+            ).fetchone()
+        return row is not None
+
+    def add(self, manuscript_id: str, fingerprint: Fingerprint, title: str = "",
+            text_sha256: Optional[str] = None) -> bool:
+        """Añade un manuscrito al índice; devuelve False si ya estaba o no tiene texto"""
+        if fingerprint.empty:
+            return False
+        with self._lock:
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO documents (manuscript_id, title, text_sha256,"
+                " shingle_count, signature, samples, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (manuscript_id, title, text_sha256, fingerprint.shingle_count,
+                 fingerprint.signature.tobytes(), fingerprint.samples.tobytes(),
+                 datetime.now().isoformat())
+            )
+            if cursor.rowcount == 0:
+                return False
+            doc_id = cursor.lastrowid
+            self.db.executemany(
+                "INSERT OR IGNORE INTO lsh_buckets (bucket, doc_id) VALUES (?, ?)",
+                [(key, doc_id) for key in _band_keys(fingerprint.signature)]
+            )
+            self.db.commit()
+        return True
+
+    def query(self, fingerprint: TextFingerprint, top_k: int = 5,
+              min_similarity: float = 0.0, max_candidates: int = 100) -> List[Dict[str, Any]]:
+        """
+        Manuscritos más parecidos al texto consultado
+
+        Solo se comparan los candidatos que comparten alguna banda LSH, por
+        lo que el coste no crece con el tamaño del corpus.
+        """
+        if fingerprint.empty:
+            return []
+        keys = _band_keys(fingerprint.signature)
+        placeholders = ", ".join("?" * len(keys))
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT d.manuscript_id, d.title, d.signature, d.samples, COUNT(*) AS bands"
+                " FROM lsh_buckets b JOIN documents d ON d.doc_id = b.doc_id"
+                f" WHERE b.bucket IN ({placeholders})"
+                " GROUP BY b.doc_id ORDER BY bands DESC LIMIT ?",
+                (*keys, max_candidates)
+            ).fetchall()
+
+        matches = []
+        for manuscript_id, title, signature, samples, _ in rows:
+            signature = np.frombuffer(signature, dtype=np.uint32)
+            similarity = float(np.mean(signature == fingerprint.signature))
+            if similarity < min_similarity:
+                continue
+            samples = np.frombuffer(samples, dtype=np.uint32)
+            shared = np.isin(fingerprint.samples, samples, assume_unique=True)
+            containment = float(shared.mean()) if len(fingerprint.samples) else 0.0
+            matches.append({
+                "manuscript_id": manuscript_id,
+                "title": title,
+                "similarity": round(similarity, 3),
+                "containment": round(containment, 3),
+                "_samples": samples,
+            })
+
+        matches.sort(key=lambda match: match["similarity"], reverse=True)
+        matches = matches[:top_k]
+        for match in matches:
+            match["passages"] = overlapping_passages(fingerprint, match.pop("_samples"))
+        return matches
+
+    def count(self) -> int:
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+def overlapping_passages(fingerprint: TextFingerprint, samples: np.ndarray,
+                         limit: int = 5) -> List[Dict[str, int]]:
+    """
+    Pasajes del texto consultado que también aparecen en otro manuscrito
+
+    Devuelve posiciones de carácter, de mayor a menor longitud.
+    """
+    hits = np.flatnonzero(np.isin(fingerprint.shingles, samples))
+    if not len(hits):
+        return []
+    # Solo se comparan shingles muestreados: se unen coincidencias cercanas
+    gap = FINGERPRINT_SAMPLE * 2
+    breaks = np.flatnonzero(np.diff(hits) > gap)
+    first = np.concatenate([[hits[0]], hits[breaks + 1]])
+    last = np.concatenate([hits[breaks], [hits[-1]]]) + SHINGLE_SIZE - 1
+    passages = [
+        {
+            "start": int(fingerprint.starts[a]),
+            "end": int(fingerprint.ends[b]),
+            "words": int(b - a + 1),
+        }
+        for a, b in zip(first, last)
+    ]
+    passages.sort(key=lambda passage: passage["words"], reverse=True)
+    return passages[:limit]
+
+
+plagiarism_index = PlagiarismIndex()
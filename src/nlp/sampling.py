@@ -0,0 +1,121 @@
+"""
+Estimación de métricas de un documento a partir de una muestra de páginas
+Extrapola los totales (palabras, oraciones, párrafos) y las razones entre
+ellos con sus intervalos de confianza, tratando la muestra estratificada
+como aleatoria simple, lo que da intervalos algo conservadores
+"""
+
+from typing import Dict, Optional, Sequence, Tuple
+
+from src.nlp.streaming import StreamingTextAnalyzer, sentence_state
+from src.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Cuantil de la normal para intervalos de confianza del 95 %
+CONFIDENCE_LEVEL = 0.95
+CONFIDENCE_Z = 1.96
+
+# Conteos de cada página de la muestra
+PAGE_COUNTS = ("words", "sentences", "paragraphs", "complex_words", "characters")
+
+Interval = Tuple[float, Optional[float], Optional[float]]
+
+
+def page_sentences(text: str, last: bool = False) -> int:
+    """
+    Oraciones que terminan en la página
+
+    Una oración que cruza el salto de página se cuenta solo en la página
+    donde termina, como al enlazar las páginas en el análisis completo; la
+    que queda abierta al final del documento, en la última página. Solo se
+    desvía del texto completo si una página empieza por un signo de cierre
+    tras una oración sin terminar, algo raro que no compensa leer la
+    página anterior.
+    """
+    state = sentence_state(text)
+    ended = state["inner"] + (state["opens"] and state["breaks"] > 0)
+    return ended + (last and state["closes"])
+
+
+def page_counts(text: str, last: bool = False) -> Dict[str, int]:
+    """
+    Conteos de una página con el mismo tokenizador que el análisis completo
+
+    `last` indica si es la última página del documento. Las páginas se unen
+    con un salto de párrafo, así que palabras y párrafos se suman sin más.
+    """
+    stats = StreamingTextAnalyzer().feed_all([text]).finish()
+    return {
+        "words": stats.word_count,
+        "sentences": page_sentences(text, last),
+        "paragraphs": stats.paragraph_count,
+        "complex_words": stats.complex_word_count,
+        "characters": stats.text_length,
+    }
+
+
+def _correction(sampled: int, population: int) -> float:
+    """Varianza de la media con corrección por población finita"""
+    return (1 - sampled / population) / sampled
+
+
+def estimate_total(values: Sequence[float], population: int) -> Interval:
+    """
+    Total de la población a partir de los valores de la muestra
+
+    El límite inferior nunca baja de lo ya observado en la muestra. Con una
+    sola página muestreada no hay varianza y el intervalo queda abierto.
+    """
+    sample = np.asarray(values, dtype=float)
+    observed = float(sample.sum())
+    estimate = population * float(sample.mean())
+    if len(sample) >= population:
+        return estimate, estimate, estimate
+    if len(sample) < 2:
+        return estimate, None, None
+    margin = CONFIDENCE_Z * population * float(
+        np.sqrt(sample.var(ddof=1) * _correction(len(sample), population))
+    )
+    return estimate, max(observed, estimate - margin), estimate + margin
+
+
+def estimate_ratio(numerators: Sequence[float], denominators: Sequence[float],
+                   population: int) -> Interval:
+    """
+    Razón entre dos totales (p. ej. palabras por oración)
+
+    Varianza por linealización: la de los residuos y - R·x dividida por
+    la media de x al cuadrado.
+    """
+    y = np.asarray(numerators, dtype=float)
+    x = np.asarray(denominators, dtype=float)
+    if not x.sum():
+        return 0.0, None, None
+    ratio = float(y.sum() / x.sum())
+    if len(y) >= population:
+        return ratio, ratio, ratio
+    if len(y) < 2:
+        return ratio, None, None
+    residuals = y - ratio * x
+    margin = CONFIDENCE_Z * float(
+        np.sqrt(residuals.var(ddof=1) * _correction(len(y), population)) / x.mean()
+    )
+    return ratio, max(0.0, ratio - margin), ratio + margin
+
+
+def estimate_document(pages: Sequence[Dict[str, int]], population: int) -> Dict[str, Interval]:
+    """Totales y razones estimados del documento completo a partir de sus páginas muestreadas"""
+    column = {name: [page[name] for page in pages] for name in PAGE_COUNTS}
+    return {
+        "word_count": estimate_total(column["words"], population),
+        "sentence_count": estimate_total(column["sentences"], population),
+        "paragraph_count": estimate_total(column["paragraphs"], population),
+        "text_length": estimate_total(column["characters"], population),
+        "avg_words_per_sentence": estimate_ratio(
+            column["words"], column["sentences"], population
+        ),
+        "complex_word_ratio": estimate_ratio(
+            column["complex_words"], column["words"], population
+        ),
+    }
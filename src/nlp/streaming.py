@@ -0,0 +1,280 @@
+"""
+Análisis de texto en una sola pasada
+Acumulador que consume el manuscrito por fragmentos y calcula todas las
+métricas de ManuscriptAnalysis sin copiar el texto completo en memoria
+"""
+
+import hashlib
+import re
+from collections import Counter
+from typing import Dict, Iterable, Iterator, Optional
+
+WORD_PATTERN = re.compile(r'\b\w+\b')
+SENTENCE_BREAK = re.compile(r'[.!?]+')
+PARAGRAPH_BREAK = '\n\n'
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+COMPLEX_WORD_LENGTH = 12
+SIGNIFICANT_WORD_LENGTH = 4
+
+
+def iter_text_chunks(text: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """Divide un texto en fragmentos de tamaño fijo"""
+    for start in range(0, len(text), chunk_size):
+        yield text[start:start + chunk_size]
+
+
+def coalesce_chunks(chunks: Iterable[str], min_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """Agrupa fragmentos pequeños (párrafos) en fragmentos de al menos `min_size`"""
+    pending: list = []
+    size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= min_size:
+            yield "".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield "".join(pending)
+
+
+def sentence_state(text: str) -> Dict[str, int]:
+    """
+    Cortes de oración de un tramo de texto y si hay texto antes del primero
+    y después del último, para enlazar sus oraciones con las de los tramos
+    vecinos: una oración sin punto final continúa en el siguiente
+    """
+    parts = [bool(part.strip()) for part in SENTENCE_BREAK.split(text)]
+    return {
+        "breaks": len(parts) - 1,
+        "opens": parts[0],
+        "closes": parts[-1],
+        # Cortes interiores precedidos de texto (entre el primero y el último)
+        "inner": sum(parts[1:-1]),
+    }
+
+
+def _safe_cut(buffer: str) -> int:
+    """
+    Posición hasta la que el búfer puede procesarse sin ambigüedad
+
+    Lo que queda después puede continuar en el siguiente fragmento:
+    una palabra a medias o una serie de saltos de línea incompleta.
+    """
+    if not buffer:
+        return 0
+    if buffer[-1] == '\n':
+        return len(buffer.rstrip('\n'))
+    if buffer[-1].isspace():
+        return len(buffer)
+    tail = buffer.rsplit(None, 1)
+    if len(tail) == 1 and not buffer[0].isspace():
+        return 0
+    return len(buffer) - len(tail[-1])
+
+
+class StreamingTextAnalyzer:
+    """
+    Tokenizador y acumulador de métricas en una sola pasada
+
+    Produce exactamente los mismos conteos que el análisis tradicional
+    sobre el texto completo. No se conserva el texto: la memoria depende
+    del vocabulario. Las frases repetidas y los perfiles de estilo son
+    opcionales (`full_analyzer`): necesitan un entero y una posición por
+    palabra, así que su memoria y su coste crecen con el texto.
+    """
+
+    def __init__(self, excerpt_length: int = 0, fingerprint=None, phrases=None, style=None):
+        self.word_count = 0
+        self.sentence_count = 0
+        self.paragraph_count = 0
+        self.word_freq: Counter = Counter()
+
+        self._raw_length = 0
+        self._leading_space: Optional[int] = None
+        self._trailing_space = 0
+        self._digest = hashlib.sha256()
+        self._pending_space = ""
+
+        # Inicio del texto, conservado solo hasta cubrir el extracto pedido
+        self._excerpt_length = excerpt_length
+        self._head: list = []
+        self._head_done = excerpt_length <= 0
+
+        # Receptor opcional de las palabras (p. ej. huella MinHash para plagio)
+        self.fingerprint = fingerprint
+        # Detector de frases repetidas, alimentado con cada palabra y su posición
+        self.phrases = phrases
+        # Cortes de oración, párrafo y capítulo para los perfiles estilométricos;
+        # el perfil toma las palabras del detector de frases
+        if style is not None and phrases is None:
+            raise ValueError("Los perfiles de estilo necesitan el detector de frases")
+        self.style = style
+        # Sin detector de frases, las palabras repetidas seguidas se buscan aquí
+        self._stutters: Dict[str, None] = {}
+        self._tail: list = []
+
+        self._pending = ""
+        self._consumed = 0
+        self._in_sentence = False
+        self._in_paragraph = False
+
+    def feed(self, chunk: str) -> None:
+        """Procesa un nuevo fragmento de texto"""
+        self._track_length(chunk)
+        if not self._head_done:
+            self._track_head(chunk)
+        buffer = self._pending + chunk
+        cut = _safe_cut(buffer)
+        self._pending = buffer[cut:]
+        if cut:
+            self._consume(buffer[:cut])
+
+    def feed_all(self, chunks: Iterable[str]) -> "StreamingTextAnalyzer":
+        """Procesa todos los fragmentos de un iterable"""
+        for chunk in chunks:
+            self.feed(chunk)
+        return self
+
+    def finish(self) -> "StreamingTextAnalyzer":
+        """Procesa el texto pendiente y cierra oraciones y párrafos abiertos"""
+        if self._pending:
+            self._consume(self._pending)
+            self._pending = ""
+        if self._in_sentence:
+            self.sentence_count += 1
+            self._in_sentence = False
+        if self._in_paragraph:
+            self.paragraph_count += 1
+            self._in_paragraph = False
+        return self
+
+    def _track_length(self, chunk: str) -> None:
+        # Longitud y huella equivalentes a text.strip() sin conservar el texto
+        stripped = chunk.rstrip()
+        if stripped:
+            if self._leading_space is None:
+                self._leading_space = self._raw_length + len(chunk) - len(chunk.lstrip())
+                stripped = stripped.lstrip()
+            self._trailing_space = len(chunk) - len(chunk.rstrip())
+            self._update_digest(self._pending_space + stripped)
+            self._pending_space = chunk[len(chunk.rstrip()):]
+        else:
+            self._trailing_space += len(chunk)
+            if self._leading_space is not None:
+                self._pending_space += chunk
+        self._raw_length += len(chunk)
+
+    def _update_digest(self, text: str) -> None:
+        self._digest.update(text.encode("utf-8", "surrogatepass"))
+
+    def _track_head(self, chunk: str) -> None:
+        self._head.append(chunk)
+        head = "".join(self._head).strip()
+        if len(head) > self._excerpt_length:
+            self._head = [head]
+            self._head_done = True
+
+    def _consume(self, text: str) -> None:
+        lowered = text.lower()
+
+        if self.phrases is not None:
+            matches = list(WORD_PATTERN.finditer(lowered))
+            words = [m.group() for m in matches]
+            self.phrases.update(words, [m.start() for m in matches], self._consumed)
+        else:
+            words = WORD_PATTERN.findall(lowered)
+            self._track_stutters(words)
+        if self.style is not None:
+            self.style.update(text, self._consumed)
+        self._consumed += len(text)
+        self.word_count += len(words)
+        self.word_freq.update(words)
+        if self.fingerprint is not None:
+            self.fingerprint.update(words)
+
+        for i, part in enumerate(SENTENCE_BREAK.split(text)):
+            if i > 0 and self._in_sentence:
+                self.sentence_count += 1
+                self._in_sentence = False
+            if not self._in_sentence and part.strip():
+                self._in_sentence = True
+
+        for i, part in enumerate(text.split(PARAGRAPH_BREAK)):
+            if i > 0 and self._in_paragraph:
+                self.paragraph_count += 1
+                self._in_paragraph = False
+            if not self._in_paragraph and part.strip():
+                self._in_paragraph = True
+
+    def _track_stutters(self, words: list) -> None:
+        sequence = self._tail + words
+        for first, second, third in zip(sequence, sequence[1:], sequence[2:]):
+            if first == second == third:
+                self._stutters.setdefault(first, None)
+        self._tail = sequence[-2:]
+
+    def stutters(self) -> list:
+        """Palabras escritas tres o más veces seguidas, en orden de aparición"""
+        if self.phrases is not None:
+            return self.phrases.stutters()
+        return list(self._stutters)
+
+    @property
+    def repeated_token(self) -> Optional[str]:
+        """Primera palabra escrita tres o más veces seguidas"""
+        stutters = self.stutters()
+        return stutters[0] if stutters else None
+
+    @property
+    def text_length(self) -> int:
+        """Número de caracteres del texto sin espacios iniciales ni finales"""
+        if self._leading_space is None:
+            return 0
+        return self._raw_length - self._leading_space - self._trailing_space
+
+    @property
+    def text_sha256(self) -> str:
+        """Huella SHA-256 del texto sin espacios iniciales ni finales"""
+        return self._digest.hexdigest()
+
+    @property
+    def excerpt(self) -> str:
+        """Primeros `excerpt_length` caracteres del texto sin espacios iniciales"""
+        return "".join(self._head).strip()[:self._excerpt_length]
+
+    @property
+    def complex_word_count(self) -> int:
+        return sum(
+            count for word, count in self.word_freq.items()
+            if len(word) > COMPLEX_WORD_LENGTH
+        )
+
+    @property
+    def avg_words_per_sentence(self) -> float:
+        if self.sentence_count > 0:
+            return round(self.word_count / self.sentence_count, 2)
+        return 0
+
+    @property
+    def complex_word_ratio(self) -> float:
+        if self.word_count > 0:
+            return round(self.complex_word_count / self.word_count, 3)
+        return 0
+
+    def repeated_words(self) -> Dict[str, int]:
+        """Palabras significativas que superan el umbral de repetición"""
+        threshold = max(10, self.word_count // 100)
+        return {
+            word: count for word, count in self.word_freq.items()
+            if count > threshold and len(word) > SIGNIFICANT_WORD_LENGTH
+        }
+
+
+def full_analyzer(excerpt_length: int = 0, fingerprint=None) -> StreamingTextAnalyzer:
+    """Acumulador con todas las pasadas del análisis completo (frases y estilo)"""
+    from src.nlp.phrases import RepeatedPhraseDetector
+    from src.nlp.stylometry import StyleProfiler
+    return StreamingTextAnalyzer(
+        excerpt_length, fingerprint, phrases=RepeatedPhraseDetector(), style=StyleProfiler()
+    )
@@ -0,0 +1,272 @@
+"""
+Perfiles estilométricos por capítulo y por ventanas deslizantes
+Durante la pasada del análisis solo se anotan las posiciones de los cortes
+de oración, párrafo y capítulo; las palabras ya las guarda el detector de
+frases como enteros. Al terminar, las métricas de todos los tramos se
+calculan a la vez con sumas acumuladas de NumPy
+"""
+
+import os
+import re
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.nlp.entities import CHAPTER_HEADING, chapter_key
+from src.nlp.streaming import PARAGRAPH_BREAK, SENTENCE_BREAK
+from src.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Ventanas deslizantes: palabras por ventana y avance entre ventanas
+STYLE_WINDOW_WORDS = int(os.getenv("ECDOTICA_STYLE_WINDOW_WORDS", "2000"))
+STYLE_WINDOW_STEP = int(os.getenv("ECDOTICA_STYLE_WINDOW_STEP", "1000"))
+# Un encabezado de capítulo no ocupa más que esto en su línea
+MAX_HEADING_CHARS = 200
+# Percentiles de la longitud de las oraciones en cada capítulo
+SENTENCE_PERCENTILES = (10, 50, 90)
+
+PARAGRAPH_RUN = re.compile(re.escape(PARAGRAPH_BREAK) + r"\n*")
+_VOWEL_GROUP = re.compile(r"[aeiouáéíóúü]+")
+# Vocales que forman hiato entre sí (fuertes y débiles acentuadas)
+_HIATUS = set("aeoáéóíú")
+
+# Palabras gramaticales: las demás cuentan para la densidad léxica
+FUNCTION_WORDS = frozenset("""
+a al ante bajo cabe con contra de del desde durante en entre hacia hasta mediante para
+por según sin so sobre tras versus vía
+el la lo los las un una unos unas
+y e ni o u pero mas sino aunque porque pues que si como cuando donde mientras
+yo tú él ella ello nosotros nosotras vosotros vosotras ellos ellas usted ustedes
+me te se nos os le les mí ti sí conmigo contigo consigo
+mi mis tu tus su sus nuestro nuestra nuestros nuestras vuestro vuestra vuestros vuestras
+este esta esto estos estas ese esa eso esos esas aquel aquella aquello aquellos aquellas
+quien quienes cual cuales cuyo cuya cuyos cuyas cuanto cuanta cuantos cuantas
+qué quién quiénes cuál cuáles cómo cuándo dónde cuánto
+no sí ya muy más menos tan también tampoco
+ser soy eres es somos sois son era eras éramos eran fue fuiste fuimos fueron sea sean
+estar estoy estás está estamos están estaba estaban estuvo estuvieron
+haber he has ha hemos habéis han había habías habíamos habían hubo habría haya hayan
+""".split())
+
+# Columnas de cada tramo en el formato compacto (una lista por columna)
+PROFILE_COLUMNS = (
+    "words", "sentences", "paragraphs", "sentence_length_mean", "sentence_length_var",
+    "word_length_mean", "word_length_var", "fernandez_huerta", "szigriszt_pazos",
+    "lexical_density",
+)
+PERCENTILE_COLUMNS = tuple(f"sentence_length_p{p}" for p in SENTENCE_PERCENTILES)
+
+
+def count_syllables(word: str) -> int:
+    """
+    Sílabas de una palabra española, por sus núcleos vocálicos
+
+    Dos vocales seguidas forman diptongo salvo que ambas sean fuertes o
+    una débil esté acentuada (hiato). Sin vocales (cifras), una sílaba.
+    """
+    syllables = 0
+    for group in _VOWEL_GROUP.findall(word):
+        syllables += 1 + sum(
+            1 for first, second in zip(group, group[1:])
+            if first in _HIATUS and second in _HIATUS
+        )
+    return max(1, syllables)
+
+
+class StyleProfiler:
+    """
+    Posiciones de los cortes de oración, párrafo y capítulo de un texto
+
+    Recibe el texto en fragmentos junto con su posición, como el detector
+    de frases, y solo guarda enteros. Los encabezados de capítulo se
+    buscan en líneas completas: el final de línea pendiente de un
+    fragmento se examina con el siguiente.
+    """
+
+    def __init__(self, window_words: int = STYLE_WINDOW_WORDS,
+                 window_step: int = STYLE_WINDOW_STEP):
+        self.window_words = window_words
+        self.window_step = window_step
+        self._sentence_breaks = array("q")
+        self._paragraph_breaks = array("q")
+        self._headings: List[Tuple[int, int, str, str]] = []
+        # Línea aún incompleta y su posición; None si es demasiado larga
+        self._line: Optional[str] = ""
+        self._line_offset = 0
+
+    def update(self, text: str, offset: int = 0) -> None:
+        """Anota los cortes de `text`, que empieza en la posición `offset` del texto"""
+        self._sentence_breaks.extend(offset + m.start() for m in SENTENCE_BREAK.finditer(text))
+        self._paragraph_breaks.extend(offset + m.start() for m in PARAGRAPH_RUN.finditer(text))
+
+        complete = text.rfind("\n") + 1
+        if complete:
+            if self._line is not None:
+                self._find_headings(self._line + text[:complete], self._line_offset)
+            else:
+                # El resto de una línea descartada por larga no es un encabezado
+                first = text.find("\n") + 1
+                self._find_headings(text[first:complete], offset + first)
+            self._line, self._line_offset = "", offset + complete
+        if self._line is not None:
+            self._line += text[complete:]
+            if len(self._line) > MAX_HEADING_CHARS:
+                self._line = None
+
+    def _find_headings(self, text: str, offset: int) -> None:
+        for heading in CHAPTER_HEADING.finditer(text):
+            self._headings.append((
+                offset + heading.start(), offset + heading.end(),
+                chapter_key(heading), heading.group().strip()
+            ))
+
+    def profile(self, phrases) -> Dict[str, Any]:
+        """
+        Perfiles del libro, de cada capítulo y de ventanas deslizantes
+
+        `phrases` es el detector de frases alimentado con las mismas
+        palabras. Las palabras de los encabezados no cuentan, y un corte de
+        párrafo o capítulo cierra también la oración en curso.
+        """
+        if self._line:
+            self._find_headings(self._line, self._line_offset)
+            self._line = ""
+        ids, starts, vocabulary = phrases.tokens()
+        if not len(ids):
+            return {}
+
+        # Longitud, sílabas y tipo de cada palabra del vocabulario, y de ahí de cada palabra
+        lengths = np.fromiter((len(w) for w in vocabulary), dtype=np.int64, count=len(vocabulary))
+        syllables = np.fromiter(
+            (count_syllables(w) for w in vocabulary), dtype=np.int64, count=len(vocabulary)
+        )
+        content = np.fromiter(
+            (w not in FUNCTION_WORDS and not w.isdigit() for w in vocabulary),
+            dtype=bool, count=len(vocabulary)
+        )
+
+        heading_starts = np.array([h[0] for h in self._headings], dtype=np.int64)
+        heading_ends = np.array([h[1] for h in self._headings], dtype=np.int64)
+        keep = np.ones(len(ids), dtype=bool)
+        if len(heading_starts):
+            inside = np.searchsorted(heading_starts, starts, side="right") - 1
+            keep = (inside < 0) | (starts >= heading_ends[np.maximum(inside, 0)])
+        ids, starts = ids[keep], starts[keep]
+        if not len(ids):
+            return {}
+
+        paragraph_breaks = np.frombuffer(self._paragraph_breaks, dtype=np.int64)
+        boundaries = np.unique(np.concatenate([
+            np.frombuffer(self._sentence_breaks, dtype=np.int64), paragraph_breaks,
+            heading_starts, heading_ends
+        ]))
+        sentence_of_word = np.searchsorted(boundaries, starts, side="right")
+        first_words = np.flatnonzero(
+            np.concatenate([[True], sentence_of_word[1:] != sentence_of_word[:-1]])
+        )
+        first_starts = starts[first_words]
+        paragraph_ids = np.searchsorted(paragraph_breaks, first_starts, side="right")
+        new_paragraph = np.concatenate([[True], paragraph_ids[1:] != paragraph_ids[:-1]])
+        chapter_of_sentence = np.searchsorted(heading_starts, first_starts, side="right")
+
+        word_lengths = lengths[ids]
+        sentence_words = np.diff(np.append(first_words, len(ids)))
+        per_sentence = {
+            "words": sentence_words,
+            "sentence_squares": sentence_words ** 2,
+            "letters": np.add.reduceat(word_lengths, first_words),
+            "letter_squares": np.add.reduceat(word_lengths ** 2, first_words),
+            "syllables": np.add.reduceat(syllables[ids], first_words),
+            "content": np.add.reduceat(content[ids].astype(np.int64), first_words),
+            "paragraphs": new_paragraph.astype(np.int64),
+        }
+        totals = {
+            name: np.concatenate([[0], np.cumsum(values)])
+            for name, values in per_sentence.items()
+        }
+
+        # Capítulos: tramos de oraciones con el mismo encabezado anterior
+        chapter_index = np.arange(len(self._headings) + 1)
+        bounds = np.searchsorted(chapter_of_sentence, np.append(chapter_index, len(chapter_index)))
+        present = np.flatnonzero(bounds[1:] > bounds[:-1])
+        keys = ["0"] if self._headings else ["1"]
+        for heading in self._headings:
+            # Como en split_chapters, un número repetido pasa a ser la posición
+            keys.append(heading[2] if heading[2] not in keys else str(len(keys)))
+        titles = [""] + [heading[3] for heading in self._headings]
+        chapter_starts, chapter_ends = bounds[present], bounds[present + 1]
+        chapters = {
+            "chapter": [keys[i] for i in present],
+            "title": [titles[i] for i in present],
+            **_segment_columns(totals, chapter_starts, chapter_ends),
+            **_percentile_columns(sentence_words, chapter_starts, chapter_ends),
+        }
+
+        # Ventanas de `window_words` palabras alineadas con el inicio de las oraciones
+        sentence_first_word = totals["words"][:-1]
+        last = max(int(totals["words"][-1]) - self.window_words, 0)
+        positions = np.arange(0, last + 1, max(self.window_step, 1))
+        window_starts = np.searchsorted(sentence_first_word, positions)
+        window_ends = np.maximum(
+            np.searchsorted(sentence_first_word, positions + self.window_words),
+            window_starts + 1
+        )
+        windows = {
+            "size": self.window_words,
+            "step": self.window_step,
+            "start_word": sentence_first_word[window_starts].tolist(),
+            "chapter": [keys[i] for i in chapter_of_sentence[window_starts]],
+            **_segment_columns(totals, window_starts, window_ends),
+        }
+
+        whole = (np.array([0]), np.array([len(sentence_words)]))
+        book = {
+            **_segment_columns(totals, *whole),
+            **_percentile_columns(sentence_words, *whole),
+        }
+        return {
+            "book": {name: values[0] for name, values in book.items()},
+            "chapters": chapters,
+            "windows": windows,
+        }
+
+
+def _segment_columns(totals: Dict[str, "np.ndarray"], first: "np.ndarray",
+                     end: "np.ndarray") -> Dict[str, List[float]]:
+    """Métricas de los tramos de oraciones [first, end) a partir de las sumas acumuladas"""
+    def between(name: str) -> "np.ndarray":
+        return (totals[name][end] - totals[name][first]).astype(float)
+
+    words, sentences = between("words"), (end - first).astype(float)
+    syllables_per_word = between("syllables") / words
+    sentence_mean = words / sentences
+    word_mean = between("letters") / words
+    columns = {
+        "words": words,
+        "sentences": sentences,
+        "paragraphs": between("paragraphs"),
+        "sentence_length_mean": sentence_mean,
+        "sentence_length_var": between("sentence_squares") / sentences - sentence_mean ** 2,
+        "word_length_mean": word_mean,
+        "word_length_var": between("letter_squares") / words - word_mean ** 2,
+        # Lecturabilidad de Fernández-Huerta y perspicuidad de Szigriszt-Pazos
+        "fernandez_huerta": 206.84 - 60 * syllables_per_word - 1.02 * sentence_mean,
+        "szigriszt_pazos": 206.835 - 62.3 * syllables_per_word - sentence_mean,
+        "lexical_density": between("content") / words,
+    }
+    return {
+        name: values.astype(int).tolist() if name in ("words", "sentences", "paragraphs")
+        else np.round(values, 3).tolist()
+        for name, values in ((name, columns[name]) for name in PROFILE_COLUMNS)
+    }
+
+
+def _percentile_columns(sentence_words: "np.ndarray", first: "np.ndarray",
+                        end: "np.ndarray") -> Dict[str, List[float]]:
+    values = np.array([
+        np.percentile(sentence_words[start:stop], SENTENCE_PERCENTILES)
+        for start, stop in zip(first, end)
+    ]).reshape(len(first), len(SENTENCE_PERCENTILES))
+    return {
+        name: np.round(values[:, i], 1).tolist() for i, name in enumerate(PERCENTILE_COLUMNS)
+    }
@@ -0,0 +1,475 @@
+"""
+Revisión editorial con modelos de lenguaje
+El manuscrito se divide en fragmentos con un presupuesto de tokens, cada
+fragmento se revisa de forma concurrente y las respuestas se guardan en
+caché por contenido
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.utils.cache import AnalysisCache
+from src.utils.lazy import lazy_import
+from src.utils.paths import data_path
+
+httpx = lazy_import("httpx")
+tiktoken = lazy_import("tiktoken")
+
+REVIEW_PROVIDER = os.getenv("ECDOTICA_REVIEW_PROVIDER", "local")
+REVIEW_MODEL = os.getenv("ECDOTICA_REVIEW_MODEL", "gpt-4o-mini")
+REVIEW_BASE_URL = os.getenv("ECDOTICA_REVIEW_BASE_URL")
+REVIEW_CHUNK_TOKENS = int(os.getenv("ECDOTICA_REVIEW_CHUNK_TOKENS", "1500"))
+REVIEW_CONCURRENCY = int(os.getenv("ECDOTICA_REVIEW_CONCURRENCY", "4"))
+REVIEW_REQUESTS_PER_MINUTE = float(os.getenv("ECDOTICA_REVIEW_REQUESTS_PER_MINUTE", "60"))
+REVIEW_RETRIES = 3
+REVIEW_TIMEOUT = 60.0
+# Cambiar al modificar las instrucciones invalida las respuestas en caché
+PROMPT_VERSION = "1"
+# Aproximación cuando tiktoken no está instalado
+CHARS_PER_TOKEN = 4
+# Uno de cada N párrafos (según su contenido) puede cerrar un fragmento
+# antes de agotar el presupuesto; así los cortes se resincronizan tras una
+# edición y el resto de fragmentos sigue en caché
+CHUNK_BOUNDARY_MODULUS = 8
+
+PARAGRAPH_SEPARATOR = re.compile(r'\n[ \t]*\n\s*')
+SENTENCE_END = re.compile(r'[.!?…]+["»”)]*\s+')
+
+SYSTEM_PROMPT = (
+    "Eres corrector de estilo de una editorial en español. Revisa el fragmento y "
+    "responde solo con JSON: {\"suggestions\": [{\"type\": \"ortografia|gramatica|"
+    "puntuacion|estilo|coherencia\", \"original\": \"texto exacto del fragmento\", "
+    "\"message\": \"explicación breve\", \"suggestion\": \"texto corregido\"}]}. "
+    "Copia 'original' literalmente para poder localizarlo. Si no hay nada que "
+    "corregir devuelve una lista vacía."
+)
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens del texto según tiktoken, o una estimación si no está instalado"""
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+class TextChunk:
+    """Fragmento del manuscrito: texto exacto y posición de inicio"""
+
+    def __init__(self, start: int, text: str, tokens: int):
+        self.start = start
+        self.text = text
+        self.tokens = tokens
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.text)
+
+
+def _spans(text: str, separator: re.Pattern, start: int = 0, end: Optional[int] = None):
+    """Tramos no vacíos de text[start:end] delimitados por un separador"""
+    end = len(text) if end is None else end
+    position = start
+    for match in separator.finditer(text, start, end):
+        if match.start() > position:
+            yield position, match.start()
+        position = match.end()
+    if end > position and text[position:end].strip():
+        yield position, end
+
+
+def _units(text: str, max_tokens: int):
+    """Párrafos, o partes de párrafo si no caben en un fragmento"""
+    for start, end in _spans(text, PARAGRAPH_SEPARATOR):
+        tokens = count_tokens(text[start:end])
+        if tokens <= max_tokens:
+            yield start, end, tokens
+            continue
+        for s_start, s_end in _spans(text, SENTENCE_END, start, end):
+            tokens = count_tokens(text[s_start:s_end])
+            if tokens <= max_tokens:
+                yield s_start, s_end, tokens
+                continue
+            # Oración desmesurada: cortes de tamaño fijo
+            step = max_tokens * CHARS_PER_TOKEN
+            for piece in range(s_start, s_end, step):
+                piece_end = min(piece + step, s_end)
+                yield piece, piece_end, count_tokens(text[piece:piece_end])
+
+
+def split_into_chunks(text: str, max_tokens: int = REVIEW_CHUNK_TOKENS) -> List[TextChunk]:
+    """
+    Divide el texto en fragmentos de hasta `max_tokens` tokens
+
+    Cada fragmento es un trozo literal del texto original, de modo que una
+    posición dentro del fragmento se traduce sumando su inicio.
+    """
+    chunks: List[TextChunk] = []
+    current: Optional[List[int]] = None  # [inicio, fin, tokens]
+
+    def close():
+        if current is not None:
+            start, end, tokens = current
+            chunks.append(TextChunk(start, text[start:end], tokens))
+
+    for start, end, tokens in _units(text, max_tokens):
+        if current is not None and current[2] + tokens > max_tokens:
+            close()
+            current = None
+        if current is None:
+            current = [start, end, tokens]
+        else:
+            current[1], current[2] = end, current[2] + tokens
+        digest = zlib.crc32(text[start:end].encode("utf-8", "surrogatepass"))
+        boundary = digest % CHUNK_BOUNDARY_MODULUS
+        if boundary == 0 and current[2] >= max_tokens // 2:
+            close()
+            current = None
+    close()
+    return chunks
+
+
+class ReviewProviderError(Exception):
+    """Fallo del servicio de revisión tras agotar los reintentos"""
+
+
+class RateLimiter:
+    """Espacia las peticiones para no superar un máximo por minuto"""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        # Sin await entre la lectura y la reserva: no hace falta cerrojo
+        now = time.monotonic()
+        wait = self._next - now
+        self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def parse_suggestions(content: str) -> List[Dict[str, Any]]:
+    """Sugerencias de la respuesta JSON del modelo, ignorando entradas mal formadas"""
+    # El objeto JSON puede venir rodeado de texto o de un bloque de código
+    try:
+        data = json.loads(content[content.find("{"):content.rfind("}") + 1])
+    except ValueError:
+        return []
+    items = data.get("suggestions", []) if isinstance(data, dict) else []
+    suggestions = []
+    for item in items:
+        if not isinstance(item, dict) or not item.get("message"):
+            continue
+        suggestions.append({
+            "type": str(item.get("type") or "estilo"),
+            "original": str(item["original"]) if item.get("original") else None,
+            "position": item.get("position") if isinstance(item.get("position"), int) else None,
+            "message": str(item["message"]),
+            "suggestion": str(item.get("suggestion") or ""),
+        })
+    return suggestions
+
+
+class ReviewProvider:
+    """Interfaz de los servicios que revisan un fragmento"""
+
+    name = "abstract"
+    model = ""
+
+    @property
+    def cache_id(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    async def review(self, text: str, context: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Sugerencias para el fragmento, con `original` o `position` relativos a él"""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalReviewProvider(ReviewProvider):
+    """
+    Revisor local basado en reglas
+
+    No necesita red ni credenciales: sirve para desarrollo y pruebas.
+    """
+
+    name = "local"
+    model = "reglas"
+
+    REPEATED_WORD = re.compile(r'\b(\w+)\s+\1\b', re.IGNORECASE)
+    DOUBLE_SPACE = re.compile(r'(?<=\S) {2,}(?=\S)')
+    LONG_SENTENCE_WORDS = 40
+
+    async def review(self, text: str, context: Optional[str] = None) -> List[Dict[str, Any]]:
+        suggestions = []
+        for match in self.REPEATED_WORD.finditer(text):
+            suggestions.append({
+                "type": "estilo", "original": match.group(), "position": match.start(),
+                "message": f"Palabra repetida: '{match.group(1)}'",
+                "suggestion": match.group(1),
+            })
+        for match in self.DOUBLE_SPACE.finditer(text):
+            suggestions.append({
+                "type": "puntuacion", "original": match.group(), "position": match.start(),
+                "message": "Espacios duplicados", "suggestion": " ",
+            })
+        for start, end in _spans(text, SENTENCE_END):
+            words = len(text[start:end].split())
+            if words > self.LONG_SENTENCE_WORDS:
+                suggestions.append({
+                    "type": "estilo", "original": None, "position": start,
+                    "message": f"Oración muy larga ({words} palabras)",
+                    "suggestion": "Dividir la oración en varias más breves",
+                })
+        return suggestions
+
+
+class HTTPReviewProvider(ReviewProvider):
+    """Base de los proveedores remotos: cliente compartido y reintentos"""
+
+    default_base_url = ""
+    api_key_variable = ""
+
+    def __init__(self, model: str = REVIEW_MODEL, api_key: Optional[str] = None,
+                 base_url: Optional[str] = None,
+                 transport: Optional["httpx.AsyncBaseTransport"] = None,
+                 retries: int = REVIEW_RETRIES):
+        self.model = model
+        self.api_key = api_key or os.getenv(self.api_key_variable, "")
+        self.base_url = (base_url or REVIEW_BASE_URL or self.default_base_url).rstrip("/")
+        self.retries = retries
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url, timeout=REVIEW_TIMEOUT, transport=self._transport
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _post(self, path: str, payload: Dict[str, Any], headers: Dict[str, str]) -> Any:
+        delay = 1.0
+        for attempt in range(self.retries):
+            try:
+                response = await self.client.post(path, json=payload, headers=headers)
+            except httpx.HTTPError as e:
+                error = str(e)
+            else:
+                if response.status_code < 400:
+                    return response.json()
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+                if response.status_code != 429 and response.status_code < 500:
+                    break
+                retry_after = response.headers.get("retry-after")
+                if retry_after and retry_after.replace(".", "", 1).isdigit():
+                    delay = max(delay, float(retry_after))
+            if attempt < self.retries - 1:
+                await asyncio.sleep(delay)
+                delay *= 2
+        raise ReviewProviderError(f"{self.name}: {error}")
+
+    @staticmethod
+    def _user_prompt(text: str, context: Optional[str]) -> str:
+        prefix = f"Contexto de la obra: {context}\n\n" if context else ""
+        return f"{prefix}Fragmento:\n{text}"
+
+
+class OpenAIProvider(HTTPReviewProvider):
+    """API de chat compatible con OpenAI"""
+
+    name = "openai"
+    default_base_url = "https://api.openai.com/v1"
+    api_key_variable = "OPENAI_API_KEY"
+
+    async def review(self, text: str, context: Optional[str] = None) -> List[Dict[str, Any]]:
+        data = await self._post("/chat/completions", {
+            "model": self.model,
+            "temperature": 0,
+            "response_format": {"type": "json_object"},
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": self._user_prompt(text, context)},
+            ],
+        }, {"Authorization": f"Bearer {self.api_key}"})
+        return parse_suggestions(data["choices"][0]["message"]["content"] or "")
+
+
+class AnthropicProvider(HTTPReviewProvider):
+    """API de mensajes de Anthropic"""
+
+    name = "anthropic"
+    default_base_url = "https://api.anthropic.com/v1"
+    api_key_variable = "ANTHROPIC_API_KEY"
+
+    async def review(self, text: str, context: Optional[str] = None) -> List[Dict[str, Any]]:
+        data = await self._post("/messages", {
+            "model": self.model,
+            "max_tokens": 2048,
+            "temperature": 0,
+            "system": SYSTEM_PROMPT,
+            "messages": [{"role": "user", "content": self._user_prompt(text, context)}],
+        }, {"x-api-key": self.api_key, "anthropic-version": "2023-06-01"})
+        return parse_suggestions("".join(
+            block.get("text", "") for block in data.get("content", [])
+            if block.get("type") == "text"
+        ))
+
+
+# Proveedores disponibles, seleccionables con ECDOTICA_REVIEW_PROVIDER
+REVIEW_PROVIDERS: Dict[str, Callable[[], ReviewProvider]] = {
+    "local": LocalReviewProvider,
+    "openai": OpenAIProvider,
+    "anthropic": AnthropicProvider,
+}
+
+
+def create_provider(name: str = REVIEW_PROVIDER) -> ReviewProvider:
+    try:
+        return REVIEW_PROVIDERS[name]()
+    except KeyError:
+        raise ValueError(f"Proveedor de revisión desconocido: {name}")
+
+
+def locate_suggestion(chunk: TextChunk, suggestion: Dict[str, Any]) -> Tuple[int, Optional[str]]:
+    """Posición en el texto original de una sugerencia relativa a un fragmento"""
+    original = suggestion.get("original")
+    position = suggestion.get("position")
+    if original:
+        if isinstance(position, int) and chunk.text.startswith(original, max(position, 0)):
+            return chunk.start + position, original
+        found = chunk.text.find(original)
+        if found >= 0:
+            return chunk.start + found, original
+    if isinstance(position, int) and 0 <= position < len(chunk.text):
+        return chunk.start + position, None
+    # El modelo citó un texto que no aparece: se señala el inicio del fragmento
+    return chunk.start, None
+
+
+class ReviewService:
+    """Revisa manuscritos completos fragmento a fragmento"""
+
+    def __init__(self, provider: Optional[ReviewProvider] = None,
+                 cache: Optional[AnalysisCache] = None, max_tokens: int = REVIEW_CHUNK_TOKENS,
+                 concurrency: int = REVIEW_CONCURRENCY,
+                 requests_per_minute: float = REVIEW_REQUESTS_PER_MINUTE):
+        self._provider = provider
+        self._cache = cache
+        self.max_tokens = max_tokens
+        self.concurrency = concurrency
+        self.requests_per_minute = requests_per_minute
+        self._limiter: Optional[RateLimiter] = None
+
+    @property
+    def provider(self) -> ReviewProvider:
+        if self._provider is None:
+            self._provider = create_provider()
+        return self._provider
+
+    @property
+    def cache(self) -> AnalysisCache:
+        if self._cache is None:
+            self._cache = AnalysisCache(
+                version=f"review-{PROMPT_VERSION}-{self.provider.cache_id}",
+                path=data_path("cache", "review.sqlite3")
+            )
+        return self._cache
+
+    @property
+    def limiter(self) -> RateLimiter:
+        if self._limiter is None:
+            self._limiter = RateLimiter(self.requests_per_minute)
+        return self._limiter
+
+    async def close(self) -> None:
+        if self._provider is not None:
+            await self._provider.close()
+
+    def _cache_key(self, chunk: TextChunk, context: Optional[str]) -> str:
+        digest = hashlib.sha256()
+        digest.update((context or "").encode("utf-8", "surrogatepass"))
+        digest.update(b"\0")
+        digest.update(chunk.text.encode("utf-8", "surrogatepass"))
+        return "chunk:" + digest.hexdigest()
+
+    async def review(self, text: str, context: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Sugerencias para todo el texto, ordenadas por posición
+
+        Solo se consultan al proveedor los fragmentos que no están en caché.
+        Si algún fragmento falla se devuelven los demás; si fallan todos se
+        propaga el error.
+        """
+        chunks = split_into_chunks(text, self.max_tokens)
+        slots = asyncio.Semaphore(self.concurrency)
+        cached = 0
+        errors: List[str] = []
+
+        async def review_chunk(chunk: TextChunk) -> List[Dict[str, Any]]:
+            nonlocal cached
+            key = self._cache_key(chunk, context)
+            suggestions = self.cache.get(key)
+            if suggestions is not None:
+                cached += 1
+                return suggestions
+            async with slots:
+                await self.limiter.acquire()
+                try:
+                    suggestions = await self.provider.review(chunk.text, context)
+                except ReviewProviderError as e:
+                    errors.append(str(e))
+                    return []
+            self.cache.put(key, suggestions)
+            return suggestions
+
+        results = await asyncio.gather(*(review_chunk(chunk) for chunk in chunks))
+        if errors and len(errors) == len(chunks):
+            raise ReviewProviderError(errors[0])
+
+        suggestions = []
+        for chunk, chunk_suggestions in zip(chunks, results):
+            for suggestion in chunk_suggestions:
+                position, original = locate_suggestion(chunk, suggestion)
+                suggestions.append({
+                    "type": suggestion["type"],
+                    "position": position,
+                    "original": original,
+                    "message": suggestion["message"],
+                    "suggestion": suggestion["suggestion"],
+                })
+        suggestions.sort(key=lambda suggestion: suggestion["position"])
+        return {
+            "suggestions": suggestions,
+            "chunks": len(chunks),
+            "cached_chunks": cached,
+            "failed_chunks": len(errors),
+            "provider": self.provider.cache_id,
+        }
+
+
+review_service = ReviewService()
@@ -0,0 +1,166 @@
+"""
+Caché de análisis direccionada por contenido
+Dos niveles: LRU en memoria del proceso y SQLite en disco, con claves
+SHA-256 y versión ligada al analizador
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from src.utils.paths import data_path
+
+CACHE_MEMORY_BYTES = int(os.getenv("ECDOTICA_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+CACHE_DISK_BYTES = int(os.getenv("ECDOTICA_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+
+
+def sha256_text(text: str) -> str:
+    """Huella SHA-256 de un texto normalizado (sin espacios iniciales ni finales)"""
+    return hashlib.sha256(text.strip().encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Caché de resultados de análisis en dos niveles
+
+    Los valores se guardan como JSON. Al cambiar `version` las entradas
+    antiguas dejan de ser válidas y se eliminan del disco.
+    """
+
+    def __init__(self, version: str, path: Optional[str] = None,
+                 memory_bytes: int = CACHE_MEMORY_BYTES, disk_bytes: int = CACHE_DISK_BYTES):
+        self.version = version
+        self.path = path
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_size = 0
+        self._disk_size = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # La base de datos se abre en el primer uso
+        if self._db is None:
+            self.path = self.path or data_path("cache", "analysis.sqlite3")
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                " key TEXT PRIMARY KEY, version TEXT NOT NULL, value TEXT NOT NULL,"
+                " size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analysis_cache_accessed"
+                " ON analysis_cache (accessed_at)"
+            )
+            self._db.execute("DELETE FROM analysis_cache WHERE version != ?", (self.version,))
+            self._db.commit()
+            self._disk_size = self._stored_size()
+        return self._db
+
+    def get(self, key: str) -> Optional[Any]:
+        """Devuelve el valor guardado o None"""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(value)
+
+            row = self.db.execute(
+                "SELECT value FROM analysis_cache WHERE key = ? AND version = ?",
+                (key, self.version)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.db.execute(
+                "UPDATE analysis_cache SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self.db.commit()
+            self.disk_hits += 1
+            self._remember(key, row[0])
+            return json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        """Guarda un valor serializable en JSON en ambos niveles"""
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, encoded)
+            previous = self.db.execute(
+                "SELECT size FROM analysis_cache WHERE key = ?", (key,)
+            ).fetchone()
+            self._disk_size += len(encoded) - (previous[0] if previous else 0)
+            self.db.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, version, value, size, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, self.version, encoded, len(encoded), time.time())
+            )
+            self._evict_disk()
+            self.db.commit()
+
+    def _remember(self, key: str, encoded: str) -> None:
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous)
+        self._memory[key] = encoded
+        self._memory_size += len(encoded)
+        while self._memory_size > self.memory_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _stored_size(self) -> int:
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM analysis_cache").fetchone()[0]
+
+    def _evict_disk(self) -> None:
+        if self._disk_size <= self.disk_bytes:
+            return
+        # Otros procesos pueden compartir la base: se recalcula el total real
+        total = self._stored_size()
+        if total <= self.disk_bytes:
+            self._disk_size = total
+            return
+        # Se eliminan las entradas usadas hace más tiempo hasta volver al límite
+        excess = total - self.disk_bytes
+        freed = 0
+        stale = []
+        for key, size in self.db.execute(
+            "SELECT key, size FROM analysis_cache ORDER BY accessed_at"
+        ):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self.db.executemany("DELETE FROM analysis_cache WHERE key = ?", stale)
+        self._disk_size = total - freed
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "version": self.version,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_bytes": self._disk_size,
+        }
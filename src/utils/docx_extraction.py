@@ -0,0 +1,129 @@
+"""
+Extracción de texto DOCX en streaming
+Lee word/document.xml y las partes relacionadas (encabezados, notas al
+pie y finales, pies de página) directamente del ZIP con un analizador XML
+incremental, sin construir el modelo de objetos de python-docx
+"""
+
+import posixpath
+import re
+import zipfile
+from typing import Iterator, List, Tuple
+from xml.etree.ElementTree import iterparse
+
+from src.utils.uploads import DocumentSource, open_document
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+RELATIONSHIPS = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+OFFICE_DOCUMENT = (
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+)
+DEFAULT_MAIN_PART = "word/document.xml"
+
+# Elementos de un párrafo que aportan texto, y el texto que aportan
+_PARAGRAPH = W + "p"
+_TEXT = W + "t"
+_INLINE = {
+    W + "tab": "\t",
+    W + "br": "\n",
+    W + "cr": "\n",
+    W + "noBreakHyphen": "-",
+}
+_PART_NUMBER = re.compile(r"(\d+)\.xml$")
+
+
+def _main_part(archive: zipfile.ZipFile) -> str:
+    """Nombre de la parte principal según _rels/.rels"""
+    try:
+        with archive.open("_rels/.rels") as rels:
+            for _, element in iterparse(rels):
+                if element.tag == RELATIONSHIPS and element.get("Type") == OFFICE_DOCUMENT:
+                    return element.get("Target", DEFAULT_MAIN_PART).lstrip("/")
+    except KeyError:
+        pass
+    return DEFAULT_MAIN_PART
+
+
+def _parts(archive: zipfile.ZipFile) -> List[Tuple[str, str]]:
+    """Partes con texto en orden de lectura: encabezados, cuerpo, notas, pies"""
+    main = _main_part(archive)
+    folder = posixpath.dirname(main)
+    names = set(archive.namelist())
+
+    def numbered(prefix: str) -> List[str]:
+        found = [
+            name for name in names
+            if posixpath.dirname(name) == folder
+            and posixpath.basename(name).startswith(prefix) and name.endswith(".xml")
+        ]
+        return sorted(found, key=lambda name: (
+            int(_PART_NUMBER.search(name).group(1)) if _PART_NUMBER.search(name) else 0, name
+        ))
+
+    parts = [("header", name) for name in numbered("header")]
+    parts.append(("body", main))
+    for kind in ("footnotes", "endnotes"):
+        name = posixpath.join(folder, kind + ".xml")
+        if name in names:
+            parts.append((kind, name))
+    parts.extend(("footer", name) for name in numbered("footer"))
+    return parts
+
+
+def _iter_part_paragraphs(stream) -> Iterator[str]:
+    """
+    Texto de cada párrafo de una parte XML, en orden
+
+    Los elementos ya leídos se descartan en cuanto se cierran, así que la
+    memoria no depende del tamaño del documento. Los párrafos anidados
+    (cuadros de texto) se incluyen en el párrafo que los contiene, y la
+    versión alternativa de mc:Fallback se ignora para no duplicarlos.
+    """
+    stack = []
+    pieces: List[str] = []
+    paragraph_depth = 0
+    fallback_depth = 0
+    for event, element in iterparse(stream, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            stack.append(element)
+            if tag == _PARAGRAPH:
+                paragraph_depth += 1
+            elif tag == MC_FALLBACK:
+                fallback_depth += 1
+            continue
+
+        stack.pop()
+        if fallback_depth == 0 and paragraph_depth:
+            if tag == _TEXT:
+                if element.text:
+                    pieces.append(element.text)
+            elif tag in _INLINE:
+                pieces.append(_INLINE[tag])
+        if tag == _PARAGRAPH:
+            paragraph_depth -= 1
+            if paragraph_depth == 0:
+                yield "".join(pieces)
+                pieces = []
+        elif tag == MC_FALLBACK:
+            fallback_depth -= 1
+        # Los hijos del elemento raíz y de sus hijos (cuerpo, nota) ya no hacen falta
+        if len(stack) <= 2 and stack:
+            stack[-1].remove(element)
+
+
+def iter_docx_paragraphs(source: DocumentSource) -> Iterator[str]:
+    """
+    Genera el texto de cada párrafo no vacío del documento
+
+    `source` puede ser el contenido del archivo o su ruta en disco. Incluye
+    las tablas (celda a celda), los encabezados y pies de página y las
+    notas al pie y finales.
+    """
+    with open_document(source) as stream, zipfile.ZipFile(stream) as archive:
+        for _, name in _parts(archive):
+            with archive.open(name) as part:
+                for paragraph in _iter_part_paragraphs(part):
+                    if paragraph.strip():
+                        yield paragraph
@@ -0,0 +1,308 @@
+"""
+Cola local y duradera de trabajos de análisis
+Los trabajos se guardan en SQLite, se ejecutan en segundo plano y
+sobreviven a un reinicio del servidor
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from src.utils.paths import data_path
+
+JOB_CONCURRENCY = int(os.getenv("ECDOTICA_JOB_CONCURRENCY", "0")) or (os.cpu_count() or 1)
+# Intervalo de sondeo para recoger trabajos encolados por otros procesos
+JOB_POLL_SECONDS = float(os.getenv("ECDOTICA_JOB_POLL_SECONDS", "2"))
+# Frecuencia máxima con la que un trabajador escribe su progreso
+JOB_PROGRESS_INTERVAL = float(os.getenv("ECDOTICA_JOB_PROGRESS_INTERVAL", "0.5"))
+# Un proceso sin latido durante este tiempo se da por muerto y sus trabajos vuelven a la cola
+JOB_LEASE_SECONDS = float(os.getenv("ECDOTICA_JOB_LEASE_SECONDS", "30"))
+
+QUEUED = "queued"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+
+_HOSTNAME = socket.gethostname()
+_instance: Optional[str] = None
+_instance_pid: Optional[int] = None
+
+
+def _owner() -> str:
+    """
+    Identificador de esta instancia del proceso
+
+    Lleva un token aleatorio: tras un reinicio el host y el pid pueden
+    repetirse (pid 1 en un contenedor) o cambiar (otro dyno), pero el
+    token no, así que los trabajos de la instancia anterior no se
+    confunden con los de esta.
+    """
+    global _instance, _instance_pid
+    if _instance is None or _instance_pid != os.getpid():
+        _instance = f"{_HOSTNAME}:{os.getpid()}:{uuid.uuid4().hex}"
+        _instance_pid = os.getpid()
+    return _instance
+
+
+class JobStore:
+    """
+    Persistencia de trabajos en SQLite
+
+    Cada instancia que ejecuta trabajos renueva su latido en la tabla
+    `instances`; un trabajo en proceso cuyo dueño no tiene un latido
+    reciente se considera huérfano y vuelve a la cola.
+    """
+
+    def __init__(self, path: Optional[str] = None, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Cada proceso abre su propia conexión
+        if self._db is None or self._db_pid != os.getpid():
+            self.path = self.path or data_path("jobs", "jobs.sqlite3")
+            self._db = sqlite3.connect(
+                self.path, check_same_thread=False, timeout=30, isolation_level=None
+            )
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL,"
+                " payload TEXT NOT NULL, progress TEXT NOT NULL DEFAULT '{}',"
+                " result TEXT, error TEXT, owner TEXT,"
+                " created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS instances ("
+                " owner TEXT PRIMARY KEY, heartbeat_at REAL NOT NULL)"
+            )
+            self._db_pid = os.getpid()
+        return self._db
+
+    def create(self, job_id: str, kind: str, payload: Dict[str, Any]) -> None:
+        now = datetime.now().isoformat()
+        with self._lock:
+            self.db.execute(
+                "INSERT INTO jobs (id, kind, status, payload, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(payload), now, now)
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row else None
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        """Marca como en proceso el trabajo encolado más antiguo y lo devuelve"""
+        with self._lock:
+            db = self.db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    db.execute(
+                        "UPDATE jobs SET status = ?, owner = ?, updated_at = ? WHERE id = ?",
+                        (PROCESSING, _owner(), datetime.now().isoformat(), row["id"])
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = self._decode(row)
+        job["status"] = PROCESSING
+        return job
+
+    def update_progress(self, job_id: str, progress: Dict[str, Any]) -> None:
+        self._set(job_id, progress=json.dumps(progress))
+
+    def complete(self, job_id: str, result: Any) -> None:
+        self._set(job_id, status=COMPLETED, result=json.dumps(result))
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._set(job_id, status=FAILED, error=error)
+
+    def requeue(self, job_id: str) -> None:
+        self._set(job_id, status=QUEUED, owner=None)
+
+    def heartbeat(self) -> None:
+        """Renueva el latido de esta instancia y olvida las que llevan tiempo sin darlo"""
+        now = time.time()
+        with self._lock:
+            self.db.execute(
+                "INSERT INTO instances (owner, heartbeat_at) VALUES (?, ?)"
+                " ON CONFLICT (owner) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                (_owner(), now)
+            )
+            self.db.execute(
+                "DELETE FROM instances WHERE heartbeat_at < ?", (now - 10 * self.lease_seconds,)
+            )
+
+    def requeue_orphans(self) -> int:
+        """Devuelve a la cola los trabajos cuyo dueño no tiene un latido reciente"""
+        with self._lock:
+            cursor = self.db.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, updated_at = ?"
+                " WHERE status = ? AND (owner IS NULL OR owner NOT IN"
+                " (SELECT owner FROM instances WHERE heartbeat_at >= ?))",
+                (QUEUED, datetime.now().isoformat(), PROCESSING,
+                 time.time() - self.lease_seconds)
+            )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def _set(self, job_id: str, **fields: Any) -> None:
+        fields["updated_at"] = datetime.now().isoformat()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self.db.execute(
+                f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id)
+            )
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["progress"] = json.loads(job["progress"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+class JobProgress:
+    """Informa del progreso de un trabajo desde un proceso trabajador"""
+
+    def __init__(self, store: JobStore, job_id: str, interval: float = JOB_PROGRESS_INTERVAL):
+        self.store = store
+        self.job_id = job_id
+        self.interval = interval
+        self._last_write = 0.0
+
+    def update(self, force: bool = False, **progress: Any) -> None:
+        now = time.monotonic()
+        if force or now - self._last_write >= self.interval:
+            self.store.update_progress(self.job_id, progress)
+            self._last_write = now
+
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class JobRunner:
+    """
+    Ejecuta en segundo plano los trabajos encolados, con concurrencia acotada
+
+    Todas las escrituras en el almacén se hacen en un hilo: con otro
+    escritor o un checkpoint del WAL en curso pueden esperar al bloqueo, y
+    no deben detener el bucle de eventos.
+    """
+
+    def __init__(self, store: JobStore, concurrency: int = JOB_CONCURRENCY):
+        self.store = store
+        self.concurrency = concurrency
+        self._handlers: Dict[str, JobHandler] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    def start(self) -> None:
+        """Arranca el bucle en el event loop actual si no está en marcha"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._task = loop.create_task(self._loop())
+        self._heartbeat_task = loop.create_task(self._heartbeat())
+
+    async def stop(self) -> None:
+        for task in (self._task, self._heartbeat_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._heartbeat_task = None
+
+    async def submit(self, job_id: str, kind: str, payload: Dict[str, Any]) -> None:
+        """Encola un trabajo de forma duradera y despierta al ejecutor"""
+        await asyncio.to_thread(self.store.create, job_id, kind, payload)
+        self.start()
+        self._wakeup.set()
+
+    async def _heartbeat(self) -> None:
+        """
+        Mantiene vivo el latido aunque todos los huecos estén ocupados, y
+        recoge los trabajos de instancias cuyo latido ha caducado
+        """
+        while True:
+            await asyncio.sleep(self.store.lease_seconds / 3)
+            await asyncio.to_thread(self.store.heartbeat)
+            if await asyncio.to_thread(self.store.requeue_orphans):
+                self._wakeup.set()
+
+    async def _loop(self) -> None:
+        # Al arrancar se recogen los trabajos que dejaron a medias otras instancias
+        await asyncio.to_thread(self.store.heartbeat)
+        await asyncio.to_thread(self.store.requeue_orphans)
+        slots = asyncio.Semaphore(self.concurrency)
+        running = set()
+        while True:
+            await slots.acquire()
+            self._wakeup.clear()
+            job = await asyncio.to_thread(self.store.claim_next)
+            if job is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.get_running_loop().create_task(self._execute(job, slots))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+    async def _execute(self, job: Dict[str, Any], slots: asyncio.Semaphore) -> None:
+        try:
+            handler = self._handlers[job["kind"]]
+            result = await handler(job)
+        except HTTPException as e:
+            if e.status_code == 503:
+                # Pool de procesos lleno: se reintenta más tarde
+                await asyncio.to_thread(self.store.requeue, job["id"])
+                await asyncio.sleep(JOB_POLL_SECONDS)
+            else:
+                await asyncio.to_thread(self.store.fail, job["id"], str(e.detail))
+        except Exception as e:
+            await asyncio.to_thread(self.store.fail, job["id"], str(e))
+        else:
+            await asyncio.to_thread(self.store.complete, job["id"], result)
+        finally:
+            slots.release()
@@ -0,0 +1,114 @@
+"""
+Importación diferida de dependencias pesadas
+Extractores (pypdf, python-docx), NumPy, clientes HTTP y modelos de
+lenguaje se importan en el primer uso, no al arrancar el servicio; en
+producción pueden precargarse al inicio con ECDOTICA_PRELOAD
+"""
+
+import importlib
+import os
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Módulos que se precargan al arrancar: vacío (ninguno), "all" o lista separada por comas
+PRELOAD_MODULES = os.getenv("ECDOTICA_PRELOAD", "")
+
+
+class LazyModule(ModuleType):
+    """
+    Módulo que se importa al acceder al primero de sus atributos
+
+    Si la dependencia no está instalada, el ImportError se produce en
+    ese primer acceso y no al importar el módulo que la declara.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            with self.__dict__["_lazy_lock"]:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    # Los accesos siguientes ya no pasan por __getattr__
+                    self.__dict__.update(module.__dict__)
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self.__dict__["_lazy_module"] is not None or self.__name__ in sys.modules
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self._load(), attribute)
+
+    def __dir__(self) -> List[str]:
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "cargado" if self.loaded else "diferido"
+        return f"<LazyModule {self.__name__!r} ({state})>"
+
+
+# Registro de dependencias diferidas y de funciones de calentamiento
+LAZY_MODULES: Dict[str, LazyModule] = {}
+WARMUP_HOOKS: Dict[str, Callable[[], Any]] = {}
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Registra `name` como dependencia diferida y devuelve su módulo perezoso"""
+    module = LAZY_MODULES.get(name)
+    if module is None:
+        module = LAZY_MODULES[name] = LazyModule(name)
+    return module
+
+
+def register_warmup(name: str, hook: Callable[[], Any]) -> None:
+    """Registra una función de calentamiento (p. ej. cargar un modelo) para preload"""
+    WARMUP_HOOKS[name] = hook
+
+
+def preload(names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Importa las dependencias indicadas y ejecuta sus calentamientos
+
+    `names` admite módulos registrados y nombres de calentamiento; None
+    precarga todo. Las dependencias opcionales ausentes no detienen el
+    arranque: se informa del error en el resultado.
+    """
+    selected = list(LAZY_MODULES) + list(WARMUP_HOOKS) if names is None else list(names)
+    report: Dict[str, Dict[str, Any]] = {}
+    for name in selected:
+        started = time.perf_counter()
+        try:
+            if name in WARMUP_HOOKS:
+                WARMUP_HOOKS[name]()
+            else:
+                lazy_import(name)._load()
+            report[name] = {"loaded": True}
+        except Exception as e:
+            report[name] = {"loaded": False, "error": str(e)}
+        report[name]["seconds"] = round(time.perf_counter() - started, 4)
+    return report
+
+
+def preload_from_env(setting: str = PRELOAD_MODULES) -> Dict[str, Dict[str, Any]]:
+    """Precarga según ECDOTICA_PRELOAD; sin configurar no hace nada"""
+    setting = setting.strip()
+    if not setting:
+        return {}
+    if setting == "all":
+        return preload()
+    return preload(name.strip() for name in setting.split(",") if name.strip())
+
+
+def status() -> Dict[str, bool]:
+    """Dependencias registradas y si ya están cargadas en este proceso"""
+    return {name: module.loaded for name, module in sorted(LAZY_MODULES.items())}
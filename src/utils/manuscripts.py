@@ -0,0 +1,274 @@
+"""
+Registro persistente de manuscritos
+Envíos, análisis y decisiones editoriales en SQLite, con escrituras
+agrupadas y listados paginados por clave
+"""
+
+import asyncio
+import base64
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from src.utils.paths import data_path
+
+# Las altas se acumulan y se escriben juntas al llegar a este número...
+MANUSCRIPT_BATCH_SIZE = int(os.getenv("ECDOTICA_MANUSCRIPT_BATCH_SIZE", "64"))
+# ...o, como mucho, tras este intervalo
+MANUSCRIPT_FLUSH_SECONDS = float(os.getenv("ECDOTICA_MANUSCRIPT_FLUSH_SECONDS", "0.2"))
+MAX_PAGE_SIZE = 200
+
+DECISIONS = ("accepted", "rejected", "review_needed")
+# Columnas por las que se puede ordenar un listado
+SORT_COLUMNS = ("submitted_at", "quality_score")
+
+_COLUMNS = (
+    "id", "title", "author", "email", "genre", "source", "filename", "size",
+    "text_sha256", "word_count", "quality_score", "auto_decision", "status",
+    "analysis", "submitted_at", "updated_at",
+)
+
+
+def _encode_cursor(value: Any, manuscript_id: str) -> str:
+    raw = json.dumps([value, manuscript_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        value, manuscript_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación no válido")
+    return value, manuscript_id
+
+
+class ManuscriptStore:
+    """Persistencia de manuscritos y decisiones en SQLite"""
+
+    def __init__(self, path: Optional[str] = None, batch_size: int = MANUSCRIPT_BATCH_SIZE,
+                 flush_seconds: float = MANUSCRIPT_FLUSH_SECONDS):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._pending: List[tuple] = []
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Cada proceso abre su propia conexión
+        if self._db is None or self._db_pid != os.getpid():
+            self.path = self.path or data_path("manuscripts", "manuscripts.sqlite3")
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS manuscripts ("
+                " id TEXT PRIMARY KEY, title TEXT NOT NULL, author TEXT, email TEXT,"
+                " genre TEXT, source TEXT NOT NULL, filename TEXT, size INTEGER,"
+                " text_sha256 TEXT, word_count INTEGER, quality_score INTEGER,"
+                " auto_decision TEXT, status TEXT NOT NULL, analysis TEXT,"
+                " submitted_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS decisions ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, manuscript_id TEXT NOT NULL,"
+                " decision TEXT NOT NULL, reviewer_notes TEXT, editorial_suggestions TEXT,"
+                " decided_at TEXT NOT NULL)"
+            )
+            # Los índices incluyen el id para servir la paginación por clave
+            for name, columns in (
+                ("status", "status, submitted_at, id"),
+                ("genre", "genre, submitted_at, id"),
+                ("quality", "quality_score, id"),
+                ("submitted", "submitted_at, id"),
+            ):
+                self._db.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_manuscripts_{name} ON manuscripts ({columns})"
+                )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_decisions_manuscript"
+                " ON decisions (manuscript_id, decided_at)"
+            )
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def add(self, manuscript_id: str, title: str, source: str,
+            analysis: Optional[Dict[str, Any]] = None, author: str = "", email: str = "",
+            genre: str = "", filename: Optional[str] = None, size: Optional[int] = None,
+            text_sha256: Optional[str] = None, auto_decision: Optional[str] = None,
+            submitted_at: Optional[str] = None) -> None:
+        """Registra un manuscrito; la escritura se agrupa con las siguientes"""
+        now = datetime.now().isoformat()
+        analysis = analysis or {}
+        row = (
+            manuscript_id, title, author, email, genre or None, source, filename, size,
+            text_sha256, analysis.get("word_count"), analysis.get("quality_score"),
+            auto_decision, "received", json.dumps(analysis, ensure_ascii=False),
+            submitted_at or now, now,
+        )
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        """Escribe en una sola transacción las altas pendientes"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        placeholders = ", ".join("?" * len(_COLUMNS))
+        with self.db:
+            self.db.executemany(
+                f"INSERT OR REPLACE INTO manuscripts ({', '.join(_COLUMNS)})"
+                f" VALUES ({placeholders})",
+                self._pending
+            )
+        self._pending = []
+
+    def get(self, manuscript_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._flush_locked()
+            row = self.db.execute(
+                "SELECT * FROM manuscripts WHERE id = ?", (manuscript_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            decisions = self.db.execute(
+                "SELECT decision, reviewer_notes, editorial_suggestions, decided_at"
+                " FROM decisions WHERE manuscript_id = ? ORDER BY decided_at, id",
+                (manuscript_id,)
+            ).fetchall()
+        manuscript = self._decode(row)
+        manuscript["decisions"] = [
+            {
+                "decision": decision["decision"],
+                "reviewer_notes": decision["reviewer_notes"],
+                "editorial_suggestions": json.loads(decision["editorial_suggestions"] or "null"),
+                "decided_at": decision["decided_at"],
+            }
+            for decision in decisions
+        ]
+        return manuscript
+
+    def record_decision(self, manuscript_id: str, decision: str,
+                        reviewer_notes: Optional[str] = None,
+                        editorial_suggestions: Optional[List[str]] = None) -> Optional[str]:
+        """
+        Guarda una decisión y actualiza el estado del manuscrito
+
+        Devuelve la fecha de registro, o None si el manuscrito no existe.
+        """
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._flush_locked()
+            with self.db:
+                cursor = self.db.execute(
+                    "UPDATE manuscripts SET status = ?, updated_at = ? WHERE id = ?",
+                    (decision, now, manuscript_id)
+                )
+                if cursor.rowcount == 0:
+                    return None
+                self.db.execute(
+                    "INSERT INTO decisions (manuscript_id, decision, reviewer_notes,"
+                    " editorial_suggestions, decided_at) VALUES (?, ?, ?, ?, ?)",
+                    (manuscript_id, decision, reviewer_notes,
+                     json.dumps(editorial_suggestions, ensure_ascii=False)
+                     if editorial_suggestions is not None else None, now)
+                )
+        return now
+
+    def list(self, status: Optional[str] = None, genre: Optional[str] = None,
+             min_score: Optional[int] = None, max_score: Optional[int] = None,
+             sort: str = "submitted_at", descending: bool = True, limit: int = 50,
+             cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Página de manuscritos filtrados, sin recorrer la tabla completa
+
+        La paginación es por clave: `cursor` es el valor devuelto en
+        `next_cursor` por la página anterior.
+        """
+        if sort not in SORT_COLUMNS:
+            raise HTTPException(
+                status_code=400, detail=f"Orden no soportado. Opciones: {', '.join(SORT_COLUMNS)}"
+            )
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        conditions, params = [], []
+        for column, operator, value in (
+            ("status", "=", status), ("genre", "=", genre),
+            ("quality_score", ">=", min_score), ("quality_score", "<=", max_score),
+        ):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+        if sort == "quality_score":
+            conditions.append("quality_score IS NOT NULL")
+        if cursor:
+            value, last_id = _decode_cursor(cursor)
+            conditions.append(f"({sort}, id) {'<' if descending else '>'} (?, ?)")
+            params.extend([value, last_id])
+
+        direction = "DESC" if descending else "ASC"
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            self._flush_locked()
+            rows = self.db.execute(
+                f"SELECT * FROM manuscripts {where}"
+                f" ORDER BY {sort} {direction}, id {direction} LIMIT ?",
+                (*params, limit + 1)
+            ).fetchall()
+
+        items = [self._decode(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = _encode_cursor(last[sort], last["manuscript_id"])
+        return {"items": items, "count": len(items), "next_cursor": next_cursor}
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            self._flush_locked()
+            rows = self.db.execute(
+                "SELECT status, COUNT(*) FROM manuscripts GROUP BY status"
+            ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def start(self) -> None:
+        """Arranca el volcado periódico de altas pendientes en el event loop actual"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.flush()
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            if self._pending:
+                await asyncio.to_thread(self.flush)
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+        manuscript = dict(row)
+        manuscript["manuscript_id"] = manuscript.pop("id")
+        manuscript["analysis"] = json.loads(manuscript["analysis"] or "{}")
+        return manuscript
@@ -0,0 +1,429 @@
+"""
+Métricas de rendimiento por etapa
+Histogramas de latencia, bytes y palabras por segundo de cada etapa
+(lectura, extracción, análisis, serialización) en formato de Prometheus,
+y perfiles de cProfile de las peticiones lentas
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.utils.paths import data_path
+
+# Umbral en segundos a partir del cual se guarda el perfil (0 = desactivado)
+PROFILE_SLOW_SECONDS = float(os.getenv("ECDOTICA_PROFILE_SLOW_SECONDS", "0"))
+# Perfiles conservados en disco; los más antiguos se eliminan
+PROFILE_KEEP = int(os.getenv("ECDOTICA_PROFILE_KEEP", "50"))
+PROFILE_TOP_FUNCTIONS = 40
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+THROUGHPUT_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6)
+
+_PROFILE_NAME = re.compile(r"^[\w.-]+\.prof$")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Contador acumulado por combinación de etiquetas"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {value:g}" for key, value in items]
+
+
+class Histogram:
+    """Histograma acumulativo con cubos fijos por combinación de etiquetas"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Por etiquetas: conteos por cubo (+Inf al final), suma y total
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(tuple(str(labels[name]) for name in self.labels))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                labels = _format_labels(self.labels, key, le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas del proceso y su exposición en texto de Prometheus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self.stage_seconds = self.histogram(
+            "ecdotica_stage_duration_seconds", "Duración de cada etapa del procesamiento",
+            labels=("stage",)
+        )
+        self.stage_bytes = self.counter(
+            "ecdotica_stage_bytes_total", "Bytes procesados por etapa", labels=("stage",)
+        )
+        self.stage_words = self.counter(
+            "ecdotica_stage_words_total", "Palabras procesadas por etapa", labels=("stage",)
+        )
+        self.stage_throughput = self.histogram(
+            "ecdotica_stage_words_per_second", "Palabras por segundo de cada ejecución de la etapa",
+            labels=("stage",), buckets=THROUGHPUT_BUCKETS
+        )
+        self.request_seconds = self.histogram(
+            "ecdotica_http_request_duration_seconds", "Duración de las peticiones HTTP",
+            labels=("method", "route", "status")
+        )
+        self.slow_profiles = self.counter(
+            "ecdotica_slow_request_profiles_total", "Perfiles guardados de peticiones lentas"
+        )
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def observe_stage(self, stage: str, seconds: float, bytes: int = 0, words: int = 0) -> None:
+        """Registra una ejecución de una etapa"""
+        self.stage_seconds.observe(seconds, stage=stage)
+        if bytes:
+            self.stage_bytes.inc(bytes, stage=stage)
+        if words:
+            self.stage_words.inc(words, stage=stage)
+            if seconds > 0:
+                self.stage_throughput.observe(words / seconds, stage=stage)
+
+    def observe_stages(self, stages: Dict[str, Dict[str, float]]) -> None:
+        """Registra las etapas medidas en otro proceso (ver StageTimings)"""
+        for stage, values in stages.items():
+            self.observe_stage(
+                stage, values.get("seconds", 0.0),
+                int(values.get("bytes", 0)), int(values.get("words", 0))
+            )
+
+    @contextmanager
+    def stage(self, stage: str, bytes: int = 0, words: int = 0) -> Iterator["StageRecord"]:
+        """
+        Mide el bloque como una ejecución de `stage`
+
+        Los bytes y palabras pueden fijarse dentro del bloque, cuando
+        aún no se conocen al entrar.
+        """
+        record = StageRecord(bytes, words)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self.observe_stage(stage, time.perf_counter() - started, record.bytes, record.words)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class StageRecord:
+    """Bytes y palabras de una ejecución de etapa en curso"""
+
+    def __init__(self, bytes: int = 0, words: int = 0):
+        self.bytes = bytes
+        self.words = words
+
+
+class StageTimings:
+    """
+    Tiempos por etapa acumulados dentro de un proceso trabajador
+
+    Se devuelven con el resultado y el proceso principal los registra
+    con MetricsRegistry.observe_stages.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    def add(self, stage: str, seconds: float, bytes: int = 0, words: int = 0) -> None:
+        values = self.stages.setdefault(stage, {"seconds": 0.0, "bytes": 0, "words": 0})
+        values["seconds"] += seconds
+        values["bytes"] += bytes
+        values["words"] += words
+
+    def timed_iter(self, stage: str, iterable) -> Iterator:
+        """Recorre `iterable` sumando a `stage` el tiempo de producir cada elemento"""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(stage, time.perf_counter() - started)
+                return
+            self.add(stage, time.perf_counter() - started)
+            yield item
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+
+class SlowRequestProfiler:
+    """
+    Perfiles de cProfile de las peticiones más lentas que el umbral
+
+    cProfile solo admite un perfilador activo por proceso, así que se
+    perfila una petición a la vez. El perfilador mide el hilo del bucle de
+    eventos entero: lo que hacen las peticiones concurrentes mientras la
+    perfilada espera queda mezclado en su perfil. Por eso se anota cuántas
+    peticiones se solaparon con ella y el informe lo advierte. El trabajo
+    enviado al pool de procesos no aparece en el perfil.
+    """
+
+    def __init__(self, threshold: float = PROFILE_SLOW_SECONDS, directory: Optional[str] = None,
+                 keep: int = PROFILE_KEEP):
+        self.threshold = threshold
+        self.directory = directory
+        self.keep = keep
+        self._active = False
+        self._lock = threading.Lock()
+        # Peticiones en curso y, mientras hay un perfil activo, las que se solapan con él
+        self._in_flight = 0
+        self._running_at_start = 0
+        self._started_during = 0
+        self._finished_during: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def _directory(self) -> str:
+        self.directory = self.directory or data_path("profiles")
+        os.makedirs(self.directory, exist_ok=True)
+        return self.directory
+
+    def enter(self) -> None:
+        """Anota el comienzo de una petición, perfilada o no"""
+        with self._lock:
+            self._in_flight += 1
+            if self._active:
+                self._started_during += 1
+
+    def leave(self, method: str, route: str) -> None:
+        """Anota el final de una petición no perfilada"""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if self._active:
+                request = f"{method} {route}"
+                self._finished_during[request] = self._finished_during.get(request, 0) + 1
+
+    def start(self) -> Optional[cProfile.Profile]:
+        """Perfilador para la petición actual, o None si hay otro activo"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._active:
+                return None
+            self._active = True
+            self._running_at_start = max(0, self._in_flight - 1)
+            self._started_during = 0
+            self._finished_during = {}
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Otra herramienta de perfilado ya está activa
+            self._active = False
+            return None
+        return profiler
+
+    def finish(self, profiler: cProfile.Profile, seconds: float, method: str,
+               route: str) -> Optional[str]:
+        """Detiene el perfil y lo guarda si la petición superó el umbral"""
+        profiler.disable()
+        with self._lock:
+            self._active = False
+            self._in_flight = max(0, self._in_flight - 1)
+            concurrent = {
+                "concurrent_requests": self._running_at_start + self._started_during,
+                "finished_during": dict(sorted(
+                    self._finished_during.items(), key=lambda item: -item[1]
+                )),
+            }
+        if seconds < self.threshold:
+            return None
+        slug = re.sub(r"[^\w-]+", "_", route).strip("_") or "root"
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{int(seconds * 1000)}ms-{method}-{slug}.prof"
+        path = os.path.join(self._directory(), name)
+        profiler.dump_stats(path)
+        with open(path + ".json", "w", encoding="utf-8") as handle:
+            json.dump(concurrent, handle)
+        self._prune()
+        return name
+
+    def _concurrency(self, path: str) -> Dict[str, Any]:
+        try:
+            with open(path + ".json", encoding="utf-8") as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {"concurrent_requests": None, "finished_during": {}}
+
+    def _prune(self) -> None:
+        profiles = sorted(
+            (entry for entry in os.scandir(self._directory()) if entry.name.endswith(".prof")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in profiles[:max(0, len(profiles) - self.keep)]:
+            os.remove(entry.path)
+            if os.path.exists(entry.path + ".json"):
+                os.remove(entry.path + ".json")
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Perfiles guardados, del más reciente al más antiguo"""
+        directory = self.directory or data_path("profiles")
+        if not os.path.isdir(directory):
+            return []
+        entries = [entry for entry in os.scandir(directory) if entry.name.endswith(".prof")]
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        return [
+            {"name": entry.name, "size": entry.stat().st_size, "created_at": entry.stat().st_mtime,
+             "concurrent_requests": self._concurrency(entry.path)["concurrent_requests"]}
+            for entry in entries
+        ]
+
+    def report(self, name: str, limit: int = PROFILE_TOP_FUNCTIONS) -> Optional[str]:
+        """Resumen de pstats (por tiempo acumulado) de un perfil guardado"""
+        if not _PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self._directory(), name)
+        if not os.path.exists(path):
+            return None
+        output = io.StringIO()
+        concurrency = self._concurrency(path)
+        if concurrency["concurrent_requests"]:
+            finished = ", ".join(
+                f"{request} x{count}" for request, count in concurrency["finished_during"].items()
+            )
+            output.write(
+                f"Aviso: {concurrency['concurrent_requests']} peticiones concurrentes se "
+                "solaparon con esta y su trabajo en el bucle de eventos aparece mezclado en "
+                f"el perfil. Terminadas durante el perfil: {finished or 'ninguna'}\n\n"
+            )
+        pstats.Stats(path, stream=output).sort_stats("cumulative").print_stats(limit)
+        return output.getvalue()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: duración de cada petición por ruta y perfil de las lentas
+
+    La ruta se etiqueta con su plantilla (/api/v1/manuscripts/{manuscript_id})
+    para no crear una serie por cada identificador.
+    """
+
+    def __init__(self, app, registry: "MetricsRegistry", profiler: "SlowRequestProfiler"):
+        self.app = app
+        self.registry = registry
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.profiler.enter()
+        profiler = self.profiler.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            seconds = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self.registry.request_seconds.observe(
+                seconds, method=scope["method"], route=route, status=str(status)
+            )
+            if profiler is None:
+                self.profiler.leave(scope["method"], route)
+            elif self.profiler.finish(profiler, seconds, scope["method"], route):
+                self.registry.slow_profiles.inc()
+
+
+metrics = MetricsRegistry()
+slow_request_profiler = SlowRequestProfiler()
@@ -0,0 +1,15 @@
+"""
+Rutas de datos locales
+Todo lo que el servicio persiste en disco vive bajo ECDOTICA_DATA_DIR
+"""
+
+import os
+
+DATA_DIR = os.getenv("ECDOTICA_DATA_DIR", os.path.join(os.getcwd(), "data"))
+
+
+def data_path(*parts: str) -> str:
+    """Ruta dentro del directorio de datos, creándolo si no existe"""
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
@@ -0,0 +1,230 @@
+"""
+Extracción de texto PDF página a página
+Permite repartir las páginas entre varios procesos y devolverlas en orden
+como un generador, con un tiempo máximo de espera por página, o leer solo
+una muestra estratificada de páginas para las estimaciones rápidas
+"""
+
+import multiprocessing
+import os
+import random
+import signal
+import threading
+from multiprocessing.util import Finalize
+from typing import Callable, Iterator, List, NamedTuple, Optional
+
+from src.utils.lazy import lazy_import
+from src.utils.uploads import DocumentSource, open_document
+from src.utils.workers import WORKER_PROCESSES
+
+pypdf = lazy_import("pypdf")
+
+# Configuración por entorno (0: repartir la CPU, ver pdf_workers)
+PDF_WORKERS = int(os.getenv("ECDOTICA_PDF_WORKERS", "0"))
+PDF_PAGE_TIMEOUT = float(os.getenv("ECDOTICA_PDF_PAGE_TIMEOUT", "30"))
+# Por debajo de este número de páginas no compensa arrancar procesos
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("ECDOTICA_PDF_PARALLEL_MIN_PAGES", "16"))
+# Una página con menos caracteres extraídos se considera sin capa de texto
+PDF_MIN_TEXT_CHARS = int(os.getenv("ECDOTICA_PDF_MIN_TEXT_CHARS", "20"))
+
+# Documento y lector de cada proceso trabajador, cargados una sola vez por documento
+_worker_document = None
+_worker_reader: Optional["pypdf.PdfReader"] = None
+
+
+class PageTimeout(Exception):
+    """La extracción de una página superó su tiempo máximo"""
+
+
+def pdf_workers() -> int:
+    """
+    Procesos con los que extraer un PDF
+
+    Dentro del pool de trabajadores (src.utils.workers) cada proceso puede
+    estar extrayendo otro PDF a la vez, así que la CPU se reparte entre
+    ellos en vez de lanzar cpu_count procesos desde cada uno.
+    """
+    if PDF_WORKERS:
+        return PDF_WORKERS
+    cpus = os.cpu_count() or 1
+    if multiprocessing.parent_process() is not None:
+        return max(1, cpus // WORKER_PROCESSES)
+    return cpus
+
+
+def _raise_timeout(signum, frame) -> None:
+    raise PageTimeout()
+
+
+def extract_page_text(page: "pypdf.PageObject", timeout: float = 0) -> Optional[str]:
+    """
+    Texto de una página, o None si no termina en `timeout` segundos
+
+    El tiempo se mide desde que empieza la página, con una alarma del
+    sistema; solo es posible en el hilo principal de un sistema POSIX, y
+    fuera de él la página no tiene límite.
+    """
+    if not (timeout > 0 and hasattr(signal, "setitimer")
+            and threading.current_thread() is threading.main_thread()):
+        return page.extract_text() or ""
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return page.extract_text() or ""
+    except PageTimeout:
+        return None
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _close_worker_document() -> None:
+    if _worker_document is not None:
+        _worker_document.__exit__(None, None, None)
+
+
+def _init_worker(source: DocumentSource) -> None:
+    global _worker_document, _worker_reader
+    # El documento queda abierto mientras viva el proceso y se cierra al salir
+    _worker_document = open_document(source)
+    _worker_reader = pypdf.PdfReader(_worker_document.__enter__())
+    Finalize(None, _close_worker_document, exitpriority=10)
+
+
+def _extract_page(index: int, timeout: float) -> Optional[str]:
+    return extract_page_text(_worker_reader.pages[index], timeout)
+
+
+def iter_pdf_pages(
+    source: DocumentSource,
+    workers: Optional[int] = None,
+    page_timeout: Optional[float] = None,
+    on_timeout: Optional[Callable[[int], None]] = None,
+) -> Iterator[str]:
+    """
+    Genera el texto de cada página del PDF en orden
+
+    `source` puede ser el contenido del archivo o su ruta en disco. Con más
+    de un proceso, las páginas se extraen en paralelo. Una página que no
+    termina dentro de `page_timeout` segundos desde que empezó se devuelve
+    vacía para que no bloquee el resto del documento, y se notifica su
+    índice a `on_timeout`.
+    """
+    page_timeout = PDF_PAGE_TIMEOUT if page_timeout is None else page_timeout
+
+    def timed_out(index: int) -> str:
+        if on_timeout is not None:
+            on_timeout(index)
+        return ""
+
+    with open_document(source) as stream:
+        reader = pypdf.PdfReader(stream)
+        page_count = len(reader.pages)
+        workers = min(workers or pdf_workers(), page_count)
+
+        if workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+            for index, page in enumerate(reader.pages):
+                text = extract_page_text(page, page_timeout)
+                yield timed_out(index) if text is None else text
+            return
+        del reader
+
+    pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(source,))
+    # Sin páginas bloqueadas, al terminar los procesos pueden salir por sí mismos
+    finished = stuck = False
+    try:
+        pending = [
+            pool.apply_async(_extract_page, (i, page_timeout)) for i in range(page_count)
+        ]
+        for index, result in enumerate(pending):
+            # Cada página se corta en su proceso; esta espera solo cubre una
+            # página bloqueada fuera de Python, donde la alarma no llega
+            try:
+                text = result.get(timeout=2 * page_timeout if page_timeout > 0 else None)
+            except multiprocessing.TimeoutError:
+                text, stuck = None, True
+            yield timed_out(index) if text is None else text
+        finished = True
+    finally:
+        if finished and not stuck:
+            # Los procesos salen por sí mismos y cierran el documento
+            pool.close()
+        else:
+            # terminate() también detiene los procesos bloqueados en una página
+            pool.terminate()
+        pool.join()
+
+
+class SampledPage(NamedTuple):
+    index: int
+    text: str
+    # Hay texto extraíble; si no, y la página tiene imágenes, es un escaneo
+    has_text: bool
+    has_images: bool
+
+    @property
+    def scanned(self) -> bool:
+        return not self.has_text and self.has_images
+
+
+def stratified_sample(page_count: int, sample_size: int, rng: random.Random) -> List[int]:
+    """
+    Una página al azar de cada uno de `sample_size` tramos consecutivos
+
+    Los tramos cubren el documento entero, así que la muestra incluye
+    principio, medio y final. Con `sample_size` >= páginas, todas.
+    """
+    if sample_size >= page_count:
+        return list(range(page_count))
+    bounds = [round(i * page_count / sample_size) for i in range(sample_size + 1)]
+    return [rng.randrange(start, end) for start, end in zip(bounds, bounds[1:])]
+
+
+def _has_images(page) -> bool:
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources is not None else None
+    if xobjects is None:
+        return False
+    return any(
+        xobject.get_object().get("/Subtype") == "/Image"
+        for xobject in xobjects.get_object().values()
+    )
+
+
+class PdfPageSample:
+    """
+    Muestra estratificada de páginas de un PDF
+
+    Solo se extrae el texto de las páginas elegidas. Se recorren en orden
+    aleatorio, de modo que las primeras leídas ya son representativas de
+    todo el documento y permiten descartar pronto un PDF escaneado.
+    """
+
+    def __init__(self, source: DocumentSource, sample_size: int, seed: Optional[int] = None):
+        self.source = source
+        self.sample_size = sample_size
+        self.rng = random.Random(seed)
+        self.page_count = 0
+        self.indices: List[int] = []
+        self._document = None
+        self._reader = None
+
+    def __enter__(self) -> "PdfPageSample":
+        self._document = open_document(self.source)
+        self._reader = pypdf.PdfReader(self._document.__enter__())
+        self.page_count = len(self._reader.pages)
+        self.indices = stratified_sample(self.page_count, self.sample_size, self.rng)
+        self.rng.shuffle(self.indices)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._reader = None
+        self._document.__exit__(*exc_info)
+
+    def __iter__(self) -> Iterator[SampledPage]:
+        for index in self.indices:
+            page = self._reader.pages[index]
+            text = page.extract_text() or ""
+            yield SampledPage(
+                index, text, len(text.strip()) >= PDF_MIN_TEXT_CHARS, _has_images(page)
+            )
@@ -0,0 +1,326 @@
+"""
+Percentiles del corpus por género
+Un boceto de cuantiles KLL por género y métrica resume todos los
+manuscritos recibidos en memoria acotada; el percentil de un envío se
+calcula sobre el boceto, sin volver a leer los envíos anteriores
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from itertools import accumulate
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.utils.paths import data_path
+
+# Tamaño del compactor superior: el error de rango es del orden de 1/k
+PERCENTILE_SKETCH_K = int(os.getenv("ECDOTICA_PERCENTILE_SKETCH_K", "200"))
+# Las observaciones nuevas se guardan en disco, como mucho, tras este intervalo
+PERCENTILE_FLUSH_SECONDS = float(os.getenv("ECDOTICA_PERCENTILE_FLUSH_SECONDS", "5"))
+# Género al que se asignan los envíos que no indican ninguno
+DEFAULT_GENRE = "general"
+# Cuantiles incluidos en el resumen de cada métrica
+SUMMARY_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+def normalize_genre(genre: Optional[str]) -> str:
+    return (genre or "").strip().lower() or DEFAULT_GENRE
+
+
+class QuantileSketch:
+    """
+    Boceto KLL (Karnin, Lang y Liberty) de una serie de valores
+
+    Cada nivel h guarda elementos que representan 2**h valores; al llenarse
+    un nivel se ordena y sube uno de cada dos elementos al siguiente. Los
+    bocetos se pueden fusionar, así que varios procesos pueden acumular
+    observaciones por separado y combinarlas al guardarlas.
+    """
+
+    def __init__(self, k: int = PERCENTILE_SKETCH_K, seed: Optional[int] = None):
+        self.k = k
+        self.count = 0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+        self.levels: List[List[float]] = [[]]
+        self._retained = 0
+        self._random = random.Random(seed)
+        self._cdf: Optional[Tuple[List[float], List[int]]] = None
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(level) for level in range(len(self.levels)))
+
+    def add(self, value: float) -> None:
+        value = float(value)
+        self.levels[0].append(value)
+        self._retained += 1
+        self.count += 1
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        self._cdf = None
+        # La capacidad solo cambia al compactar, cuando se añade un nivel
+        if self._retained >= self._max_size():
+            self._compress()
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Añade a este boceto todas las observaciones de `other`"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self._retained += other._retained
+        self.count += other.count
+        for bound in (other.minimum, other.maximum):
+            if bound is not None:
+                self.minimum = bound if self.minimum is None else min(self.minimum, bound)
+                self.maximum = bound if self.maximum is None else max(self.maximum, bound)
+        self._cdf = None
+        while self._retained >= self._max_size():
+            self._compress()
+
+    def _compress(self) -> None:
+        for level, items in enumerate(self.levels):
+            if len(items) < self._capacity(level):
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            items.sort()
+            # Con un número impar de elementos el último se queda en su nivel
+            kept = [items.pop()] if len(items) % 2 else []
+            promoted = items[self._random.randint(0, 1)::2]
+            self.levels[level + 1].extend(promoted)
+            self._retained -= len(items) - len(promoted)
+            self.levels[level] = kept
+            if self._retained < self._max_size():
+                return
+
+    def _sorted(self) -> Tuple[List[float], List[int]]:
+        """Valores ordenados y sus pesos acumulados; se recalcula solo tras cambios"""
+        if self._cdf is None:
+            weighted = sorted(
+                (value, 1 << level)
+                for level, items in enumerate(self.levels) for value in items
+            )
+            self._cdf = (
+                [value for value, _ in weighted],
+                list(accumulate(weight for _, weight in weighted)),
+            )
+        return self._cdf
+
+    def rank(self, value: float) -> Tuple[float, float]:
+        """Peso estimado de los valores menores que `value` y de los iguales, en O(log n)"""
+        values, cumulative = self._sorted()
+        below_end = bisect_left(values, value)
+        equal_end = bisect_right(values, value, below_end)
+        below = cumulative[below_end - 1] if below_end else 0
+        through = cumulative[equal_end - 1] if equal_end else 0
+        # El peso total del boceto puede diferir de count por la compactación
+        scale = self.count / cumulative[-1] if cumulative else 0
+        return below * scale, (through - below) * scale
+
+    def quantile(self, q: float) -> Optional[float]:
+        values, cumulative = self._sorted()
+        if not values:
+            return None
+        position = bisect_left(cumulative, q * cumulative[-1])
+        return values[min(position, len(values) - 1)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "count": self.count, "min": self.minimum, "max": self.maximum,
+                "levels": self.levels}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(k=state["k"])
+        sketch.count = state["count"]
+        sketch.minimum = state["min"]
+        sketch.maximum = state["max"]
+        sketch.levels = [list(items) for items in state["levels"]] or [[]]
+        sketch._retained = sum(len(items) for items in sketch.levels)
+        return sketch
+
+
+def percentile_rank(sketches: Iterable[QuantileSketch], value: float) -> Optional[float]:
+    """
+    Percentil (0-100) de `value` en la unión de varios bocetos
+
+    Los empates cuentan por la mitad, de modo que un valor igual a todos
+    los anteriores queda en el percentil 50.
+    """
+    below = equal = total = 0.0
+    for sketch in sketches:
+        if sketch.count:
+            less, same = sketch.rank(value)
+            below, equal, total = below + less, equal + same, total + sketch.count
+    if not total:
+        return None
+    return round(100 * (below + equal / 2) / total, 1)
+
+
+class CorpusPercentiles:
+    """
+    Bocetos de cuantiles por género y métrica, persistidos en SQLite
+
+    Las observaciones nuevas se acumulan en un boceto aparte y se fusionan
+    con el guardado en cada volcado, releyéndolo dentro de la transacción
+    para no perder las de otros procesos que compartan el archivo.
+    """
+
+    def __init__(self, path: Optional[str] = None, k: int = PERCENTILE_SKETCH_K,
+                 flush_seconds: float = PERCENTILE_FLUSH_SECONDS):
+        self.path = path
+        self.k = k
+        self.flush_seconds = flush_seconds
+        self._stored: Dict[Tuple[str, str], QuantileSketch] = {}
+        self._pending: Dict[Tuple[str, str], QuantileSketch] = {}
+        self._loaded: set = set()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None or self._db_pid != os.getpid():
+            self.path = self.path or data_path("corpus", "percentiles.sqlite3")
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sketches ("
+                " genre TEXT NOT NULL, metric TEXT NOT NULL, count INTEGER NOT NULL,"
+                " state TEXT NOT NULL, updated_at TEXT NOT NULL,"
+                " PRIMARY KEY (genre, metric))"
+            )
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _load_locked(self, genre: str) -> None:
+        if genre in self._loaded:
+            return
+        for metric, state in self.db.execute(
+            "SELECT metric, state FROM sketches WHERE genre = ?", (genre,)
+        ):
+            self._stored[(genre, metric)] = QuantileSketch.from_dict(json.loads(state))
+        self._loaded.add(genre)
+
+    def _sketches(self, key: Tuple[str, str]) -> List[QuantileSketch]:
+        return [sketches[key] for sketches in (self._stored, self._pending) if key in sketches]
+
+    def _rank_locked(self, genre: str, values: Dict[str, float]) -> Dict[str, Any]:
+        self._load_locked(genre)
+        sketches = {metric: self._sketches((genre, metric)) for metric in values}
+        return {
+            "genre": genre,
+            "sample_size": max(
+                (sum(s.count for s in found) for found in sketches.values()), default=0
+            ),
+            "metrics": {
+                metric: percentile_rank(sketches[metric], value)
+                for metric, value in values.items()
+            },
+        }
+
+    def rank(self, genre: Optional[str], values: Dict[str, float]) -> Dict[str, Any]:
+        """Percentil de cada valor entre los manuscritos ya recibidos del género"""
+        with self._lock:
+            return self._rank_locked(normalize_genre(genre), values)
+
+    def rank_and_observe(self, genre: Optional[str], values: Dict[str, float]) -> Dict[str, Any]:
+        """
+        Percentiles de un envío frente a los anteriores, y lo añade al corpus
+
+        `sample_size` es el número de manuscritos del género con el que se
+        compara, sin contar este.
+        """
+        genre = normalize_genre(genre)
+        with self._lock:
+            ranks = self._rank_locked(genre, values)
+            for metric, value in values.items():
+                pending = self._pending.get((genre, metric))
+                if pending is None:
+                    pending = self._pending[(genre, metric)] = QuantileSketch(self.k)
+                pending.add(value)
+        return ranks
+
+    def summary(self, genre: Optional[str]) -> Dict[str, Any]:
+        """Cuantiles aproximados de cada métrica del género"""
+        genre = normalize_genre(genre)
+        with self._lock:
+            self._load_locked(genre)
+            keys = sorted({key for key in (*self._stored, *self._pending) if key[0] == genre})
+            metrics = {}
+            for key in keys:
+                merged = QuantileSketch(self.k)
+                for sketch in self._sketches(key):
+                    merged.merge(sketch)
+                metrics[key[1]] = {
+                    "count": merged.count,
+                    "min": merged.minimum,
+                    "max": merged.maximum,
+                    "quantiles": {
+                        f"p{round(q * 100)}": merged.quantile(q) for q in SUMMARY_QUANTILES
+                    },
+                }
+        return {"genre": genre, "metrics": metrics}
+
+    def flush(self) -> None:
+        """Fusiona las observaciones pendientes con los bocetos guardados"""
+        with self._lock:
+            if not self._pending:
+                return
+            now = datetime.now().isoformat()
+            with self.db:
+                # Bloqueo de escritura antes de releer: otro proceso no puede
+                # guardar entre la lectura y la escritura
+                self.db.execute("BEGIN IMMEDIATE")
+                for (genre, metric), pending in self._pending.items():
+                    row = self.db.execute(
+                        "SELECT state FROM sketches WHERE genre = ? AND metric = ?",
+                        (genre, metric)
+                    ).fetchone()
+                    merged = QuantileSketch.from_dict(json.loads(row[0])) if row \
+                        else QuantileSketch(self.k)
+                    merged.merge(pending)
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO sketches (genre, metric, count, state, updated_at)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        (genre, metric, merged.count, json.dumps(merged.to_dict()), now)
+                    )
+                    self._stored[(genre, metric)] = merged
+            self._pending = {}
+
+    def start(self) -> None:
+        """Arranca el volcado periódico de observaciones en el event loop actual"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.flush()
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            if self._pending:
+                await asyncio.to_thread(self.flush)
+
+
+corpus_percentiles = CorpusPercentiles()
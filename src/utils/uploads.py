@@ -0,0 +1,240 @@
+"""
+Recepción de archivos subidos por fragmentos
+Limita el tamaño mientras se recibe, guarda el archivo en disco y lo expone
+a los extractores mediante un mapeo en memoria
+"""
+
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from io import BytesIO
+from typing import BinaryIO, Dict, Iterator, List, Optional, Union
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from src.utils.metrics import metrics
+
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+ZIP_DOCUMENT_EXTENSIONS = (".pdf", ".docx")
+# Margen para las cabeceras y campos del multipart sobre el tamaño del archivo
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Origen de un documento: contenido en memoria o ruta en disco
+DocumentSource = Union[bytes, str]
+
+
+class MappedFile(mmap.mmap):
+    """Mapeo de solo lectura que se comporta como un archivo binario"""
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+
+@contextmanager
+def open_document(source: DocumentSource) -> Iterator[BinaryIO]:
+    """Abre un documento en memoria o lo mapea desde disco"""
+    if isinstance(source, (bytes, bytearray)):
+        yield BytesIO(source)
+        return
+    with open(source, "rb") as handle:
+        mapped = MappedFile(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+
+class SpooledUpload:
+    """Archivo subido guardado temporalmente en disco"""
+
+    def __init__(self, path: str, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        # Huella del contenido original, usada como clave de caché
+        self.sha256 = sha256
+        self.kept = False
+
+    def keep(self, destination: str) -> str:
+        """Mueve el archivo a una ruta permanente; ya no se borrará al cerrar"""
+        shutil.move(self.path, destination)
+        self.path = destination
+        self.kept = True
+        return destination
+
+    def close(self) -> None:
+        if self.kept:
+            return
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Archivo demasiado grande. Máximo {max_size // (1024 * 1024)}MB permitido."
+    )
+
+
+class _SpoolWriter:
+    """Escribe fragmentos en un archivo temporal calculando tamaño y huella"""
+
+    def __init__(self, filename: Optional[str], max_size: int):
+        suffix = os.path.splitext(filename or "")[1]
+        fd, self.path = tempfile.mkstemp(prefix="ecdotica-", suffix=suffix)
+        self.output = os.fdopen(fd, "wb")
+        self.max_size = max_size
+        self.size = 0
+        self.digest = hashlib.sha256()
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise _too_large(self.max_size)
+        self.digest.update(chunk)
+        self.output.write(chunk)
+
+    def finish(self) -> SpooledUpload:
+        self.output.close()
+        return SpooledUpload(self.path, self.size, self.digest.hexdigest())
+
+    def abort(self) -> None:
+        self.output.close()
+        os.unlink(self.path)
+
+
+async def spool_upload(
+    file: UploadFile,
+    max_size: int = MAX_FILE_SIZE,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> SpooledUpload:
+    """
+    Copia el archivo subido a disco en fragmentos acotados
+
+    Rechaza con 413 en cuanto se supera `max_size`. Starlette ya ha
+    recibido el cuerpo entero al llegar aquí: lo que corta la recepción
+    es `UploadLimitMiddleware`, y esto acota cada archivo de un envío.
+    """
+    if file.size is not None and file.size > max_size:
+        raise _too_large(max_size)
+
+    writer = _SpoolWriter(file.filename, max_size)
+    with metrics.stage("read") as stage:
+        try:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                stage.bytes += len(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.finish()
+
+
+class UploadLimitMiddleware:
+    """
+    Middleware ASGI que limita el cuerpo de las rutas de subida
+
+    Starlette recibe y guarda el multipart completo antes de llamar al
+    endpoint, así que el límite de tamaño tiene que aplicarse aquí: se
+    rechaza por Content-Length sin leer nada y, si la cabecera falta o
+    miente, se cuentan los bytes recibidos y se aborta al pasar el límite.
+    `limits` asocia cada ruta con el tamaño máximo de su archivo.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        max_size = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if max_size is None:
+            await self.app(scope, receive, send)
+            return
+
+        limit = max_size + MULTIPART_OVERHEAD
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            response = JSONResponse({"detail": _too_large(max_size).detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # El endpoint lo recibe al leer el formulario y responde 413
+                    raise _too_large(max_size)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def list_zip_documents(archive_path: str, max_entries: int) -> List[str]:
+    """Nombres de los documentos .pdf y .docx contenidos en un ZIP"""
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            names = [
+                info.filename for info in archive.infolist()
+                if not info.is_dir()
+                and not info.filename.startswith("__MACOSX/")
+                and info.filename.lower().endswith(ZIP_DOCUMENT_EXTENSIONS)
+            ]
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Archivo ZIP no válido")
+    if len(names) > max_entries:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Demasiados archivos en el ZIP. Máximo {max_entries} permitidos."
+        )
+    return names
+
+
+def spool_zip_member(
+    archive_path: str,
+    member: str,
+    max_size: int = MAX_FILE_SIZE,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> SpooledUpload:
+    """
+    Copia a disco un archivo contenido en un ZIP
+
+    El tamaño se comprueba mientras se descomprime, sin fiarse de la
+    cabecera del ZIP.
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        info = archive.getinfo(member)
+        if info.file_size > max_size:
+            raise _too_large(max_size)
+        writer = _SpoolWriter(member, max_size)
+        try:
+            with archive.open(info) as source:
+                while True:
+                    chunk = source.read(chunk_size)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+    return writer.finish()
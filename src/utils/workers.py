@@ -0,0 +1,154 @@
+"""
+Pool de procesos para el trabajo intensivo en CPU
+Extracción y análisis se ejecutan fuera del bucle de eventos, con una
+cola de admisión acotada que rechaza rápido cuando el servidor está lleno
+"""
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.managers import SyncManager
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+# Configuración por entorno
+WORKER_PROCESSES = int(os.getenv("ECDOTICA_WORKERS", "0")) or (os.cpu_count() or 1)
+# Tareas admitidas a la vez (en ejecución + en espera)
+WORKER_MAX_PENDING = int(os.getenv("ECDOTICA_MAX_PENDING", "0")) or WORKER_PROCESSES * 4
+WORKER_RETRY_AFTER = int(os.getenv("ECDOTICA_RETRY_AFTER", "5"))
+# Frecuencia máxima con la que una tarea envía su progreso por la cola
+WORKER_PROGRESS_INTERVAL = float(os.getenv("ECDOTICA_PROGRESS_INTERVAL", "0.25"))
+
+
+class WorkerHTTPError(Exception):
+    """HTTPException serializable para devolverla desde otro proceso"""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _invoke(fn: Callable, args: tuple) -> Any:
+    try:
+        return fn(*args)
+    except HTTPException as e:
+        raise WorkerHTTPError(e.status_code, e.detail) from None
+
+
+class QueueProgress:
+    """
+    Informa del progreso de una tarea del pool a través de una cola compartida
+
+    Misma interfaz que JobProgress. Los valores invocables se evalúan solo
+    al enviar, para no calcular en cada fragmento lo que luego se descarta;
+    si la cola está llena (nadie la lee) el progreso se pierde sin detener
+    la tarea.
+    """
+
+    def __init__(self, channel: Any, interval: float = WORKER_PROGRESS_INTERVAL):
+        self.channel = channel
+        self.interval = interval
+        self._last_put = 0.0
+
+    def update(self, force: bool = False, **progress: Any) -> None:
+        now = time.monotonic()
+        if force or now - self._last_put >= self.interval:
+            message = {
+                name: value() if callable(value) else value for name, value in progress.items()
+            }
+            try:
+                self.channel.put_nowait(message)
+            except queue.Full:
+                pass
+            self._last_put = now
+
+
+def drain_progress(channel: Any) -> List[Dict[str, Any]]:
+    """Mensajes de progreso pendientes en la cola, sin esperar"""
+    messages = []
+    while True:
+        try:
+            messages.append(channel.get_nowait())
+        except queue.Empty:
+            return messages
+
+
+class WorkerPool:
+    """Pool de procesos con admisión acotada"""
+
+    def __init__(self, processes: int = WORKER_PROCESSES, max_pending: int = WORKER_MAX_PENDING):
+        self.processes = processes
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager: Optional[SyncManager] = None
+        self._manager_lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # Se crea en el primer uso para no lanzar procesos al importar
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        return self._executor
+
+    def progress_channel(self, maxsize: int = 1000) -> Any:
+        """
+        Cola que una tarea del pool puede usar para informar de su progreso
+
+        Las colas de multiprocessing no se pueden pasar como argumento a un
+        ProcessPoolExecutor; las de un Manager sí. El Manager se arranca en el
+        primer uso. Crear la cola es una llamada bloqueante al proceso del
+        Manager: desde el bucle de eventos hay que hacerla en un hilo.
+        """
+        with self._manager_lock:
+            if self._manager is None:
+                self._manager = multiprocessing.Manager()
+        return self._manager.Queue(maxsize)
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        """
+        Ejecuta `fn(*args)` en el pool de procesos
+
+        Si la cola está llena responde 503 de inmediato con Retry-After.
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Servidor ocupado. Inténtalo de nuevo en unos segundos.",
+                headers={"Retry-After": str(WORKER_RETRY_AFTER)}
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, _invoke, fn, args)
+        except WorkerHTTPError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail) from None
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "processes": self.processes,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+worker_pool = WorkerPool()
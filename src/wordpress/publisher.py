@@ -0,0 +1,420 @@
+"""
+Publicación de manuscritos en WordPress
+Las entradas se encolan por sitio y se envían en lotes a la API REST
+(/wp-json/batch/v1) con un cliente HTTP compartido que mantiene abiertas
+las conexiones, reintentos con espera creciente y un máximo de peticiones
+simultáneas por sitio
+"""
+
+import asyncio
+import json
+import os
+from functools import partial
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.utils.lazy import lazy_import
+
+httpx = lazy_import("httpx")
+
+# Tipo de entrada (rest_base) en el que se crean los manuscritos
+WORDPRESS_POST_TYPE = os.getenv("ECDOTICA_WORDPRESS_POST_TYPE", "manuscrito")
+# WordPress admite como máximo 25 peticiones por lote
+WORDPRESS_BATCH_SIZE = int(os.getenv("ECDOTICA_WORDPRESS_BATCH_SIZE", "25"))
+# Espera máxima para reunir un lote antes de enviarlo
+WORDPRESS_BATCH_WINDOW = float(os.getenv("ECDOTICA_WORDPRESS_BATCH_WINDOW", "0.05"))
+# Peticiones en curso a la vez contra un mismo sitio
+WORDPRESS_SITE_CONCURRENCY = int(os.getenv("ECDOTICA_WORDPRESS_SITE_CONCURRENCY", "4"))
+WORDPRESS_RETRIES = int(os.getenv("ECDOTICA_WORDPRESS_RETRIES", "4"))
+WORDPRESS_BACKOFF = float(os.getenv("ECDOTICA_WORDPRESS_BACKOFF", "0.5"))
+WORDPRESS_TIMEOUT = float(os.getenv("ECDOTICA_WORDPRESS_TIMEOUT", "30"))
+# Conexiones del cliente compartido, entre todos los sitios
+WORDPRESS_MAX_CONNECTIONS = int(os.getenv("ECDOTICA_WORDPRESS_MAX_CONNECTIONS", "100"))
+
+# Sitios en los que se permite publicar y, opcionalmente, sus credenciales:
+# {"https://ecdotica.com": {"user": "editor", "password": "xxxx xxxx xxxx"}}
+WORDPRESS_SITES = os.getenv("ECDOTICA_WORDPRESS_SITES", '{"https://ecdotica.com": {}}')
+
+BATCH_PATH = "/wp-json/batch/v1"
+REST_PREFIX = "/wp-json"
+
+
+class WordPressPublishError(Exception):
+    """WordPress rechazó la entrada o no respondió tras agotar los reintentos"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _retryable(status_code: int) -> bool:
+    """
+    Respuestas que garantizan que la entrada no se creó
+
+    Crear una entrada no es idempotente: ante un 500 o un 504 WordPress
+    puede haberla guardado, y reenviarla la duplicaría.
+    """
+    return status_code in (429, 503)
+
+
+def _not_sent() -> tuple:
+    """Errores de httpx en los que la petición no llegó a salir hacia el servidor"""
+    return httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout
+
+
+def _uncertain(error: Exception) -> "WordPressPublishError":
+    return WordPressPublishError(
+        502, f"Se perdió la respuesta de WordPress ({error}); la entrada puede haberse "
+             "creado, compruébelo antes de reenviarla"
+    )
+
+
+def normalize_site_url(url: str) -> str:
+    return url.strip().rstrip("/").lower()
+
+
+def load_sites(config: str) -> Dict[str, Dict[str, str]]:
+    """Sitios permitidos de ECDOTICA_WORDPRESS_SITES, con la URL normalizada"""
+    return {
+        normalize_site_url(url): credentials or {}
+        for url, credentials in json.loads(config).items()
+    }
+
+
+def _error_detail(status_code: int, body: Any) -> str:
+    """Mensaje de error de WordPress ({"code", "message"}) o el código HTTP"""
+    if isinstance(body, dict) and body.get("message"):
+        return f"WordPress ({status_code}): {body['message']}"
+    return f"WordPress respondió con HTTP {status_code}"
+
+
+def _retry_after(response: "httpx.Response") -> float:
+    value = response.headers.get("retry-after", "")
+    return float(value) if value.replace(".", "", 1).isdigit() else 0.0
+
+
+def _published(post_type: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    """Datos de la entrada creada que se devuelven al cliente"""
+    return {
+        "id": body.get("id"),
+        "link": body.get("link"),
+        "status": body.get("status"),
+        "post_type": post_type,
+    }
+
+
+class _Pending:
+    """Entrada encolada y el futuro en el que se entrega su resultado"""
+
+    __slots__ = ("post_type", "post", "future")
+
+    def __init__(self, post_type: str, post: Dict[str, Any], future: asyncio.Future):
+        self.post_type = post_type
+        self.post = post
+        self.future = future
+
+    def resolve(self, result: Dict[str, Any]) -> None:
+        if not self.future.done():
+            self.future.set_result(result)
+
+    def fail(self, error: WordPressPublishError) -> None:
+        if not self.future.done():
+            self.future.set_exception(error)
+
+
+class _Site:
+    """Cola y credenciales de un sitio WordPress"""
+
+    def __init__(self, base_url: str, user: str, password: str):
+        self.base_url = base_url
+        self.auth = (user, password)
+        self.queue: "asyncio.Queue[_Pending]" = asyncio.Queue()
+        # None hasta saber si el sitio admite /batch/v1 (WordPress 5.6+)
+        self.batch_supported: Optional[bool] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class WordPressPublisher:
+    """
+    Crea entradas en sitios WordPress agrupando las peticiones
+
+    Cada sitio (URL y credenciales) tiene su propia cola; un lote reúne lo
+    encolado mientras el anterior estaba en curso, hasta `batch_size`
+    entradas. Los sitios sin /batch/v1 reciben las entradas una a una por
+    la misma conexión. Solo se publica en los sitios de `sites`, para que
+    la API no envíe credenciales a direcciones arbitrarias.
+    """
+
+    def __init__(self, transport: Optional["httpx.AsyncBaseTransport"] = None,
+                 sites: Optional[Dict[str, Dict[str, str]]] = None,
+                 batch_size: int = WORDPRESS_BATCH_SIZE,
+                 batch_window: float = WORDPRESS_BATCH_WINDOW,
+                 site_concurrency: int = WORDPRESS_SITE_CONCURRENCY,
+                 retries: int = WORDPRESS_RETRIES, backoff: float = WORDPRESS_BACKOFF,
+                 timeout: float = WORDPRESS_TIMEOUT,
+                 max_connections: int = WORDPRESS_MAX_CONNECTIONS):
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.site_concurrency = site_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.sites = load_sites(WORDPRESS_SITES) if sites is None else {
+            normalize_site_url(url): credentials for url, credentials in sites.items()
+        }
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sites: Dict[Tuple[str, str, str], _Site] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._batches: Dict[asyncio.Task, List[_Pending]] = {}
+        self.counts = {"published": 0, "failed": 0, "retried": 0, "requests": 0}
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout, transport=self._transport,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self._client
+
+    def credentials(self, site_url: str, user: str = "",
+                    password: str = "") -> Optional[Tuple[str, str]]:
+        """
+        Credenciales con las que publicar en un sitio permitido
+
+        Las de la petición, si vienen, y si no las configuradas; None si no
+        hay ninguna. Lanza WordPressPublishError si el sitio no está permitido.
+        """
+        configured = self.sites.get(normalize_site_url(site_url))
+        if configured is None:
+            raise WordPressPublishError(
+                400, f"Sitio de WordPress no permitido: {site_url}. "
+                     "Los sitios se configuran en ECDOTICA_WORDPRESS_SITES"
+            )
+        if user and password:
+            return user, password
+        if configured.get("user") and configured.get("password"):
+            return configured["user"], configured["password"]
+        return None
+
+    async def publish(self, site_url: str, user: str, password: str, post: Dict[str, Any],
+                      post_type: str = WORDPRESS_POST_TYPE) -> Dict[str, Any]:
+        """
+        Encola la entrada y espera a que WordPress la cree
+
+        `user` y `password` pueden quedar vacíos si el sitio tiene
+        credenciales configuradas. Devuelve el ID, el enlace y el estado de
+        la entrada; lanza WordPressPublishError si el sitio no está
+        permitido o WordPress la rechaza o no responde.
+        """
+        credentials = self.credentials(site_url, user, password)
+        if credentials is None:
+            raise WordPressPublishError(400, "Faltan las credenciales del sitio de WordPress")
+        site = self._site(normalize_site_url(site_url), *credentials)
+        pending = _Pending(post_type, post, asyncio.get_running_loop().create_future())
+        site.queue.put_nowait(pending)
+        return await pending.future
+
+    def _site(self, base_url: str, user: str, password: str) -> _Site:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Las colas, los semáforos y el cliente pertenecen a un bucle de
+            # eventos; si cambia (reinicio del servidor, TestClient) se recrean
+            self._sites, self._slots, self._batches = {}, {}, {}
+            self._client = None
+            self._loop = loop
+        key = (base_url, user, password)
+        site = self._sites.get(key)
+        if site is None:
+            site = self._sites[key] = _Site(base_url, user, password)
+        if site.task is None or site.task.done():
+            site.task = loop.create_task(self._dispatch(site))
+        return site
+
+    async def _dispatch(self, site: _Site) -> None:
+        """Reúne las entradas encoladas del sitio en lotes y los envía"""
+        slots = self._slots.setdefault(site.base_url, asyncio.Semaphore(self.site_concurrency))
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await site.queue.get()]
+            # Mientras no hay hueco las entradas se acumulan en la cola
+            await slots.acquire()
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                if site.queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(site.queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(site.queue.get_nowait())
+            task = loop.create_task(self._send(site, batch))
+            self._batches[task] = batch
+            task.add_done_callback(partial(self._batch_done, slots))
+
+    def _batch_done(self, slots: asyncio.Semaphore, task: asyncio.Task) -> None:
+        """Libera el hueco del sitio; si el envío se interrumpió, avisa a quien espera"""
+        slots.release()
+        batch = self._batches.pop(task, [])
+        if task.cancelled() or task.exception() is not None:
+            error = WordPressPublishError(502, "La publicación en WordPress se interrumpió")
+            for item in batch:
+                item.fail(error)
+
+    async def _send(self, site: _Site, batch: List[_Pending]) -> None:
+        """
+        Envía un lote, reintentando con espera creciente las entradas que fallan
+
+        Solo se reintenta lo que con seguridad no se creó: un error de
+        conexión antes de enviar o un 429/503. Si se pierde la respuesta
+        (tiempo agotado, conexión cortada) el lote falla sin reenviarse.
+        """
+        pending = batch
+        delay = self.backoff
+        for attempt in range(self.retries):
+            try:
+                if site.batch_supported is False:
+                    retry, wait = await self._post_each(site, pending)
+                else:
+                    retry, wait = await self._post_batch(site, pending)
+            except _not_sent() as e:
+                error = WordPressPublishError(502, f"No se pudo conectar con WordPress: {e}")
+                retry, wait = [(item, error) for item in pending], 0.0
+            except (httpx.HTTPError, ValueError) as e:
+                # Respuesta perdida o que no es JSON: el lote pudo crearse
+                error = _uncertain(e)
+                for item in pending:
+                    item.fail(error)
+                self.counts["failed"] += len(pending)
+                return
+            if not retry:
+                return
+            if attempt == self.retries - 1:
+                for item, error in retry:
+                    item.fail(error)
+                self.counts["failed"] += len(retry)
+                return
+            self.counts["retried"] += len(retry)
+            pending = [item for item, _ in retry]
+            await asyncio.sleep(max(delay, wait))
+            delay *= 2
+
+    async def _post_batch(self, site: _Site,
+                          items: List[_Pending]) -> Tuple[List[tuple], float]:
+        """
+        Crea las entradas con una sola petición a /batch/v1
+
+        Devuelve las entradas que conviene reintentar, con su error, y la
+        espera pedida por el servidor.
+        """
+        self.counts["requests"] += 1
+        response = await self.client.post(
+            site.base_url + BATCH_PATH, auth=site.auth,
+            json={"requests": [
+                {"method": "POST", "path": f"/wp/v2/{item.post_type}", "body": item.post}
+                for item in items
+            ]}
+        )
+        if response.status_code == 404 and site.batch_supported is None:
+            # WordPress anterior a 5.6: se publican una a una
+            site.batch_supported = False
+            return await self._post_each(site, items)
+        if response.status_code >= 400:
+            return self._whole_failure(items, response)
+        site.batch_supported = True
+        results = response.json().get("responses", [])
+        retry = []
+        for index, item in enumerate(items):
+            result = results[index] if index < len(results) else {}
+            retry.extend(self._settle(item, result.get("status", 500), result.get("body")))
+        return retry, _retry_after(response)
+
+    async def _post_each(self, site: _Site,
+                         items: List[_Pending]) -> Tuple[List[tuple], float]:
+        """Crea las entradas de una en una, sin salir del hueco del sitio"""
+        retry: List[tuple] = []
+        wait = 0.0
+        for item in items:
+            self.counts["requests"] += 1
+            try:
+                response = await self.client.post(
+                    f"{site.base_url}{REST_PREFIX}/wp/v2/{item.post_type}",
+                    auth=site.auth, json=item.post
+                )
+            except _not_sent() as e:
+                error = WordPressPublishError(502, f"No se pudo conectar con WordPress: {e}")
+                retry.append((item, error))
+                continue
+            except httpx.HTTPError as e:
+                item.fail(_uncertain(e))
+                self.counts["failed"] += 1
+                continue
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            retry.extend(self._settle(item, response.status_code, body))
+            wait = max(wait, _retry_after(response))
+        return retry, wait
+
+    def _settle(self, item: _Pending, status_code: int, body: Any) -> List[tuple]:
+        """Entrega el resultado de una entrada, o la devuelve para reintentarla"""
+        if status_code < 400 and isinstance(body, dict):
+            item.resolve(_published(item.post_type, body))
+            self.counts["published"] += 1
+            return []
+        error = WordPressPublishError(status_code, _error_detail(status_code, body))
+        if _retryable(status_code):
+            return [(item, error)]
+        item.fail(error)
+        self.counts["failed"] += 1
+        return []
+
+    def _whole_failure(self, items: List[_Pending],
+                       response: "httpx.Response") -> Tuple[List[tuple], float]:
+        """El lote entero falló (credenciales, límite de peticiones, error del servidor)"""
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        retry = []
+        for item in items:
+            retry.extend(self._settle(item, response.status_code, body))
+        return retry, _retry_after(response)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sites": len({site.base_url for site in self._sites.values()}),
+            "queued": sum(site.queue.qsize() for site in self._sites.values()),
+            "in_flight": sum(len(batch) for batch in self._batches.values()),
+            **self.counts,
+        }
+
+    async def close(self) -> None:
+        """Detiene los envíos y rechaza lo que quedaba pendiente"""
+        error = WordPressPublishError(503, "El servicio de publicación se ha detenido")
+        tasks: Set[asyncio.Task] = set(self._batches)
+        for site in self._sites.values():
+            if site.task is not None:
+                tasks.add(site.task)
+            while not site.queue.empty():
+                site.queue.get_nowait().fail(error)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._sites, self._slots, self._batches = {}, {}, {}
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+wordpress_publisher = WordPressPublisher()
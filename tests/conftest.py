@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Los datos persistentes de las pruebas van a un directorio temporal
+os.environ.setdefault("ECDOTICA_DATA_DIR", tempfile.mkdtemp(prefix="ecdotica-tests-"))
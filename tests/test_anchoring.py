@@ -0,0 +1,96 @@
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.blockchain.anchoring import (
+    AnchorBackend, AnchorService, LocalChain, build_merkle_tree, verify_proof
+)
+
+client = TestClient(app)
+
+
+def digest(i):
+    return hashlib.sha256(str(i).encode()).hexdigest()
+
+
+def test_every_proof_verifies_and_tampering_fails():
+    for count in (1, 2, 3, 7, 64, 101):
+        hashes = [digest(i) for i in range(count)]
+        root, proofs = build_merkle_tree(hashes)
+        for h, proof in zip(hashes, proofs):
+            assert verify_proof(h, proof, root)
+            assert len(proof) <= count.bit_length()
+        assert not verify_proof(digest("otro"), proofs[0], root)
+
+
+def test_batches_are_anchored_by_size(tmp_path):
+    chain = LocalChain(str(tmp_path / "chain.sqlite3"))
+    service = AnchorService(chain, str(tmp_path / "anchors.sqlite3"), batch_size=10)
+    for i in range(25):
+        service.submit(digest(i))
+    assert service.pending_count() == 5
+    assert service.verify(digest(24))["status"] == "pending"
+
+    document = service.verify(digest(3))
+    assert document["verified"] and document["batch_size"] == 10
+    assert chain.lookup(document["transaction_hash"])["root"] == document["merkle_root"]
+
+
+class FailingChain(AnchorBackend):
+    def anchor(self, root, metadata):
+        raise ConnectionError("red no disponible")
+
+
+def test_failed_anchor_keeps_documents_pending(tmp_path):
+    service = AnchorService(FailingChain(), str(tmp_path / "anchors.sqlite3"))
+    service.submit(digest(1))
+    with pytest.raises(ConnectionError):
+        service.seal()
+    assert service.pending_count() == 1
+
+
+def test_register_and_verify_endpoints():
+    document_hash = digest("manuscrito")
+    response = client.post("/api/v1/blockchain/register", json={"document_hash": document_hash})
+    assert response.status_code == 200
+    assert response.json()["status"] == "pending"
+
+    assert client.post("/api/v1/blockchain/anchor").json()["status"] == "anchored"
+    verified = client.get(f"/api/v1/blockchain/verify/{document_hash}").json()
+    assert verified["verified"] and verified["transaction_hash"].startswith("0x")
+
+    assert client.get(f"/api/v1/blockchain/verify/{digest('nada')}").status_code == 404
+    assert client.post(
+        "/api/v1/blockchain/register", json={"document_hash": "xyz"}
+    ).status_code == 400
+
+
+class CrashingChain(AnchorBackend):
+    """Simula que el proceso muere mientras espera el recibo"""
+
+    def anchor(self, root, metadata):
+        raise KeyboardInterrupt
+
+
+def test_batches_left_unanchored_by_a_crash_are_resumed(tmp_path):
+    path = str(tmp_path / "anchors.sqlite3")
+    crashed = AnchorService(CrashingChain(), path, batch_size=3)
+    crashed.submit(digest(1))
+    crashed.submit(digest(2))
+    with pytest.raises(KeyboardInterrupt):
+        crashed.submit(digest(3))
+    # Los documentos quedaron en un lote sellado pero sin anclar
+    assert crashed.pending_count() == 0
+    assert crashed.status(digest(1))["status"] == "pending"
+
+    restarted = AnchorService(LocalChain(str(tmp_path / "chain.sqlite3")), path)
+    assert restarted.resume_pending() == 1
+    assert all(restarted.verify(digest(i))["verified"] for i in (1, 2, 3))
+
+
+def test_register_keeps_document_pending_when_anchoring_fails(tmp_path):
+    service = AnchorService(FailingChain(), str(tmp_path / "anchors.sqlite3"), batch_size=1)
+    assert service.submit(digest(1))["status"] == "pending"
+    assert service.pending_count() == 1
@@ -0,0 +1,53 @@
+import json
+import zipfile
+from io import BytesIO
+
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from tests.test_pdf_extraction import make_pdf
+
+client = TestClient(app)
+
+
+def manuscript_pdf(label):
+    return make_pdf([f"Oracion {i} del manuscrito {label} para el concurso." for i in range(12)])
+
+
+def read_lines(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_batch_streams_one_line_per_file():
+    files = [
+        ("files", ("uno.pdf", manuscript_pdf("uno"), "application/pdf")),
+        ("files", ("dos.pdf", manuscript_pdf("dos"), "application/pdf")),
+        ("files", ("notas.txt", b"texto plano", "text/plain")),
+    ]
+    response = client.post("/api/v1/manuscripts/batch", files=files, params={"genre": "cuento"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = {line["file_info"]["filename"]: line for line in read_lines(response)}
+    assert set(lines) == {"uno.pdf", "dos.pdf", "notas.txt"}
+    assert lines["uno.pdf"]["status"] == "received"
+    assert lines["uno.pdf"]["genre"] == "cuento"
+    assert lines["uno.pdf"]["full_analysis"]["sentence_count"] == 12
+    assert lines["notas.txt"]["status"] == "error"
+    assert lines["notas.txt"]["status_code"] == 400
+
+
+def test_batch_accepts_zip_archives():
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("concurso/a.pdf", manuscript_pdf("a"))
+        zf.writestr("concurso/b.pdf", manuscript_pdf("b"))
+        zf.writestr("concurso/leeme.txt", "ignorado")
+        zf.writestr("__MACOSX/concurso/._a.pdf", b"basura")
+    response = client.post(
+        "/api/v1/manuscripts/batch",
+        files=[("files", ("concurso.zip", archive.getvalue(), "application/zip"))]
+    )
+    lines = read_lines(response)
+    assert sorted(line["file_info"]["filename"] for line in lines) == ["concurso/a.pdf", "concurso/b.pdf"]
+    assert all(line["status"] == "received" for line in lines)
@@ -0,0 +1,41 @@
+from benchmarks.corpus import build_corpus, generate_manuscript, generate_text
+from benchmarks.run import compare, percentile, run_case
+from src.api.main import (
+    GENRE_CRITERIA, analyze_text_quality, extract_text_from_docx, extract_text_from_pdf
+)
+
+
+def test_corpus_matches_genre_sizes_and_round_trips():
+    corpus = build_corpus(genres=("cuento",))
+    text = corpus["cuento"]["txt"].decode("utf-8")
+    words = analyze_text_quality(text).word_count
+    assert words == GENRE_CRITERIA["cuento"]["ideal_words"]
+    assert generate_manuscript("cuento") == text
+    assert analyze_text_quality(extract_text_from_pdf(corpus["cuento"]["pdf"])).word_count == words
+    assert analyze_text_quality(extract_text_from_docx(corpus["cuento"]["docx"])).word_count == words
+
+    novel = generate_text(8000, seed=1, chapters=4)
+    assert [line for line in novel.split("\n\n") if line.startswith("Capítulo")] == [
+        "Capítulo 1", "Capítulo 2", "Capítulo 3", "Capítulo 4"
+    ]
+
+
+def test_percentiles_and_regression_check():
+    assert percentile([4, 1, 3, 2], 50) == 2.5
+    assert percentile([1, 2, 3, 4, 5], 100) == 5
+
+    baseline = {"analyze:cuento": {"p50_ms": 10.0, "peak_rss_mb": 80.0}}
+    fine = {"case": "analyze", "genre": "cuento", "p50_ms": 12.0, "peak_rss_mb": 81.0}
+    slow = dict(fine, p50_ms=20.0)
+    assert compare([fine], baseline, tolerance=0.25) == []
+    assert len(compare([slow], baseline, tolerance=0.25)) == 1
+    # Dentro de la variación observada al guardar la línea base
+    noisy = {"analyze:cuento": {"p50_ms": 10.0, "p95_ms": 22.0, "peak_rss_mb": 80.0}}
+    assert compare([slow], noisy, tolerance=0.25) == []
+
+
+def test_run_case_reports_throughput():
+    result = run_case("analyze", "cuento", repeat=2)
+    assert result["words"] == GENRE_CRITERIA["cuento"]["ideal_words"]
+    assert result["p50_ms"] > 0 and result["p99_ms"] >= result["p50_ms"]
+    assert result["words_per_second"] > 0 and result["peak_rss_mb"] > 0
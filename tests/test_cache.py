@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+
+from src.api.main import analysis_cache, app
+from src.utils.cache import AnalysisCache, sha256_text
+from src.nlp.streaming import StreamingTextAnalyzer, iter_text_chunks
+from tests.test_pdf_extraction import make_pdf
+
+client = TestClient(app)
+
+
+def test_disk_tier_survives_memory_eviction(tmp_path):
+    cache = AnalysisCache(version="1", path=str(tmp_path / "cache.sqlite3"), memory_bytes=20)
+    cache.put("a", {"valor": 1})
+    cache.put("b", {"valor": 2})
+    assert cache.stats()["memory_entries"] == 1
+    assert cache.get("b") == {"valor": 2}
+    assert cache.get("a") == {"valor": 1}
+    assert cache.get("c") is None
+    assert (cache.memory_hits, cache.disk_hits, cache.misses) == (1, 1, 1)
+
+
+def test_new_version_discards_old_entries(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    AnalysisCache(version="1", path=path).put("a", {"valor": 1})
+    assert AnalysisCache(version="1", path=path).get("a") == {"valor": 1}
+    assert AnalysisCache(version="2", path=path).get("a") is None
+
+
+def test_disk_eviction_keeps_recent_entries(tmp_path):
+    cache = AnalysisCache(version="1", path=str(tmp_path / "cache.sqlite3"), disk_bytes=40)
+    for key in ("a", "b", "c"):
+        cache.put(key, {"valor": key * 5})
+    cache.clear_memory()
+    assert cache.get("a") is None
+    assert cache.get("c") == {"valor": "ccccc"}
+
+
+def test_streaming_digest_matches_normalized_text():
+    text = "\n  Texto del manuscrito.\n\nSegundo párrafo.   \n"
+    stats = StreamingTextAnalyzer().feed_all(iter_text_chunks(text, 3)).finish()
+    assert stats.text_sha256 == sha256_text(text)
+
+
+def test_repeated_upload_is_served_from_cache():
+    pdf = make_pdf([f"Oracion de prueba para la cache del manuscrito {i}." for i in range(8)])
+    first = client.post("/api/v1/manuscripts/upload", files={"file": ("a.pdf", pdf, "application/pdf")})
+    hits = analysis_cache.memory_hits
+    second = client.post("/api/v1/manuscripts/upload", files={"file": ("b.pdf", pdf, "application/pdf")})
+    assert analysis_cache.memory_hits == hits + 1
+    assert first.json()["full_analysis"] == second.json()["full_analysis"]
@@ -0,0 +1,72 @@
+import random
+
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.nlp.collation import align, collate
+
+client = TestClient(app)
+
+
+def test_align_covers_both_sequences():
+    rng = random.Random(3)
+    for _ in range(200):
+        a = [rng.randint(0, 8) for _ in range(rng.randint(0, 200))]
+        b = list(a)
+        for _ in range(rng.randint(0, 10)):
+            position = rng.randint(0, len(b))
+            if rng.random() < 0.5:
+                b.insert(position, rng.randint(0, 12))
+            elif b:
+                b[min(position, len(b) - 1)] = rng.randint(0, 12)
+        i = j = 0
+        for tag, i1, i2, j1, j2 in align(a, b, small_gap=rng.choice([0, 40_000])):
+            assert (i1, j1) == (i, j)
+            if tag == "equal":
+                assert a[i1:i2] == b[j1:j2]
+            i, j = i2, j2
+        assert (i, j) == (len(a), len(b))
+
+
+def test_apparatus_groups_readings_by_witness():
+    result = collate([
+        ("A", "En un lugar de la Mancha, de cuyo nombre no quiero acordarme."),
+        ("B", "En un lugar de la Mancha de cuyo nombre no quise acordarme."),
+        ("C", "En algún lugar de la Mancha, de cuyo nombre no quiero acordarme, vivía."),
+    ])
+    units = {unit["lemma"]: unit for unit in result["apparatus"]}
+    assert set(units) == {"un", ",", "quiero", ""}
+    assert units["quiero"]["lemma_witnesses"] == ["A", "C"]
+    [variant] = units["quiero"]["variants"]
+    assert variant["text"] == "quise" and variant["witnesses"] == ["B"]
+    assert units[","]["variants"][0]["type"] == "omission"
+    assert units[""]["variants"][0] == {
+        "text": ", vivía", "type": "addition", "witnesses": ["C"], "offsets": {"C": [63, 70]}
+    }
+
+
+def test_collate_long_repetitive_witnesses():
+    rng = random.Random(7)
+    words = [rng.choice(["de", "la", "que", "el", "en", "y"]) for _ in range(30_000)]
+    copy = list(words)
+    for position in rng.sample(range(len(copy)), 50):
+        copy[position] = "variante"
+    result = collate([("A", " ".join(words)), ("B", " ".join(copy))])
+    assert result["variant_count"] <= 50
+    assert result["agreement"]["B"] > 0.99
+
+
+def test_collate_endpoint_validates_witnesses():
+    response = client.post("/api/v1/text/collate", json={
+        "witnesses": [{"siglum": "A", "text": "uno dos"}, {"siglum": "A", "text": "uno tres"}]
+    })
+    assert response.status_code == 400
+
+    response = client.post("/api/v1/text/collate", json={
+        "witnesses": [{"siglum": "A", "text": "uno dos"}, {"siglum": "B", "text": "Uno tres"}],
+        "base": "B",
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert data["base"] == "B"
+    assert data["apparatus"][0]["lemma"] == "tres"
@@ -0,0 +1,101 @@
+import zipfile
+from io import BytesIO
+
+import pytest
+from docx import Document
+from fastapi import HTTPException
+
+from src.api.main import extract_text_from_docx
+from src.utils.docx_extraction import iter_docx_paragraphs
+
+NAMESPACES = (
+    'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+)
+RELS = (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="word/document.xml" Type="http://schemas.openxmlformats.org/'
+    'officeDocument/2006/relationships/officeDocument"/></Relationships>'
+)
+
+
+def _paragraph(text):
+    return f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+def _package(parts):
+    output = BytesIO()
+    with zipfile.ZipFile(output, "w") as archive:
+        archive.writestr("_rels/.rels", RELS)
+        for name, xml in parts.items():
+            archive.writestr(name, xml)
+    return output.getvalue()
+
+
+def test_includes_tables_headers_and_footers_in_reading_order():
+    doc = Document()
+    doc.add_paragraph("Primer párrafo del cuerpo.")
+    table = doc.add_table(rows=2, cols=2)
+    for row in range(2):
+        for col in range(2):
+            table.cell(row, col).text = f"Celda {row}-{col}"
+    doc.add_paragraph("Último párrafo.")
+    doc.sections[0].header.paragraphs[0].text = "Encabezado de página"
+    doc.sections[0].footer.paragraphs[0].text = "Pie de página"
+    output = BytesIO()
+    doc.save(output)
+
+    assert list(iter_docx_paragraphs(output.getvalue())) == [
+        "Encabezado de página",
+        "Primer párrafo del cuerpo.",
+        "Celda 0-0", "Celda 0-1", "Celda 1-0", "Celda 1-1",
+        "Último párrafo.",
+        "Pie de página",
+    ]
+
+
+def test_footnotes_runs_and_text_boxes():
+    body = (
+        f"<w:document {NAMESPACES}><w:body>"
+        "<w:p><w:r><w:t>Uno</w:t><w:tab/><w:t xml:space=\"preserve\">dos </w:t>"
+        "<w:br/><w:t>tres</w:t></w:r><w:del><w:r><w:delText>borrado</w:delText></w:r></w:del>"
+        "<w:ins><w:r><w:t> insertado</w:t></w:r></w:ins></w:p>"
+        "<w:p><w:r><mc:AlternateContent><mc:Choice><w:drawing><w:txbxContent>"
+        f"{_paragraph('Cuadro')}</w:txbxContent></w:drawing></mc:Choice>"
+        f"<mc:Fallback><w:pict><w:txbxContent>{_paragraph('Cuadro')}</w:txbxContent></w:pict>"
+        "</mc:Fallback></mc:AlternateContent></w:r><w:r><w:t> de texto</w:t></w:r></w:p>"
+        "<w:p/>"
+        "</w:body></w:document>"
+    )
+    footnotes = (
+        f"<w:footnotes {NAMESPACES}>"
+        "<w:footnote w:type=\"separator\"><w:p><w:r><w:separator/></w:r></w:p></w:footnote>"
+        f"<w:footnote w:id=\"1\">{_paragraph('Una nota al pie.')}</w:footnote>"
+        "</w:footnotes>"
+    )
+    content = _package({"word/document.xml": body, "word/footnotes.xml": footnotes})
+
+    assert list(iter_docx_paragraphs(content)) == [
+        "Uno\tdos \ntres insertado", "Cuadro de texto", "Una nota al pie."
+    ]
+    assert extract_text_from_docx(content) == (
+        "Uno\tdos \ntres insertado\n\nCuadro de texto\n\nUna nota al pie."
+    )
+
+
+def test_main_part_is_read_from_package_relationships():
+    rels = RELS.replace("word/document.xml", "word/document2.xml")
+    output = BytesIO()
+    with zipfile.ZipFile(output, "w") as archive:
+        archive.writestr("_rels/.rels", rels)
+        archive.writestr(
+            "word/document2.xml",
+            f"<w:document {NAMESPACES}><w:body>{_paragraph('Parte renombrada')}</w:body></w:document>"
+        )
+    assert list(iter_docx_paragraphs(output.getvalue())) == ["Parte renombrada"]
+
+
+def test_invalid_document_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        extract_text_from_docx(b"esto no es un docx")
+    assert error.value.status_code == 400
@@ -0,0 +1,115 @@
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.nlp.entities import extract_chapter, find_inconsistencies, split_chapters
+
+SAMPLE = """Capítulo 1
+
+En el verano de 1936, María Salgado llegó a Sevilla. Tenía veinte años y los ojos verdes \
+de su madre. Su hermano Tomás, nacido en Cádiz, la esperaba en la estación.
+
+Cuando María bajó del tren, Tomás sonrió. El pelo rubio de Tomás brillaba.
+
+Capítulo II
+
+Pasaron los años. En 1950 María volvió a Madrid. Tenía cuarenta años. Sus ojos azules \
+miraban la ciudad.
+
+Tomás Salgado, natural de Cádiz, tenía el pelo negro.
+"""
+
+
+def book(chapters):
+    return "\n\n".join(f"Capítulo {number}\n\n{text}" for number, text in chapters.items())
+
+
+def filler(number):
+    return (f"Elena Ruiz escribió la carta número {number} junto a la ventana. "
+            "Después salió al jardín y esperó la respuesta durante toda la tarde.")
+
+
+def test_finds_attribute_and_timeline_conflicts():
+    chapters = [
+        {"chapter": key, "title": title, **extract_chapter(text)}
+        for key, title, text in split_chapters(SAMPLE)
+    ]
+    result = find_inconsistencies(chapters)
+
+    assert [c["chapter"] for c in chapters] == ["1", "2"]
+    messages = [i["message"] for i in result["inconsistencies"]]
+    assert any("María Salgado" in m and "verde" in m and "azul" in m for m in messages)
+    assert any("Tomás Salgado" in m and "rubio" in m and "negro" in m for m in messages)
+    timeline = [i for i in result["inconsistencies"] if i["type"] == "timeline"]
+    assert timeline and timeline[0]["entity"] == "María Salgado"
+
+    labels = {e["name"]: e["label"] for e in result["entities"]}
+    assert labels["Sevilla"] == labels["Cádiz"] == "LOC"
+    assert labels["María Salgado"] == labels["Tomás Salgado"] == "PER"
+
+
+def test_names_ending_like_verbs_at_sentence_start_are_kept():
+    lucia = extract_chapter("Lucía tenía los ojos verdes. Lucía miraba el mar.")
+    assert lucia["mentions"]["Lucía"]["count"] == 2
+    assert [(a["entity"], a["value"]) for a in lucia["attributes"]] == [("Lucía", "verde")]
+    # Los verbos al principio de la oración siguen sin contar como nombres
+    assert extract_chapter("Tenía los ojos verdes. Pasaron los años.")["mentions"] == {}
+
+    chapters = {number: filler(number) for number in range(1, 21)}
+    chapters[3] = "María tenía los ojos verdes. María miraba el mar desde el puerto."
+    chapters[17] = "María, con sus ojos azules, volvió al puerto aquella mañana."
+    chapters = [
+        {"chapter": key, "title": title, **extract_chapter(text)}
+        for key, title, text in split_chapters(book(chapters))
+    ]
+    conflict, = find_inconsistencies(chapters)["inconsistencies"]
+    assert conflict["entity"] == "María"
+    assert {v["value"] for v in conflict["values"]} == {"verde", "azul"}
+
+
+def test_edits_reindex_only_the_changed_chapters():
+    chapters = {number: filler(number) for number in range(1, 21)}
+    chapters[3] = "Lucía Ferrer tenía los ojos grises y miraba el mar desde el puerto."
+
+    with TestClient(app) as client:
+        first = client.post("/api/v1/review/consistency-check",
+                            json={"manuscript_id": "novela-1", "text": book(chapters)})
+        assert first.status_code == 200
+        assert first.json()["chapters"]["reindexed"] == 20
+        assert first.json()["inconsistencies"] == []
+
+        edited = client.post("/api/v1/review/consistency-check", json={
+            "manuscript_id": "novela-1",
+            "chapters": [{"chapter": "17", "text": "Lucía Ferrer, con sus ojos castaños, "
+                                                  "volvió al puerto aquella mañana."}]
+        })
+        assert edited.status_code == 200
+        data = edited.json()
+        assert data["chapters"] == {"total": 20, "reindexed": 1, "reused": 19, "removed": 0}
+        conflict, = data["inconsistencies"]
+        assert conflict["entity"] == "Lucía Ferrer"
+        chapters_by_value = {
+            v["value"]: [o["chapter"] for o in v["occurrences"]] for v in conflict["values"]
+        }
+        assert chapters_by_value == {"gris": ["3"], "castaño": ["17"]}
+
+        # Al retirar el capítulo 17 desaparece el conflicto sin reindexar nada
+        removed = client.post("/api/v1/review/consistency-check", json={
+            "manuscript_id": "novela-1", "removed_chapters": ["17"]
+        }).json()
+        assert removed["chapters"]["reindexed"] == 0
+        assert removed["chapters"]["total"] == 19
+        assert removed["inconsistencies"] == []
+
+
+def test_consistency_check_requires_text_or_manuscript():
+    with TestClient(app) as client:
+        empty = client.post("/api/v1/review/consistency-check", json={"context": "novela"})
+        loose = client.post("/api/v1/review/consistency-check",
+                            json={"chapters": [{"chapter": "1", "text": "Hola."}]})
+        oneshot = client.post("/api/v1/review/consistency-check", json={"text": SAMPLE})
+
+    assert empty.status_code == 400
+    assert loose.status_code == 400
+    assert oneshot.status_code == 200
+    assert oneshot.json()["manuscript_id"] is None
+    assert len(oneshot.json()["inconsistencies"]) == 3
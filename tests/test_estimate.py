@@ -0,0 +1,127 @@
+import random
+from io import BytesIO
+
+from fastapi.testclient import TestClient
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+from src.api.main import app
+from src.utils.pdf_extraction import stratified_sample
+from tests.test_pdf_extraction import make_pdf
+
+client = TestClient(app)
+
+
+def make_scanned_pdf(page_count):
+    """PDF cuyas páginas son solo una imagen, sin capa de texto"""
+    writer = PdfWriter()
+    for _ in range(page_count):
+        page = writer.add_blank_page(width=612, height=792)
+        image = DecodedStreamObject()
+        image.set_data(b"\x80")
+        image.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(1),
+            NameObject("/Height"): NumberObject(1),
+            NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+        })
+        images = DictionaryObject({NameObject("/Im1"): writer._add_object(image)})
+        page[NameObject("/Resources")] = DictionaryObject({NameObject("/XObject"): images})
+        content = DecodedStreamObject()
+        content.set_data(b"q 612 0 0 792 0 0 cm /Im1 Do Q")
+        page[NameObject("/Contents")] = writer._add_object(content)
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def novel_pages(page_count):
+    generator = random.Random(3)
+    return [
+        " ".join(
+            f"Frase {j} de la pagina {i} con " + "palabra " * generator.randint(3, 25) + "final."
+            for j in range(generator.randint(2, 8))
+        )
+        for i in range(page_count)
+    ]
+
+
+def estimate(content, filename="grande.pdf", **params):
+    return client.post(
+        "/api/v1/manuscripts/estimate",
+        files={"file": (filename, content, "application/pdf")},
+        params=params
+    )
+
+
+def test_stratified_sample_takes_one_page_per_stretch():
+    pages = stratified_sample(900, 40, random.Random(1))
+    assert len(pages) == 40
+    assert all(round(i * 22.5) <= page < round((i + 1) * 22.5) for i, page in enumerate(pages))
+    assert stratified_sample(10, 40, random.Random(1)) == list(range(10))
+
+
+def test_estimate_brackets_the_full_analysis():
+    pages = novel_pages(300)
+    pdf = make_pdf(pages)
+    words = sum(len(page.split()) for page in pages)
+
+    response = estimate(pdf, sample_pages=30, seed=5, genre="novela")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["exact"] is False
+    assert data["sampling"]["page_count"] == 300
+    assert len(data["sampling"]["sampled_pages"]) == 30
+    assert data["sampling"]["likely_scanned"] is False
+    interval = data["confidence_intervals"]["word_count"]
+    assert interval["low"] <= words <= interval["high"]
+    assert interval["estimate"] == data["estimate"]["word_count"]
+    assert data["evaluation"] == "demasiado_corto"
+
+    # Con el análisis completo ya hecho, la estimación es exacta
+    uploaded = client.post("/api/v1/manuscripts/upload",
+                           files={"file": ("grande.pdf", pdf, "application/pdf")})
+    exact = estimate(pdf).json()
+    assert exact["exact"] is True
+    assert exact["estimate"] == uploaded.json()["full_analysis"]
+    assert exact["confidence_intervals"]["word_count"]["low"] == words
+
+
+def test_scanned_pdf_is_flagged_after_a_few_pages():
+    data = estimate(make_scanned_pdf(200)).json()
+
+    assert data["sampling"]["likely_scanned"] is True
+    assert data["sampling"]["stopped_early"] is True
+    assert len(data["sampling"]["sampled_pages"]) == 5
+    assert data["sampling"]["scanned_pages"] == data["sampling"]["sampled_pages"]
+    assert data["estimate"]["word_count"] == 0
+    assert "escaneado" in data["message"]
+
+
+def test_estimate_rejects_other_formats_and_bad_sample_sizes():
+    assert estimate(b"PK\x03\x04", filename="texto.docx").status_code == 400
+    assert estimate(make_pdf(["Una pagina."]), sample_pages=1).status_code == 400
+
+
+def test_census_matches_the_full_analysis_across_page_breaks():
+    # Las oraciones cruzan los saltos de página y la última queda abierta
+    words = " ".join(
+        f"Frase {i} sobre la pagina y " + "palabra " * (i % 9) + "fin." for i in range(120)
+    ).split() + ["sin", "punto"]
+    pages = [" ".join(words[start:start + 37]) for start in range(0, len(words), 37)]
+    pdf = make_pdf(pages)
+
+    census = estimate(pdf, sample_pages=len(pages) + 5).json()
+    full = client.post("/api/v1/manuscripts/upload",
+                       files={"file": ("censo.pdf", pdf, "application/pdf")}).json()
+
+    assert census["exact"] is False
+    for name in ("word_count", "sentence_count", "paragraph_count",
+                 "avg_words_per_sentence", "complex_word_ratio"):
+        interval = census["confidence_intervals"][name]
+        assert census["estimate"][name] == full["full_analysis"][name]
+        assert interval["low"] == interval["high"] == interval["estimate"]
+    assert census["estimate"]["sentence_count"] == 121
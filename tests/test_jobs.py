@@ -0,0 +1,96 @@
+import asyncio
+import os
+import socket
+import time
+
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.utils.jobs import COMPLETED, PROCESSING, QUEUED, JobRunner, JobStore
+from tests.test_pdf_extraction import make_pdf
+
+
+def wait_for_status(client, manuscript_id, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/api/v1/manuscripts/{manuscript_id}/status").json()
+        if status["status"] not in (QUEUED, PROCESSING):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"El trabajo {manuscript_id} no terminó a tiempo")
+
+
+def test_async_upload_returns_queued_and_completes():
+    pdf = make_pdf([f"Oracion numero {i} del manuscrito encolado para analisis." for i in range(5)])
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/v1/manuscripts/upload-async",
+            files={"file": ("cola.pdf", pdf, "application/pdf")},
+            params={"title": "En cola"}
+        )
+        assert response.status_code == 202
+        queued = response.json()
+        assert queued["status"] == QUEUED
+
+        status = wait_for_status(client, queued["manuscript_id"])
+        assert status["status"] == COMPLETED
+        assert status["progress"] == {"pages_extracted": 5, "words_analyzed": 40}
+        assert status["result"]["title"] == "En cola"
+        assert status["result"]["full_analysis"]["word_count"] == 40
+
+
+def test_unknown_manuscript_status_is_404():
+    with TestClient(app) as client:
+        assert client.get("/api/v1/manuscripts/no-existe/status").status_code == 404
+
+
+def test_interrupted_jobs_resume_after_restart(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    for job_id in ("otro-host", "mismo-pid", "vivo"):
+        store.create(job_id, "echo", {"valor": job_id})
+        store.claim_next()
+    # Procesos que murieron con el trabajo a medias: el de otro dyno y el de
+    # una instancia anterior con el mismo host y pid (pid 1 en un contenedor)
+    store.db.execute("UPDATE jobs SET owner = 'dyno-viejo:1:a1' WHERE id = 'otro-host'")
+    store.db.execute(
+        "UPDATE jobs SET owner = ? WHERE id = 'mismo-pid'",
+        (f"{socket.gethostname()}:{os.getpid()}:antiguo",)
+    )
+    # Una instancia viva que comparte la base de datos conserva su trabajo
+    store.db.execute("UPDATE jobs SET owner = 'otro-worker:7:b2' WHERE id = 'vivo'")
+    store.db.execute(
+        "INSERT INTO instances (owner, heartbeat_at) VALUES ('otro-worker:7:b2', ?)",
+        (time.time(),)
+    )
+
+    async def echo(job):
+        return job["payload"]
+
+    async def restart():
+        runner = JobRunner(JobStore(store.path), concurrency=2)
+        runner.register("echo", echo)
+        runner.start()
+        for _ in range(100):
+            if all(store.get(i)["status"] == COMPLETED for i in ("otro-host", "mismo-pid")):
+                break
+            await asyncio.sleep(0.01)
+        await runner.stop()
+
+    asyncio.run(restart())
+    assert store.get("otro-host")["result"] == {"valor": "otro-host"}
+    assert store.get("mismo-pid")["result"] == {"valor": "mismo-pid"}
+    assert store.get("vivo")["status"] == PROCESSING
+
+
+def test_jobs_of_an_instance_that_stops_beating_are_requeued(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.05)
+    store.create("colgado", "echo", {})
+    store.claim_next()
+    store.db.execute("UPDATE jobs SET owner = 'muerto:3:c3' WHERE id = 'colgado'")
+    store.db.execute("INSERT INTO instances (owner, heartbeat_at) VALUES ('muerto:3:c3', ?)",
+                     (time.time(),))
+    assert store.requeue_orphans() == 0
+
+    time.sleep(0.1)
+    assert store.requeue_orphans() == 1
+    assert store.get("colgado")["status"] == QUEUED
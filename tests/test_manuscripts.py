@@ -0,0 +1,84 @@
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.utils.manuscripts import ManuscriptStore
+
+client = TestClient(app)
+
+CONTENT = (
+    "La editorial recibe manuscritos de autores noveles. Cada texto se analiza con cuidado. "
+    "Los editores revisan el estilo y la estructura antes de decidir."
+)
+
+
+def fill(store, count):
+    for i in range(count):
+        store.add(
+            f"m{i:05d}", f"Título {i}", "text",
+            analysis={"word_count": 1000 + i, "quality_score": i % 100},
+            genre="novela" if i % 3 == 0 else "cuento",
+            submitted_at=f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}.{i:06d}"
+        )
+
+
+def test_keyset_pagination_visits_every_match_once(tmp_path):
+    store = ManuscriptStore(str(tmp_path / "m.sqlite3"), batch_size=50)
+    fill(store, 730)
+
+    for sort in ("submitted_at", "quality_score"):
+        seen, cursor = [], None
+        while True:
+            page = store.list(genre="novela", sort=sort, limit=40, cursor=cursor)
+            seen.extend(item["manuscript_id"] for item in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert len(seen) == len(set(seen)) == 244
+        values = [store.get(m)[sort] for m in seen]
+        assert values == sorted(values, reverse=True)
+
+    page = store.list(min_score=90, max_score=95, sort="quality_score", descending=False)
+    assert {item["quality_score"] for item in page["items"]} == set(range(90, 96))
+
+
+def test_listing_uses_indexes(tmp_path):
+    store = ManuscriptStore(str(tmp_path / "m.sqlite3"))
+    fill(store, 10)
+    store.flush()
+    plan = store.db.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM manuscripts WHERE status = ?"
+        " AND (submitted_at, id) < (?, ?) ORDER BY submitted_at DESC, id DESC LIMIT 50",
+        ("received", "2024", "x")
+    ).fetchall()
+    detail = " ".join(row[-1] for row in plan)
+    assert "idx_manuscripts_status" in detail and "SCAN manuscripts" not in detail
+
+
+def test_submission_and_decision_are_persisted():
+    response = client.post("/api/v1/manuscripts/submit", json={
+        "title": "Persistente", "author": "Ana", "email": "ana@example.com",
+        "content": CONTENT, "genre": "ensayo"
+    })
+    manuscript_id = response.json()["manuscript_id"]
+
+    response = client.get(f"/api/v1/manuscripts/{manuscript_id}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "received"
+    assert response.json()["genre"] == "ensayo"
+
+    response = client.post("/api/v1/manuscripts/decision", json={
+        "manuscript_id": manuscript_id, "decision": "accepted", "reviewer_notes": "Muy bien"
+    })
+    assert response.status_code == 200
+
+    manuscript = client.get(f"/api/v1/manuscripts/{manuscript_id}").json()
+    assert manuscript["status"] == "accepted"
+    assert manuscript["decisions"][0]["reviewer_notes"] == "Muy bien"
+
+    listed = client.get("/api/v1/manuscripts", params={"status": "accepted", "genre": "ensayo"})
+    assert manuscript_id in [item["manuscript_id"] for item in listed.json()["items"]]
+
+    response = client.post("/api/v1/manuscripts/decision", json={
+        "manuscript_id": "no-existe", "decision": "accepted"
+    })
+    assert response.status_code == 404
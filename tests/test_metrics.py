@@ -0,0 +1,88 @@
+from io import BytesIO
+
+from docx import Document
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.utils.metrics import MetricsRegistry, SlowRequestProfiler, metrics, slow_request_profiler
+
+client = TestClient(app)
+
+
+def _docx(paragraphs):
+    doc = Document()
+    for paragraph in paragraphs:
+        doc.add_paragraph(paragraph)
+    output = BytesIO()
+    doc.save(output)
+    return output.getvalue()
+
+
+def test_histogram_exposition_is_cumulative():
+    registry = MetricsRegistry()
+    for seconds in (0.001, 0.2, 3.0):
+        registry.observe_stage("extract", seconds, bytes=100, words=50)
+    text = registry.render()
+    assert '# TYPE ecdotica_stage_duration_seconds histogram' in text
+    assert 'ecdotica_stage_duration_seconds_bucket{stage="extract",le="0.005"} 1' in text
+    assert 'ecdotica_stage_duration_seconds_bucket{stage="extract",le="0.25"} 2' in text
+    assert 'ecdotica_stage_duration_seconds_bucket{stage="extract",le="+Inf"} 3' in text
+    assert 'ecdotica_stage_duration_seconds_count{stage="extract"} 3' in text
+    assert 'ecdotica_stage_bytes_total{stage="extract"} 300' in text
+    assert 'ecdotica_stage_words_total{stage="extract"} 150' in text
+
+
+def test_upload_records_every_stage():
+    before = {stage: metrics.stage_seconds.count(stage=stage)
+              for stage in ("read", "extract", "analyze", "serialize")}
+    content = _docx([f"Párrafo número {i} con métricas por etapa del manuscrito." for i in range(40)])
+    response = client.post(
+        "/api/v1/manuscripts/upload", files={"file": ("metricas.docx", content)}
+    )
+    assert response.status_code == 200
+    for stage, count in before.items():
+        assert metrics.stage_seconds.count(stage=stage) == count + 1, stage
+
+    exposition = client.get("/metrics")
+    assert exposition.status_code == 200
+    assert exposition.headers["content-type"].startswith("text/plain")
+    assert ('ecdotica_http_request_duration_seconds_count{method="POST",'
+            'route="/api/v1/manuscripts/upload",status="200"}') in exposition.text
+    assert 'ecdotica_stage_words_per_second_count{stage="analyze"}' in exposition.text
+
+
+def test_slow_requests_are_profiled_when_enabled():
+    threshold = slow_request_profiler.threshold
+    slow_request_profiler.threshold = 1e-9
+    try:
+        assert client.get("/api/v1/manuscripts/quick-eval?word_count=5000").status_code == 200
+    finally:
+        slow_request_profiler.threshold = threshold
+
+    profiles = client.get("/metrics/profiles").json()["profiles"]
+    assert profiles and "quick-eval" in profiles[0]["name"]
+    report = client.get(f"/metrics/profiles/{profiles[0]['name']}")
+    assert report.status_code == 200
+    assert "function calls" in report.text
+    assert client.get("/metrics/profiles/..%2Fsecret.prof").status_code == 404
+
+
+def test_profiles_record_the_requests_that_overlapped(tmp_path):
+    profiler = SlowRequestProfiler(threshold=1e-9, directory=str(tmp_path))
+    profiler.enter()
+    profile = profiler.start()
+    # Otra petición empieza y termina mientras la perfilada espera
+    profiler.enter()
+    assert profiler.start() is None
+    profiler.leave("GET", "/api/v1/manuscripts/quick-eval")
+    name = profiler.finish(profile, 0.5, "POST", "/api/v1/manuscripts/upload")
+
+    assert profiler.list()[0]["concurrent_requests"] == 1
+    report = profiler.report(name)
+    assert report.startswith("Aviso: 1 peticiones concurrentes")
+    assert "GET /api/v1/manuscripts/quick-eval x1" in report
+
+    # Una petición sola no lleva aviso
+    profiler.enter()
+    alone = profiler.finish(profiler.start(), 0.5, "GET", "/solo")
+    assert "Aviso" not in profiler.report(alone)
@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import time
+from io import BytesIO
+
+import pypdf
+import pytest
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from src.api.main import extract_text_from_pdf, stream_text_from_pdf
+from src.utils import pdf_extraction
+from src.utils.pdf_extraction import iter_pdf_pages
+
+
+def make_pdf(pages):
+    """Genera un PDF mínimo con una línea de texto por página"""
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    for text in pages:
+        page = writer.add_blank_page(width=612, height=792)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)})
+        })
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(content)
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+PAGES = [f"Pagina {i} del manuscrito." for i in range(20)]
+
+
+def test_parallel_pages_keep_order():
+    pdf = make_pdf(PAGES)
+    sequential = list(iter_pdf_pages(pdf, workers=1))
+    parallel = list(iter_pdf_pages(pdf, workers=4))
+    assert parallel == sequential
+    assert [p.strip() for p in parallel] == PAGES
+
+
+def test_extract_text_joins_pages():
+    pdf = make_pdf(PAGES[:3])
+    assert extract_text_from_pdf(pdf) == "\n\n".join(PAGES[:3])
+    assert "".join(stream_text_from_pdf(pdf)).strip() == extract_text_from_pdf(pdf)
+
+
+def slow_page(monkeypatch, marker, seconds):
+    """Hace que extraer la página que contiene `marker` tarde `seconds`"""
+    original = pypdf.PageObject.extract_text
+
+    def extract_text(self, *args, **kwargs):
+        text = original(self, *args, **kwargs)
+        if marker in text:
+            time.sleep(seconds)
+        return text
+    monkeypatch.setattr(pypdf.PageObject, "extract_text", extract_text)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_slow_pages_are_cut_from_their_start_and_reported(monkeypatch, workers):
+    slow_page(monkeypatch, "Pagina 7 ", 5)
+    timed_out = []
+    started = time.perf_counter()
+    pages = list(iter_pdf_pages(make_pdf(PAGES), workers=workers, page_timeout=0.5,
+                                on_timeout=timed_out.append))
+
+    assert time.perf_counter() - started < 3
+    assert timed_out == [7]
+    assert pages[7] == ""
+    assert [p.strip() for i, p in enumerate(pages) if i != 7] == PAGES[:7] + PAGES[8:]
+
+
+def test_pdf_workers_share_the_cpu_inside_the_worker_pool(monkeypatch):
+    monkeypatch.setattr(pdf_extraction, "PDF_WORKERS", 0)
+    monkeypatch.setattr(pdf_extraction, "WORKER_PROCESSES", 4)
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    assert pdf_extraction.pdf_workers() == 8
+    monkeypatch.setattr(multiprocessing, "parent_process", lambda: object())
+    assert pdf_extraction.pdf_workers() == 2
+
+
+def test_analysis_reports_timed_out_pages(monkeypatch, tmp_path):
+    from src.api.main import analyze_manuscript_file
+    slow_page(monkeypatch, "Pagina 3 ", 5)
+    monkeypatch.setattr(pdf_extraction, "PDF_PAGE_TIMEOUT", 0.5)
+    path = tmp_path / "lenta.pdf"
+    path.write_bytes(make_pdf(PAGES[:5]))
+
+    result = analyze_manuscript_file(str(path), "pdf")
+    assert result.timed_out_pages == [4]
+    assert any("tiempo agotado (1): 4" in issue for issue in result.analysis.issues)
@@ -0,0 +1,73 @@
+import random
+
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.utils.percentiles import CorpusPercentiles, QuantileSketch, percentile_rank
+
+client = TestClient(app)
+
+SENTENCE = "La editorial recibe manuscritos de autores noveles y los revisa con cuidado. "
+
+
+def test_sketch_ranks_stay_close_to_exact_percentiles():
+    generator = random.Random(7)
+    values = [generator.lognormvariate(10, 1) for _ in range(50000)]
+    first, second = QuantileSketch(seed=1), QuantileSketch(seed=2)
+    for value in values[:25000]:
+        first.add(value)
+    for value in values[25000:]:
+        second.add(value)
+    first.merge(second)
+
+    ordered = sorted(values)
+    assert first.count == 50000
+    # Memoria acotada: unos cientos de elementos para 50.000 valores
+    assert sum(len(level) for level in first.levels) < 1000
+    for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+        assert abs(percentile_rank([first], ordered[int(q * len(ordered))]) - q * 100) < 2
+    assert abs(first.quantile(0.5) - ordered[25000]) / ordered[25000] < 0.05
+
+
+def test_observations_persist_and_merge_across_instances(tmp_path):
+    path = str(tmp_path / "percentiles.sqlite3")
+    one, other = CorpusPercentiles(path), CorpusPercentiles(path)
+    for words in range(100):
+        one.rank_and_observe("Novela", {"word_count": words})
+    for words in range(100, 200):
+        other.rank_and_observe("novela ", {"word_count": words})
+    one.flush()
+    other.flush()
+
+    reopened = CorpusPercentiles(path)
+    ranks = reopened.rank("novela", {"word_count": 150})
+    assert ranks["sample_size"] == 200
+    assert abs(ranks["metrics"]["word_count"] - 75.25) <= 1
+    assert reopened.rank("cuento", {"word_count": 150})["metrics"]["word_count"] is None
+    assert 97 <= reopened.summary("novela")["metrics"]["word_count"]["quantiles"]["p50"] <= 102
+
+
+def test_submissions_report_their_percentile_within_the_genre():
+    ranks = []
+    for sentences in (4, 8, 12, 16):
+        response = client.post("/api/v1/manuscripts/submit", json={
+            "title": f"Percentil {sentences}", "author": "Ana", "email": "ana@example.com",
+            "content": SENTENCE * sentences, "genre": "Crónica"
+        })
+        assert response.status_code == 200
+        ranks.append(response.json()["percentiles"])
+
+    assert ranks[0]["genre"] == "crónica"
+    assert ranks[0]["sample_size"] == 0 and ranks[0]["metrics"]["word_count"] is None
+    # Cada envío es más largo que todos los anteriores del género
+    assert [r["metrics"]["word_count"] for r in ranks[1:]] == [100.0, 100.0, 100.0]
+    assert ranks[3]["sample_size"] == 3
+
+    evaluation = client.get("/api/v1/manuscripts/quick-eval",
+                            params={"word_count": 100, "genre": "crónica"}).json()
+    assert evaluation["corpus_size"] == 4
+    assert evaluation["percentile"] == 50.0
+
+    summary = client.get("/api/v1/corpus/percentiles", params={"genre": "crónica"}).json()
+    assert summary["metrics"]["word_count"]["count"] == 4
+    assert summary["metrics"]["word_count"]["max"] == 192
@@ -0,0 +1,82 @@
+import random
+from collections import Counter
+
+from fastapi.testclient import TestClient
+
+from src.api.main import analyze_text_quality, app
+from src.nlp.phrases import find_repeated_phrases
+from src.nlp.streaming import full_analyzer, iter_text_chunks
+
+client = TestClient(app)
+
+VOCABULARY = ["casa", "perro", "de", "la", "caminaba", "sonrisa", "el", "oscuro", "y"]
+
+
+def test_reports_every_maximal_repeated_phrase():
+    rng = random.Random(5)
+    for _ in range(30):
+        text = " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(0, 200)))
+        tokens = text.split()
+        counts = {
+            n: Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+            for n in range(3, 14)
+        }
+        reported = {p["phrase"]: p for p in find_repeated_phrases(text, limit=10_000)["phrases"]}
+        for phrase in reported.values():
+            assert counts[phrase["words"]][tuple(phrase["phrase"].split())] == phrase["count"]
+            assert all(text[start:end] == phrase["phrase"] for start, end in phrase["offsets"])
+        for n in range(3, 13):
+            for gram, count in counts[n].items():
+                if count < 2 or not any(len(word) > 4 for word in gram):
+                    continue
+                extended = n < 12 and any(
+                    counts[n + 1].get(gram + (w,)) == count or counts[n + 1].get((w,) + gram) == count
+                    for w in VOCABULARY
+                )
+                # O forma parte de una frase informada que se repite casi igual
+                absorbed = any(
+                    phrase["words"] > n and count - phrase["count"] <= 1
+                    and f" {' '.join(gram)} " in f" {phrase['phrase']} "
+                    for phrase in reported.values()
+                )
+                assert extended or absorbed or " ".join(gram) in reported
+
+
+def test_streamed_offsets_match_whole_text():
+    rng = random.Random(9)
+    text = "\n  " + " ".join(rng.choice(VOCABULARY) for _ in range(1500))
+    streamed = full_analyzer().feed_all(iter_text_chunks(text, 41)).finish()
+    assert streamed.phrases.phrases() == find_repeated_phrases(text, limit=20)["phrases"]
+
+
+def test_recycled_phrases_in_analysis_and_endpoint():
+    chapter = "Ella lo miró con una sonrisa triste y cansada. El tren llegaba tarde otra vez. "
+    text = chapter * 4 + "Fin de la historia."
+    analysis = analyze_text_quality(text)
+    top = analysis.repeated_phrases[0]
+    assert top["count"] == 4 and top["phrase"].startswith("ella lo miró")
+    assert any(issue.startswith("Frases repetidas") for issue in analysis.issues)
+
+    response = client.post("/api/v1/text/repeated-phrases", json={
+        "text": text, "options": {"min_words": 3, "max_words": 5}
+    })
+    assert response.status_code == 200
+    assert all(phrase["words"] <= 5 for phrase in response.json()["phrases"])
+
+    for limit in (0, 10_000):
+        response = client.post("/api/v1/text/repeated-phrases", json={
+            "text": text, "options": {"limit": limit}
+        })
+        assert response.status_code == 400
+
+
+def test_prefix_cut_short_by_the_last_occurrence_is_not_reported_twice():
+    refrain = "y se quedaba mirando la ventana para pasar pagina"
+    chapters = " ".join(f"capitulo{i} {refrain}." for i in range(39))
+    text = chapters + " y se quedaba mirando la ventana para pasar"
+    phrases = find_repeated_phrases(text, limit=100)["phrases"]
+    assert [(p["phrase"], p["count"]) for p in phrases] == [(refrain, 39)]
+
+    analysis = analyze_text_quality(text)
+    issue = next(issue for issue in analysis.issues if issue.startswith("Frases repetidas"))
+    assert issue.count("para pasar") == 1
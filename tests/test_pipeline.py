@@ -0,0 +1,33 @@
+from src.nlp.pipeline import (
+    disabled_components, iter_paragraph_batches, merge_analyses, analyze_paragraphs
+)
+
+PIPE_NAMES = ["tok2vec", "morphologizer", "parser", "attribute_ruler", "lemmatizer", "ner"]
+
+
+def test_disabled_components_follow_options():
+    assert disabled_components({}, PIPE_NAMES) == []
+    assert disabled_components({"ner": False}, PIPE_NAMES) == ["ner"]
+    # El lematizador necesita las etiquetas gramaticales
+    assert disabled_components({"pos": False}, PIPE_NAMES) == []
+    assert disabled_components(
+        {"pos": False, "lemmas": False, "ner": False, "sentences": False}, PIPE_NAMES
+    ) == PIPE_NAMES
+
+
+def test_paragraph_batches_are_bounded():
+    paragraphs = [f"Párrafo {i} " + "palabra " * (i % 50) for i in range(300)]
+    long_paragraph = "x" * 25 + " " + "y" * 30
+    text = "\n\n".join(paragraphs + [long_paragraph])
+    batches = list(iter_paragraph_batches(text, max_chars=500))
+    assert all(sum(len(p) for p in batch) <= 500 for batch in batches)
+    assert [p for batch in batches for p in batch] == [p.strip() for p in paragraphs] + [long_paragraph]
+    assert list(iter_paragraph_batches(long_paragraph, max_chars=40)) == [["x" * 25], ["y" * 30]]
+
+
+def test_partial_analyses_are_merged():
+    partials = [analyze_paragraphs(["Hola mundo. Adiós."]), analyze_paragraphs(["Otra frase aquí."])]
+    merged = merge_analyses(partials)
+    assert merged["word_count"] == 6
+    assert merged["sentence_count"] == 3
+    assert merged["paragraph_count"] == 2
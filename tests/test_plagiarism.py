@@ -0,0 +1,111 @@
+import random
+
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.nlp.plagiarism import FingerprintBuilder, PlagiarismIndex, TextFingerprint
+from src.nlp.streaming import StreamingTextAnalyzer, iter_text_chunks
+
+client = TestClient(app)
+
+VOCABULARY = [f"palabra{i}" for i in range(2000)]
+
+
+def random_text(seed, words=3000):
+    rng = random.Random(seed)
+    sentences = []
+    for _ in range(words // 15):
+        sentences.append(" ".join(rng.choice(VOCABULARY) for _ in range(15)) + ".")
+    return " ".join(sentences)
+
+
+def edit(text, seed, ratio=0.03):
+    rng = random.Random(seed)
+    words = text.split(" ")
+    for _ in range(int(len(words) * ratio)):
+        words[rng.randrange(len(words))] = "cambio"
+    return " ".join(words)
+
+
+def test_streaming_fingerprint_matches_full_text():
+    text = random_text(1, words=600)
+    builder = FingerprintBuilder()
+    StreamingTextAnalyzer(fingerprint=builder).feed_all(iter_text_chunks(text, 97)).finish()
+    streamed = builder.build()
+    full = TextFingerprint(text)
+    assert (streamed.signature == full.signature).all()
+    assert (streamed.samples == full.samples).all()
+
+
+def test_index_finds_near_duplicates_and_passages(tmp_path):
+    index = PlagiarismIndex(str(tmp_path / "index.sqlite3"))
+    originals = {f"ms-{seed}": random_text(seed) for seed in range(20)}
+    for manuscript_id, text in originals.items():
+        assert index.add(manuscript_id, TextFingerprint(text), title=manuscript_id)
+    assert not index.add("ms-0", TextFingerprint(originals["ms-0"]))
+
+    suspect = edit(originals["ms-7"], seed=99)
+    matches = index.query(TextFingerprint(suspect))
+    assert matches[0]["manuscript_id"] == "ms-7"
+    assert matches[0]["similarity"] > 0.6
+    assert matches[0]["passages"][0]["words"] > 50
+    assert all(match["similarity"] < 0.2 for match in matches[1:])
+
+    assert index.query(TextFingerprint(random_text(1000)), min_similarity=0.3) == []
+
+
+def test_plagiarism_check_finds_submitted_manuscript():
+    original = random_text(4242)
+    response = client.post("/api/v1/manuscripts/submit", json={
+        "title": "Original", "author": "Autora", "email": "autora@example.com",
+        "content": original
+    })
+    manuscript_id = response.json()["manuscript_id"]
+
+    response = client.post(
+        "/api/v1/text/plagiarism-check", json={"text": edit(original, seed=5), "options": {}}
+    )
+    body = response.json()
+    assert body["matches"][0]["manuscript_id"] == manuscript_id
+    assert body["similarity_score"] == body["matches"][0]["similarity"]
+    passage = body["matches"][0]["passages"][0]
+    assert passage["text"]
+
+
+def test_plagiarism_check_rejects_invalid_options():
+    for options in ({"top_k": "cinco"}, {"top_k": 0}, {"top_k": -3}, {"top_k": 10_000},
+                    {"min_similarity": 1.5}, {"min_similarity": -0.1}):
+        response = client.post(
+            "/api/v1/text/plagiarism-check", json={"text": "texto", "options": options}
+        )
+        assert response.status_code == 400
+        assert next(iter(options)) in response.json()["detail"]
+
+
+def test_cached_upload_missing_from_index_is_fingerprinted(tmp_path, monkeypatch):
+    from src.api import main
+    from tests.test_pdf_extraction import make_pdf
+
+    sentences = random_text(777, words=600).split(". ")
+    pdf = make_pdf([sentence + "." for sentence in sentences])
+    upload = {"file": ("indexado.pdf", pdf, "application/pdf")}
+    first = client.post("/api/v1/manuscripts/upload", files=upload)
+    assert first.status_code == 200
+    indexed = main.plagiarism_index.query(
+        TextFingerprint(main.extract_text_from_pdf(_write(tmp_path, pdf)))
+    )[0]
+
+    # Un índice vacío, como si el primer envío no hubiera llegado a indexarse
+    empty = PlagiarismIndex(str(tmp_path / "index.sqlite3"))
+    monkeypatch.setattr(main, "plagiarism_index", empty)
+    second = client.post("/api/v1/manuscripts/upload", files=upload)
+    assert second.status_code == 200
+    match = empty.query(TextFingerprint(main.extract_text_from_pdf(_write(tmp_path, pdf))))[0]
+    assert match["manuscript_id"] == second.json()["manuscript_id"]
+    assert match["similarity"] == indexed["similarity"] == 1.0
+
+
+def _write(tmp_path, content):
+    path = tmp_path / "copia.pdf"
+    path.write_bytes(content)
+    return str(path)
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import random
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.review_ai.llm_review import (
+    OpenAIProvider, ReviewService, split_into_chunks
+)
+from src.utils.cache import AnalysisCache
+
+client = TestClient(app)
+
+WORDS = ["casa", "río", "noche", "camino", "sombra", "puerta", "mañana", "viento"]
+
+
+def manuscript(seed, paragraphs=60):
+    rng = random.Random(seed)
+    return "\n\n".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 120))) + "."
+        for _ in range(paragraphs)
+    )
+
+
+def stand_in_server():
+    """Servidor local compatible con la API de chat de OpenAI"""
+    server = FastAPI()
+    server.state.calls = 0
+
+    @server.post("/v1/chat/completions")
+    async def completions(request: Request):
+        server.state.calls += 1
+        body = await request.json()
+        fragment = body["messages"][-1]["content"].split("Fragmento:\n", 1)[1]
+        word = fragment.split()[3]
+        content = {"suggestions": [
+            {"type": "estilo", "original": word, "message": "Revisar", "suggestion": word.upper()},
+            {"type": "estilo", "original": "no aparece", "message": "General", "suggestion": ""},
+        ]}
+        return {"choices": [{"message": {"content": json.dumps(content)}}]}
+
+    return server
+
+
+def test_chunks_are_literal_slices_within_budget():
+    text = manuscript(1)
+    chunks = split_into_chunks(text, max_tokens=200)
+    assert all(text[c.start:c.end] == c.text and c.tokens <= 200 for c in chunks)
+    assert all(a.end <= b.start for a, b in zip(chunks, chunks[1:]))
+    covered = " ".join(c.text for c in chunks).split()
+    assert covered == text.split()
+
+
+def test_revised_manuscript_only_reviews_changed_chunks(tmp_path):
+    server = stand_in_server()
+    provider = OpenAIProvider(
+        model="stand-in", api_key="x", base_url="http://stand-in/v1",
+        transport=httpx.ASGITransport(app=server)
+    )
+    service = ReviewService(
+        provider, AnalysisCache("test", str(tmp_path / "review.sqlite3")),
+        max_tokens=200, requests_per_minute=0
+    )
+    text = manuscript(2)
+
+    first = asyncio.run(service.review(text, "novela"))
+    assert server.state.calls == first["chunks"] > 5
+    for suggestion in first["suggestions"]:
+        if suggestion["original"]:
+            start = suggestion["position"]
+            assert text[start:start + len(suggestion["original"])] == suggestion["original"]
+
+    revised = "Un comienzo nuevo para la obra.\n\n" + text
+    second = asyncio.run(service.review(revised, "novela"))
+    assert second["cached_chunks"] >= second["chunks"] - 2
+    assert server.state.calls - first["chunks"] == second["chunks"] - second["cached_chunks"]
+
+
+def test_suggest_endpoint_with_local_provider():
+    text = "El el manuscrito llegó  tarde.\n\nOtro párrafo sin problemas."
+    response = client.post("/api/v1/review/suggest", json={"text": text})
+    assert response.status_code == 200
+    suggestions = response.json()["suggestions"]
+    assert {s["message"] for s in suggestions} == {"Palabra repetida: 'El'", "Espacios duplicados"}
+    repeated = suggestions[0]
+    assert text[repeated["position"]:].startswith(repeated["original"])
@@ -0,0 +1,88 @@
+import random
+
+from fastapi.testclient import TestClient
+
+from src.api.main import analyze_text_quality, app, build_manuscript_analysis
+from src.nlp.revisions import analyze_paragraphs_incrementally
+
+client = TestClient(app)
+
+ATOMS = ["casa", "perro", "de", "la", "caminaba", "sonrisa", "extraordinariamente", "y",
+         ".", "!", "?", "...", ",", "\n", "\n\n", "\n\n\n", " ", "Ñandú"]
+
+
+def _manuscript(paragraphs):
+    return "\n\n".join(
+        f"Párrafo {i}. La casa del perro caminaba de noche por la sonrisa oscura. " * 3
+        for i in range(paragraphs)
+    )
+
+
+def test_merged_paragraph_states_match_full_analysis():
+    rng = random.Random(11)
+    for _ in range(300):
+        text = "".join(
+            rng.choice(ATOMS) + (" " if rng.random() < 0.7 else "")
+            for _ in range(rng.randint(0, 120))
+        )
+        stats, analyzed, hashes = analyze_paragraphs_incrementally(text, {})
+        assert build_manuscript_analysis(stats) == analyze_text_quality(text)
+        assert len(hashes) == len(text.split("\n\n"))
+        # Con todos los estados conocidos no se vuelve a analizar nada
+        assert analyze_paragraphs_incrementally(text, analyzed)[1] == {}
+
+
+def test_revision_reanalyzes_only_changed_paragraphs():
+    first = _manuscript(20)
+    submission = {"title": "Versiones", "author": "Autora", "email": "autora@example.com"}
+    response = client.post("/api/v1/manuscripts/submit", json={**submission, "content": first})
+    assert response.status_code == 200
+    parent_id = response.json()["manuscript_id"]
+    assert "revision" not in response.json()
+
+    paragraphs = first.split("\n\n")
+    paragraphs[5] = "Un párrafo reescrito por completo, con otras palabras distintas."
+    paragraphs.append("Un epílogo nuevo al final del manuscrito revisado.")
+    second = "\n\n".join(paragraphs)
+    response = client.post("/api/v1/manuscripts/submit", json={
+        **submission, "content": second, "parent_manuscript_id": parent_id
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["preliminary_analysis"] == analyze_text_quality(second).dict()
+    revision = body["revision"]
+    assert revision["parent_manuscript_id"] == parent_id
+    assert revision["paragraphs"] == {
+        "total": 21, "reused": 19, "added": 2, "removed": 1, "analyzed": 2
+    }
+    words = revision["changes"]["metrics"]["word_count"]
+    assert words["change"] == words["current"] - words["previous"]
+    assert words["current"] == body["preliminary_analysis"]["word_count"]
+
+
+def test_unknown_parent_is_rejected():
+    response = client.post("/api/v1/manuscripts/submit", json={
+        "title": "Huérfano", "author": "Autor", "email": "autor@example.com",
+        "content": _manuscript(2), "parent_manuscript_id": "no-existe"
+    })
+    assert response.status_code == 404
+
+
+def test_text_analyzed_before_submission_gets_paragraph_states():
+    first = "\n\n".join(
+        f"Borrador {i} analizado antes de enviarse a la editorial." for i in range(12)
+    )
+    assert client.post("/api/v1/manuscripts/analyze", json={
+        "title": "Borrador", "author": "Autora", "email": "autora@example.com", "content": first
+    }).status_code == 200
+    submission = {"title": "Borrador", "author": "Autora", "email": "autora@example.com"}
+    parent_id = client.post(
+        "/api/v1/manuscripts/submit", json={**submission, "content": first}
+    ).json()["manuscript_id"]
+
+    second = first + "\n\nUn párrafo añadido en la revisión."
+    revision = client.post("/api/v1/manuscripts/submit", json={
+        **submission, "content": second, "parent_manuscript_id": parent_id
+    }).json()["revision"]
+    assert revision["paragraphs"]["reused"] == 12
+    assert revision["paragraphs"]["analyzed"] == 1
@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+
+from src.utils.lazy import LAZY_MODULES, lazy_import, preload
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Tiempo máximo de importación de la aplicación en frío
+IMPORT_BUDGET_SECONDS = float(os.getenv("ECDOTICA_IMPORT_BUDGET_SECONDS", "3.0"))
+HEAVY_MODULES = ("pypdf", "docx", "numpy", "httpx", "spacy", "tiktoken", "transformers", "torch")
+
+COLD_START = """
+import importlib, json, sys, time
+started = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+getattr(module, sys.argv[2])
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "loaded": [name for name in sys.argv[3:] if name in sys.modules],
+}))
+"""
+
+
+def procfile_app():
+    with open(os.path.join(ROOT, "Procfile")) as f:
+        command = f.read().split()
+    return command[command.index("uvicorn") + 1].split(":")
+
+
+def test_cold_start_of_procfile_app_is_within_budget():
+    module, attribute = procfile_app()
+    completed = subprocess.run(
+        [sys.executable, "-c", COLD_START, module, attribute, *HEAVY_MODULES],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+        env=dict(os.environ, ECDOTICA_PRELOAD=""),
+    )
+    result = json.loads(completed.stdout)
+    assert result["loaded"] == []
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS
+
+
+def test_lazy_module_is_imported_on_first_use():
+    sys.modules.pop("wave", None)
+    try:
+        wave = lazy_import("wave")
+        assert "wave" not in sys.modules and not wave.loaded
+        assert wave.Error.__name__ == "Error"
+        assert wave.loaded
+
+        report = preload(["wave", "ecdotica_dependencia_inexistente"])
+        assert report["wave"]["loaded"]
+        assert not report["ecdotica_dependencia_inexistente"]["loaded"]
+        assert "ecdotica_dependencia_inexistente" in report["ecdotica_dependencia_inexistente"]["error"]
+    finally:
+        LAZY_MODULES.pop("wave", None)
+        LAZY_MODULES.pop("ecdotica_dependencia_inexistente", None)
@@ -0,0 +1,43 @@
+from src.api.main import analyze_text_quality, analyze_text_stream
+from src.nlp.streaming import StreamingTextAnalyzer, full_analyzer, iter_text_chunks
+
+SAMPLE = (
+    "La editorial recibió el manuscrito. ¿Quién lo escribió? Nadie lo sabe!\n\n"
+    "El autor escribió escribió escribió sin descanso durante años.\n\n\n"
+    "Extraordinariamente, la historia terminaba bien..."
+)
+
+def test_chunked_analysis_matches_whole_text():
+    expected = analyze_text_quality(SAMPLE)
+    for size in (1, 2, 5, 17, 1024):
+        assert analyze_text_stream(iter_text_chunks(SAMPLE, size)) == expected
+
+def test_counts_and_repetition():
+    stats = StreamingTextAnalyzer().feed_all(iter_text_chunks(SAMPLE, 3)).finish()
+    assert stats.sentence_count == 5
+    assert stats.paragraph_count == 3
+    assert stats.complex_word_count == 1
+    assert stats.repeated_token == "escribió"
+    analysis = analyze_text_quality(SAMPLE)
+    assert "Repetición excesiva detectada: 'escribió'" in analysis.issues
+
+def test_text_length_ignores_surrounding_whitespace():
+    padded = "\n\n  " + SAMPLE + "  \n\n\n"
+    stats = StreamingTextAnalyzer().feed_all(iter_text_chunks(padded, 4)).finish()
+    assert stats.text_length == len(SAMPLE)
+    assert StreamingTextAnalyzer().feed_all([" ", "\n\n"]).finish().text_length == 0
+
+def test_excerpt_keeps_only_the_beginning():
+    stats = StreamingTextAnalyzer(excerpt_length=20).feed_all(iter_text_chunks("\n  " + SAMPLE, 3))
+    assert stats.finish().excerpt == SAMPLE[:20]
+
+def test_phrase_and_style_passes_are_opt_in():
+    plain = StreamingTextAnalyzer().feed_all(iter_text_chunks(SAMPLE * 50, 7)).finish()
+    full = full_analyzer().feed_all(iter_text_chunks(SAMPLE * 50, 7)).finish()
+    # Sin esas pasadas no se guarda nada por palabra
+    assert plain.phrases is None and plain.style is None
+    assert len(full.phrases) == full.word_count
+    for name in ("word_count", "sentence_count", "paragraph_count", "complex_word_count"):
+        assert getattr(plain, name) == getattr(full, name)
+    assert plain.word_freq == full.word_freq
+    assert plain.stutters() == full.stutters() == ["escribió"]
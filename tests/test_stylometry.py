@@ -0,0 +1,87 @@
+from fastapi.testclient import TestClient
+
+from src.api.main import analyze_revision, analyze_text_quality, app
+from src.nlp.phrases import RepeatedPhraseDetector
+from src.nlp.streaming import StreamingTextAnalyzer, full_analyzer, iter_text_chunks
+from src.nlp.stylometry import StyleProfiler, count_syllables
+
+SHORT = (
+    "Capítulo 1\n\nLa casa es azul. El perro come.\n\n"
+    "Capítulo II\n\nLa ciudad duerme en silencio."
+)
+
+
+def novel(chapters=12, slow_chapter=7):
+    """Capítulos de oraciones cortas salvo uno con oraciones muy largas"""
+    parts = []
+    for number in range(1, chapters + 1):
+        length = 45 if number == slow_chapter else 8
+        sentence = " ".join(["la noche caminaba lentamente"] * (length // 4)).capitalize() + "."
+        paragraphs = [" ".join([sentence] * 5) for _ in range(12)]
+        parts.append(f"Capítulo {number}\n\n" + "\n\n".join(paragraphs))
+    return "\n\n".join(parts)
+
+
+def test_counts_spanish_syllables():
+    counts = {word: count_syllables(word) for word in
+              ("casa", "ciudad", "país", "poeta", "aéreo", "guerra", "leíamos", "1936")}
+    assert counts == {"casa": 2, "ciudad": 2, "país": 2, "poeta": 3, "aéreo": 4,
+                      "guerra": 2, "leíamos": 4, "1936": 1}
+
+
+def test_chapter_profiles_and_readability():
+    style = analyze_text_quality(SHORT).style
+    chapters = style["chapters"]
+
+    assert chapters["chapter"] == ["1", "2"]
+    assert chapters["title"] == ["Capítulo 1", "Capítulo II"]
+    # Los encabezados no cuentan como palabras del capítulo
+    assert chapters["words"] == [7, 5]
+    assert chapters["sentences"] == [2, 1]
+    assert chapters["sentence_length_mean"] == [3.5, 5.0]
+    assert chapters["sentence_length_var"] == [0.25, 0.0]
+    # 11 sílabas en 7 palabras y 2 oraciones
+    assert chapters["fernandez_huerta"][0] == round(206.84 - 60 * 11 / 7 - 1.02 * 3.5, 3)
+    assert chapters["szigriszt_pazos"][0] == round(206.835 - 62.3 * 11 / 7 - 3.5, 3)
+    assert chapters["lexical_density"][0] == round(4 / 7, 3)
+    assert style["book"]["words"] == 12
+
+
+def test_windows_locate_the_chapter_where_sentences_balloon():
+    style = analyze_text_quality(novel()).style
+    chapters, windows = style["chapters"], style["windows"]
+
+    slowest = max(range(len(chapters["chapter"])), key=chapters["sentence_length_p50"].__getitem__)
+    assert chapters["chapter"][slowest] == "7"
+    assert chapters["fernandez_huerta"][slowest] == min(chapters["fernandez_huerta"])
+    peak = max(range(len(windows["start_word"])), key=windows["sentence_length_mean"].__getitem__)
+    assert windows["chapter"][peak] == "7"
+    assert len(windows["start_word"]) == len(windows["szigriszt_pazos"])
+
+
+def test_profile_does_not_depend_on_chunking_or_revisions():
+    text = novel(chapters=4, slow_chapter=2)
+    whole = analyze_text_quality(text).style
+
+    tiny = full_analyzer().feed_all(iter_text_chunks(text, chunk_size=7)).finish()
+    assert tiny.style.profile(tiny.phrases) == whole
+    revised, _, _ = analyze_revision(text, {})
+    assert revised.style == whole
+
+
+def test_long_lines_are_not_mistaken_for_headings():
+    profiler = StyleProfiler()
+    stats = StreamingTextAnalyzer(phrases=RepeatedPhraseDetector(), style=profiler)
+    text = "palabra " * 40 + "capítulo 3 a mitad de línea.\nFin."
+    stats.feed_all(iter_text_chunks(text, 64)).finish()
+    assert stats.style.profile(stats.phrases)["chapters"]["chapter"] == ["1"]
+
+
+def test_analysis_endpoint_returns_style_profile():
+    with TestClient(app) as client:
+        response = client.post("/api/v1/manuscripts/analyze", json={
+            "title": "Perfil", "author": "Ana", "email": "ana@example.com", "content": SHORT * 3
+        })
+    style = response.json()["detailed_analysis"]["style"]
+    assert set(style) == {"book", "chapters", "windows"}
+    assert style["windows"]["size"] == 2000
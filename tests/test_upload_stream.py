@@ -0,0 +1,66 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from tests.test_pdf_extraction import make_pdf
+
+client = TestClient(app)
+
+
+def parse_events(body):
+    """Eventos (nombre, datos) de una respuesta text/event-stream, sin comentarios"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in block.split("\n") if not line.startswith(":")
+        )
+        if fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_reports_progress_before_the_result():
+    pdf = make_pdf([f"Oracion numero {i} del manuscrito con progreso en vivo." for i in range(6)])
+    response = client.post(
+        "/api/v1/manuscripts/upload-stream",
+        files={"file": ("vivo.pdf", pdf, "application/pdf")},
+        params={"title": "En vivo", "genre": "novela"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "start" and names[-1] == "result"
+    assert "progress" in names
+
+    progress = [data for name, data in events if name == "progress"][-1]
+    assert progress["pages_extracted"] == 6
+    assert progress["words_analyzed"] == 54
+    assert progress["metrics"]["word_count"] == 54
+    assert progress["metrics"]["sentence_count"] == 6
+
+    result = events[-1][1]
+    assert result["manuscript_id"] == events[0][1]["manuscript_id"]
+    assert result["title"] == "En vivo"
+    assert result["full_analysis"]["word_count"] == 54
+    stored = client.get(f"/api/v1/manuscripts/{result['manuscript_id']}")
+    assert stored.status_code == 200
+
+
+def test_stream_reports_failures_as_error_events():
+    pdf = make_pdf(["Corto."])
+    response = client.post(
+        "/api/v1/manuscripts/upload-stream",
+        files={"file": ("corto.pdf", pdf, "application/pdf")}
+    )
+    assert response.status_code == 200
+    name, data = parse_events(response.text)[-1]
+    assert name == "error"
+    assert data["status_code"] == 400
+
+    unsupported = client.post(
+        "/api/v1/manuscripts/upload-stream",
+        files={"file": ("notas.txt", b"texto", "text/plain")}
+    )
+    assert unsupported.status_code == 400
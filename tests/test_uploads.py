@@ -0,0 +1,98 @@
+import asyncio
+import os
+from io import BytesIO
+
+import pytest
+from docx import Document
+from fastapi import HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+from src.api.main import app, extract_text_from_docx
+from src.utils.uploads import spool_upload
+
+client = TestClient(app)
+
+
+class CountingFile(BytesIO):
+    """Archivo que registra cuántos bytes se han leído"""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def test_spool_rejects_as_soon_as_limit_is_crossed():
+    source = CountingFile(b"x" * 10_000)
+    upload = UploadFile(file=source, filename="grande.pdf")
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(spool_upload(upload, max_size=2_500, chunk_size=1_000))
+    assert error.value.status_code == 413
+    assert source.bytes_read == 3_000
+
+
+def test_spooled_docx_is_extracted_from_disk():
+    doc = Document()
+    doc.add_paragraph("Primer párrafo del manuscrito.")
+    doc.add_paragraph("Segundo párrafo del manuscrito.")
+    buffer = BytesIO()
+    doc.save(buffer)
+    upload = UploadFile(file=BytesIO(buffer.getvalue()), filename="novela.docx")
+    with asyncio.run(spool_upload(upload)) as spooled:
+        assert spooled.size == len(buffer.getvalue())
+        text = extract_text_from_docx(spooled.path)
+    assert text == "Primer párrafo del manuscrito.\n\nSegundo párrafo del manuscrito."
+    assert not os.path.exists(spooled.path)
+
+
+@pytest.mark.parametrize("endpoint", ["/api/v1/manuscripts/upload", "/api/v1/wordpress/submit"])
+def test_oversized_upload_returns_413(endpoint):
+    payload = b"%PDF-" + b"0" * (10 * 1024 * 1024)
+    response = client.post(endpoint, files={"file": ("enorme.pdf", payload, "application/pdf")})
+    assert response.status_code == 413
+
+
+def call_upload(headers, chunks):
+    """Llama a la app ASGI con un cuerpo por fragmentos y cuenta los que consume"""
+    consumed, sent = [], []
+    body = iter(chunks)
+
+    async def receive():
+        chunk = next(body, None)
+        if chunk is None:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        consumed.append(len(chunk))
+        return {"type": "http.request", "body": chunk, "more_body": True}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/api/v1/manuscripts/upload", "raw_path": b"",
+        "query_string": b"", "root_path": "", "client": ("test", 1), "server": ("test", 80),
+        "headers": [(b"content-type", b"multipart/form-data; boundary=limite"), *headers],
+    }
+    asyncio.run(app(scope, receive, send))
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    return status, sum(consumed)
+
+
+def test_oversized_body_is_rejected_while_it_is_received():
+    megabyte = b"0" * (1024 * 1024)
+    head = (b"--limite\r\nContent-Disposition: form-data; name=\"file\"; "
+            b"filename=\"enorme.pdf\"\r\nContent-Type: application/pdf\r\n\r\n")
+
+    # Con Content-Length no se lee nada del cuerpo
+    status, consumed = call_upload([(b"content-length", str(60 * 1024 * 1024).encode())],
+                                   [head] + [megabyte] * 60)
+    assert (status, consumed) == (413, 0)
+
+    # Sin ella (chunked), se corta al pasar el límite en vez de leer los 60MB
+    status, consumed = call_upload([], [head] + [megabyte] * 60)
+    assert status == 413
+    assert consumed < 12 * 1024 * 1024
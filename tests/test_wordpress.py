@@ -0,0 +1,232 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from src.api import main
+from src.wordpress.publisher import WordPressPublisher, WordPressPublishError
+from tests.test_pdf_extraction import make_pdf
+
+
+def stand_in_wordpress(batch=True, fail_first=0, latency=0.0):
+    """Servidor local con las rutas de la API REST de WordPress que usa el publicador"""
+    server = FastAPI()
+    server.state.posts = []
+    server.state.requests = 0
+    server.state.active = 0
+    server.state.max_active = 0
+
+    def create(post_type, body):
+        if not body.get("title"):
+            return 400, {"code": "empty_content", "message": "Falta el título"}
+        post_id = len(server.state.posts) + 1
+        server.state.posts.append(body)
+        return 201, {"id": post_id, "status": body.get("status", "draft"),
+                     "link": f"https://stand-in/?p={post_id}", "type": post_type}
+
+    async def tracked(handler):
+        server.state.requests += 1
+        server.state.active += 1
+        server.state.max_active = max(server.state.max_active, server.state.active)
+        try:
+            await asyncio.sleep(latency)
+            if server.state.requests <= fail_first:
+                return JSONResponse({"message": "Ocupado"}, 503, headers={"Retry-After": "0"})
+            return handler()
+        finally:
+            server.state.active -= 1
+
+    if batch:
+        @server.post("/wp-json/batch/v1")
+        async def batch_endpoint(request: Request):
+            assert request.headers["authorization"].startswith("Basic ")
+            payload = await request.json()
+
+            def handler():
+                responses = []
+                for item in payload["requests"]:
+                    status, body = create(item["path"].rsplit("/", 1)[1], item["body"])
+                    responses.append({"status": status, "body": body, "headers": {}})
+                return JSONResponse({"responses": responses}, 207)
+            return await tracked(handler)
+
+    @server.post("/wp-json/wp/v2/{post_type}")
+    async def single_endpoint(post_type: str, request: Request):
+        body = await request.json()
+
+        def handler():
+            status, data = create(post_type, body)
+            return JSONResponse(data, status)
+        return await tracked(handler)
+
+    return server
+
+
+def publisher_for(server, **options):
+    options.setdefault("backoff", 0.01)
+    options.setdefault("sites", {"https://stand-in": {}})
+    return WordPressPublisher(transport=httpx.ASGITransport(app=server), **options)
+
+
+async def publish_many(publisher, count, site="https://stand-in"):
+    try:
+        return await asyncio.gather(*[
+            publisher.publish(site, "editor", "clave", {"title": f"Manuscrito {i}"})
+            for i in range(count)
+        ], return_exceptions=True)
+    finally:
+        await publisher.close()
+
+
+def test_publishes_in_batches_within_site_concurrency():
+    server = stand_in_wordpress(latency=0.01)
+    publisher = publisher_for(server, site_concurrency=2)
+
+    started = time.perf_counter()
+    results = asyncio.run(publish_many(publisher, 500))
+    elapsed = time.perf_counter() - started
+
+    assert all(isinstance(result, dict) for result in results)
+    assert sorted(result["id"] for result in results) == list(range(1, 501))
+    assert len(server.state.posts) == 500
+    # 500 entradas en lotes de 25 como máximo, sin superar 2 peticiones a la vez
+    assert server.state.requests <= 30
+    assert server.state.max_active <= 2
+    # Cientos de publicaciones por minuto con holgura
+    assert elapsed < 10
+
+
+def test_retries_transient_failures_and_reports_rejections():
+    server = stand_in_wordpress(fail_first=2)
+    publisher = publisher_for(server)
+
+    async def scenario():
+        try:
+            return await asyncio.gather(
+                publisher.publish("https://stand-in", "editor", "clave", {"title": "Válido"}),
+                publisher.publish("https://stand-in", "editor", "clave", {"title": ""}),
+                return_exceptions=True
+            )
+        finally:
+            await publisher.close()
+
+    published, rejected = asyncio.run(scenario())
+    assert published["id"] == 1 and published["post_type"] == "manuscrito"
+    assert isinstance(rejected, WordPressPublishError)
+    assert rejected.status_code == 400
+    assert "Falta el título" in rejected.detail
+    assert server.state.requests == 3
+
+
+def test_sites_without_batch_endpoint_get_individual_posts():
+    server = stand_in_wordpress(batch=False)
+    publisher = publisher_for(server)
+
+    results = asyncio.run(publish_many(publisher, 30))
+
+    assert [result["id"] for result in sorted(results, key=lambda r: r["id"])] == list(range(1, 31))
+    # Tras el 404 de /batch/v1, una petición por entrada
+    assert server.state.requests == 30
+
+
+def test_lost_responses_are_not_resent_but_unsent_requests_are():
+    server = stand_in_wordpress()
+    inner = httpx.ASGITransport(app=server)
+
+    class FlakyTransport(httpx.AsyncBaseTransport):
+        """Falla la primera petición con el error indicado"""
+
+        def __init__(self, error):
+            self.error = error
+
+        async def handle_async_request(self, request):
+            if self.error is not None:
+                error, self.error = self.error, None
+                if isinstance(error, httpx.ReadTimeout):
+                    # La entrada llega a crearse, pero la respuesta se pierde
+                    await inner.handle_async_request(request)
+                raise error
+            return await inner.handle_async_request(request)
+
+    async def publish_once(error):
+        publisher = WordPressPublisher(transport=FlakyTransport(error), backoff=0.01,
+                                       sites={"https://stand-in": {}})
+        try:
+            return await publisher.publish("https://stand-in", "editor", "clave",
+                                           {"title": "Una vez"})
+        except WordPressPublishError as e:
+            return e
+        finally:
+            await publisher.close()
+
+    lost = asyncio.run(publish_once(httpx.ReadTimeout("sin respuesta")))
+    assert isinstance(lost, WordPressPublishError) and "compruébelo" in lost.detail
+    assert len(server.state.posts) == 1
+
+    refused = asyncio.run(publish_once(httpx.ConnectError("conexión rechazada")))
+    assert refused["id"] == 2
+    assert len(server.state.posts) == 2
+
+
+def test_only_configured_sites_are_reachable():
+    publisher = publisher_for(stand_in_wordpress(), sites={
+        "https://stand-in/": {"user": "editor", "password": "clave"}
+    })
+    assert publisher.credentials("https://STAND-IN") == ("editor", "clave")
+    assert publisher.credentials("https://stand-in", "otro", "suya") == ("otro", "suya")
+    for url in ("http://169.254.169.254/latest/meta-data", "http://localhost:8080"):
+        with pytest.raises(WordPressPublishError) as error:
+            asyncio.run(publisher.publish(url, "editor", "clave", {"title": "x"}))
+        assert error.value.status_code == 400
+
+
+def test_submit_endpoint_publishes_through_the_shared_publisher(monkeypatch):
+    server = stand_in_wordpress()
+    monkeypatch.setattr(main, "wordpress_publisher", publisher_for(server, sites={
+        "https://stand-in": {"user": "editor", "password": "clave"}
+    }))
+    pdf = make_pdf([f"Oracion numero {i} del manuscrito enviado a WordPress." for i in range(5)])
+
+    with TestClient(main.app) as client:
+        response = client.post(
+            "/api/v1/wordpress/submit",
+            files={"file": ("wp.pdf", pdf, "application/pdf")},
+            params={"title": "Publicado", "wordpress_url": "https://stand-in"}
+        )
+        forbidden = client.post(
+            "/api/v1/wordpress/submit",
+            files={"file": ("wp.pdf", pdf, "application/pdf")},
+            data={"wordpress_user": "editor", "wordpress_password": "clave"},
+            params={"wordpress_url": "http://169.254.169.254"}
+        )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "published_to_wordpress"
+    assert data["wordpress_post"]["id"] == 1
+    assert server.state.posts[0]["title"] == "Publicado"
+    assert server.state.posts[0]["meta"]["manuscrito_id"] == data["manuscript_id"]
+    assert forbidden.status_code == 400
+    assert len(server.state.posts) == 1
+
+
+def test_submit_endpoint_rejects_credentials_in_the_query_string(monkeypatch):
+    server = stand_in_wordpress()
+    monkeypatch.setattr(main, "wordpress_publisher", publisher_for(server))
+    pdf = make_pdf([f"Oracion numero {i} del manuscrito enviado a WordPress." for i in range(5)])
+
+    with TestClient(main.app) as client:
+        response = client.post(
+            "/api/v1/wordpress/submit",
+            files={"file": ("wp.pdf", pdf, "application/pdf")},
+            params={"wordpress_url": "https://stand-in", "wordpress_user": "editor",
+                    "wordpress_password": "clave"}
+        )
+
+    assert response.status_code == 400
+    assert "wordpress_password" in response.json()["detail"]
+    assert server.state.posts == []
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from src.api.main import analyze_manuscript_file, analyze_text_quality
+from src.utils.workers import WorkerPool
+
+
+def test_runs_analysis_in_worker_process():
+    pool = WorkerPool(processes=1, max_pending=2)
+    try:
+        text = "Primera oración del texto. Segunda oración del texto."
+        analysis = asyncio.run(pool.run(analyze_text_quality, text))
+        assert analysis == analyze_text_quality(text)
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
+
+
+def test_full_queue_is_rejected_with_503():
+    pool = WorkerPool(processes=1, max_pending=0)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(pool.run(analyze_text_quality, "texto"))
+    assert error.value.status_code == 503
+    assert "Retry-After" in error.value.headers
+    assert pool.stats()["rejected"] == 1
+
+
+def test_http_errors_cross_the_process_boundary(tmp_path):
+    empty_pdf = tmp_path / "vacio.pdf"
+    empty_pdf.write_bytes(b"no es un pdf")
+    pool = WorkerPool(processes=1, max_pending=1)
+    try:
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(pool.run(analyze_manuscript_file, str(empty_pdf), "pdf"))
+        assert error.value.status_code == 400
+    finally:
+        pool.shutdown()
@@ -6,11 +6,50 @@
 (function(wp) {
     const { registerPlugin } = wp.plugins;
     const { PluginSidebar, PluginSidebarMoreMenuItem } = wp.editPost;
-    const { PanelBody, Button, Spinner, TextareaControl } = wp.components;
+    const { PanelBody, Button, Spinner, TextareaControl, FormFileUpload } = wp.components;
     const { useState, useEffect } = wp.element;
     const { useSelect } = wp.data;
     const { __ } = wp.i18n;
 
+    // Lee una respuesta text/event-stream y llama a onEvent(nombre, datos) por cada evento
+    const readServerSentEvents = async (response, onEvent) => {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        const dispatch = (block) => {
+            let name = 'message';
+            const data = [];
+            block.split('\n').forEach((line) => {
+                // Las líneas que empiezan por ':' son comentarios de keep-alive
+                if (line.startsWith('event:')) {
+                    name = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data.push(line.slice(5).trim());
+                }
+            });
+            if (data.length) {
+                onEvent(name, JSON.parse(data.join('\n')));
+            }
+        };
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            let separator;
+            while ((separator = buffer.indexOf('\n\n')) !== -1) {
+                dispatch(buffer.slice(0, separator));
+                buffer = buffer.slice(separator + 2);
+            }
+        }
+        if (buffer.trim()) {
+            dispatch(buffer);
+        }
+    };
+
     // Componente principal del sidebar
     const EcdoticaAISidebar = () => {
         const [analyzing, setAnalyzing] = useState(false);
@@ -19,6 +58,9 @@
         const [analysis, setAnalysis] = useState(null);
         const [suggestions, setSuggestions] = useState([]);
         const [blockchainHash, setBlockchainHash] = useState(null);
+        const [uploading, setUploading] = useState(false);
+        const [uploadProgress, setUploadProgress] = useState(null);
+        const [uploadResult, setUploadResult] = useState(null);
 
         // Obtener el contenido del post
         const postContent = useSelect((select) => {
@@ -94,6 +136,51 @@
             }
         };
 
+        // Analizar un manuscrito PDF/Word mostrando las métricas parciales mientras se procesa
+        const handleUploadManuscript = async (event) => {
+            const file = event.target.files && event.target.files[0];
+            if (!file) {
+                return;
+            }
+
+            setUploading(true);
+            setUploadProgress(null);
+            setUploadResult(null);
+
+            const form = new FormData();
+            form.append('file', file);
+
+            try {
+                const response = await fetch(ecdoticaAI.apiUrl + '/api/v1/manuscripts/upload-stream', {
+                    method: 'POST',
+                    headers: { 'Accept': 'text/event-stream' },
+                    body: form
+                });
+
+                if (!response.ok) {
+                    const error = await response.json().catch(() => ({}));
+                    alert(error.detail || 'Error al analizar el manuscrito');
+                    return;
+                }
+
+                await readServerSentEvents(response, (name, data) => {
+                    if (name === 'progress') {
+                        setUploadProgress(data);
+                    } else if (name === 'result') {
+                        setUploadResult(data);
+                    } else if (name === 'error') {
+                        alert(data.detail || 'Error al analizar el manuscrito');
+                    }
+                });
+            } catch (error) {
+                console.error('Error:', error);
+                alert('Error de conexión');
+            } finally {
+                setUploading(false);
+                event.target.value = '';
+            }
+        };
+
         // Registrar en blockchain
         const handleRegisterBlockchain = async () => {
             if (!postId) {
@@ -155,6 +242,44 @@
                     )}
                 </PanelBody>
 
+                <PanelBody title="Análisis de Manuscrito" initialOpen={false}>
+                    <p>
+                        <FormFileUpload
+                            accept=".pdf,.docx"
+                            onChange={handleUploadManuscript}
+                            render={({ openFileDialog }) => (
+                                <Button isPrimary onClick={openFileDialog} disabled={uploading}>
+                                    {uploading ? <Spinner /> : 'Subir PDF o Word'}
+                                </Button>
+                            )}
+                        />
+                    </p>
+                    {uploading && uploadProgress && (
+                        <div className="ecdotica-analysis ecdotica-analysis-partial">
+                            {uploadProgress.pages_extracted > 0 && (
+                                <p><strong>Páginas procesadas:</strong> {uploadProgress.pages_extracted}</p>
+                            )}
+                            <p><strong>Palabras:</strong> {uploadProgress.metrics.word_count}</p>
+                            <p><strong>Oraciones:</strong> {uploadProgress.metrics.sentence_count}</p>
+                            <p><strong>Palabras por oración:</strong> {uploadProgress.metrics.avg_words_per_sentence}</p>
+                            <p><em>Análisis en curso…</em></p>
+                        </div>
+                    )}
+                    {uploadResult && (
+                        <div className="ecdotica-analysis">
+                            <p><strong>Palabras:</strong> {uploadResult.full_analysis.word_count}</p>
+                            <p><strong>Oraciones:</strong> {uploadResult.full_analysis.sentence_count}</p>
+                            <p><strong>Palabras por oración:</strong> {uploadResult.full_analysis.avg_words_per_sentence}</p>
+                            <p><strong>Puntuación:</strong> {uploadResult.full_analysis.quality_score}/100</p>
+                            <p><strong>Lectura estimada:</strong> {uploadResult.full_analysis.estimated_reading_time_minutes} min</p>
+                            {uploadResult.full_analysis.issues.map((issue, index) => (
+                                <p key={index}>⚠ {issue}</p>
+                            ))}
+                            <p><em>{uploadResult.message}</em></p>
+                        </div>
+                    )}
+                </PanelBody>
+
                 <PanelBody title="Sugerencias Editoriales" initialOpen={false}>
                     <p>
                         <Button 